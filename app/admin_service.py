@@ -1,6 +1,8 @@
 import os, json
 import shutil
 from fastapi import HTTPException
+from app.latent_cache import latent_cache
+from app.result_cache import result_cache, fragment_cache
 
 BASE_DIR = "voices"
 
@@ -36,6 +38,9 @@ def admin_delete_voice(user_id: str, voice_id: str):
     if not os.path.exists(voice_dir):
         raise HTTPException(404, "Voice not found")
 
+    latent_cache.invalidate(voice_dir)
+    result_cache.invalidate(voice_dir)
+    fragment_cache.invalidate(voice_dir)
     shutil.rmtree(voice_dir)
 
     return {
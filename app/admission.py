@@ -0,0 +1,69 @@
+"""
+Admission control for /tts.
+
+A job is admitted while the estimated compute backlog it would wait behind
+(queued work in its own and higher-priority lanes, plus the chunks in
+flight) is within its lane's limit. The job's own length does not count,
+so a long job is always admitted once nothing is ahead of it:
+
+    XTTS_ADMIT_MAX_BACKLOG_S="premium=3600,standard=1200,free=300"
+
+Lanes without a limit always admit. Over the limit, XTTS_ADMIT_MODE picks
+what happens: "reject" answers 429 with Retry-After, "defer" accepts the job
+in a "deferred" state and queues it once the backlog has drained.
+"""
+
+import os
+import math
+import threading
+from collections import defaultdict
+
+from app.scheduler import LANES, parse_weights
+
+ADMIT_MAX_BACKLOG_S = parse_weights(os.getenv("XTTS_ADMIT_MAX_BACKLOG_S", ""))
+ADMIT_MODE = os.getenv("XTTS_ADMIT_MODE", "reject")   # reject | defer
+
+
+class QueueFull(Exception):
+    def __init__(self, priority: str, backlog_s: float, retry_after: int):
+        super().__init__(
+            f"TTS queue is full for {priority} requests "
+            f"(~{int(backlog_s)}s of work ahead). Retry in {retry_after}s."
+        )
+        self.priority = priority
+        self.backlog_s = backlog_s
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, limits=None, mode: str = ADMIT_MODE):
+        self.limits = dict(limits if limits is not None else ADMIT_MAX_BACKLOG_S)
+        self.mode = mode
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def retry_after(self, priority: str, backlog_s: float):
+        """Seconds until backlog_s of work ahead drains to the lane's limit; None if within it"""
+        limit = self.limits.get(priority)
+        if limit is None or backlog_s <= limit:
+            return None
+        return max(1, math.ceil(backlog_s - limit))
+
+    def count(self, priority: str, outcome: str, chars: int = 0):
+        with self._lock:
+            counts = self._counts[priority]
+            counts[outcome] += 1
+            counts[f"{outcome}_chars"] += chars
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "lanes": {
+                    lane: {"max_backlog_s": self.limits.get(lane), **self._counts[lane]}
+                    for lane in LANES
+                }
+            }
+
+
+admission = AdmissionController()
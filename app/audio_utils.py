@@ -1,13 +1,60 @@
 from pydub import AudioSegment
 import os
+import math
 import uuid
+import wave
+import struct
+import numpy as np
+
+# XTTS v2 always decodes at 24 kHz
+XTTS_SAMPLE_RATE = 24000
+# Reference and training clips are stored at this rate, mono
+REFERENCE_SAMPLE_RATE = 22050
+# Decoded in-process by libsndfile; anything else goes through ffmpeg
+NATIVE_FORMATS = {".wav", ".flac", ".ogg", ".oga", ".mp3"}
+
+
+def decode_audio(path: str):
+    """
+    (float32 mono samples, sample rate) of an audio file. WAV, FLAC,
+    OGG and MP3 are decoded in-process with soundfile; other containers,
+    and files libsndfile can't read, fall back to pydub/ffmpeg.
+    """
+    if os.path.splitext(path)[1].lower() in NATIVE_FORMATS:
+        try:
+            import soundfile as sf
+            samples, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+            return samples.mean(axis=1, dtype=np.float32), sample_rate
+        except ImportError:
+            pass
+        except RuntimeError as e:  # soundfile.LibsndfileError
+            print(f"libsndfile could not read {path}, using ffmpeg: {e}")
+
+    audio = AudioSegment.from_file(path).set_channels(1)
+    scale = float(1 << (8 * audio.sample_width - 1))
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32) / scale
+    return samples, audio.frame_rate
+
+
+def load_audio(path: str, sample_rate: int = REFERENCE_SAMPLE_RATE):
+    """Decode to float32 mono at sample_rate"""
+    samples, orig_sr = decode_audio(path)
+    return resample(samples, orig_sr, sample_rate)
+
+
+def audio_duration(path: str) -> float:
+    """Seconds of audio, from the header where libsndfile can read it"""
+    try:
+        import soundfile as sf
+        return sf.info(path).duration
+    except (ImportError, RuntimeError):
+        samples, sample_rate = decode_audio(path)
+        return len(samples) / sample_rate
 
-def normalize_to_wav(input_path: str) -> str:
-    audio = AudioSegment.from_file(input_path)
-    audio = audio.set_channels(1).set_frame_rate(22050)
 
+def normalize_to_wav(input_path: str) -> str:
     out_path = input_path.replace(".mp3", ".wav")
-    audio.export(out_path, format="wav")
+    write_wav(out_path, [load_audio(input_path)], REFERENCE_SAMPLE_RATE)
     return out_path
 
 
@@ -22,8 +69,184 @@ def convert_to_wav(input_path: str) -> str:
         return input_path
 
     wav_path = input_path.rsplit(".", 1)[0] + ".wav"
-    audio = AudioSegment.from_file(input_path)
-    audio = audio.set_channels(1).set_frame_rate(22050)
-    audio.export(wav_path, format="wav")
+    write_wav(wav_path, [load_audio(input_path)], REFERENCE_SAMPLE_RATE)
     return wav_path
 
+
+def pcm16(samples) -> bytes:
+    """float [-1, 1] samples -> little-endian 16-bit PCM"""
+    samples = np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0)
+    # round, not truncate, so read_wav_blocks -> pcm16 is lossless
+    return np.rint(samples * 32767).astype("<i2").tobytes()
+
+
+def wav_header(sample_rate: int, data_size: int = 0xFFFFFFFF - 36, channels: int = 1) -> bytes:
+    """
+    RIFF/WAVE header for 16-bit PCM. The default data_size is the
+    "unknown length" marker used when streaming.
+    """
+    byte_rate = sample_rate * channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", data_size + 36, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * 2, 16,
+        b"data", data_size
+    )
+
+
+def write_wav(path: str, chunks, sample_rate: int = XTTS_SAMPLE_RATE) -> str:
+    """Write float chunks one after another as a single 16-bit mono WAV"""
+    # new inode via rename: the path may be hard-linked into the result cache
+    tmp = f"{path}.tmp"
+    with wave.open(tmp, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        for chunk in chunks:
+            w.writeframes(pcm16(chunk))
+    os.replace(tmp, path)
+    return path
+
+
+def apply_fades(chunks, sample_rate: int = XTTS_SAMPLE_RATE, fade_ms: int = 50):
+    """Linear fade-in on the first chunk and fade-out on the last, one chunk of lookahead"""
+    n = int(sample_rate * fade_ms / 1000)
+    prev = None
+    for chunk in chunks:
+        if prev is None:
+            chunk = np.array(chunk, dtype=np.float32)
+            k = min(n, len(chunk))
+            chunk[:k] *= np.linspace(0.0, 1.0, k, dtype=np.float32)
+        else:
+            yield prev
+        prev = chunk
+    if prev is not None:
+        prev = np.array(prev, dtype=np.float32)
+        k = min(n, len(prev))
+        if k:
+            prev[-k:] *= np.linspace(1.0, 0.0, k, dtype=np.float32)
+        yield prev
+
+
+def resample(samples, orig_sr: int, target_sr: int):
+    """Polyphase resampling of a whole float32 signal (scipy.signal.resample_poly)"""
+    samples = np.asarray(samples, dtype=np.float32)
+    if orig_sr == target_sr or not len(samples):
+        return samples
+    from scipy.signal import resample_poly
+    g = math.gcd(orig_sr, target_sr)
+    return resample_poly(samples, target_sr // g, orig_sr // g).astype(np.float32)
+
+
+def read_wav_blocks(path: str, block_frames: int = 1 << 16):
+    """Yield a 16-bit PCM WAV as float32 mono blocks (channels are averaged)"""
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+        channels = w.getnchannels()
+        while True:
+            data = w.readframes(block_frames)
+            if not data:
+                break
+            block = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32767
+            if channels > 1:
+                block = block.reshape(-1, channels).mean(axis=1)
+            yield block
+
+
+def wav_sample_rate(path: str) -> int:
+    with wave.open(path, "rb") as w:
+        return w.getframerate()
+
+
+def trim_silence(blocks, threshold: float, pad: int, max_hold: int):
+    """
+    Drop leading and trailing samples below `threshold`, keeping `pad`
+    samples of each. Trailing silence is held back (at most max_hold
+    samples) until the part ends or speech resumes.
+    """
+    started = False
+    hold = np.empty(0, dtype=np.float32)
+    lead = hold   # the last `pad` samples of leading silence, which may span blocks
+    for block in blocks:
+        loud = np.flatnonzero(np.abs(block) >= threshold)
+        if not started:
+            if not len(loud):
+                lead = np.concatenate((lead, block))[-pad:] if pad else lead
+                continue
+            block = np.concatenate((lead, block))
+            loud = loud + len(lead)
+            block = block[max(0, loud[0] - pad):]
+            loud = loud - loud[0] + min(pad, loud[0])
+            started = True
+        if len(loud):
+            yield np.concatenate((hold, block[:loud[-1] + 1]))
+            hold = block[loud[-1] + 1:]
+        else:
+            hold = np.concatenate((hold, block))
+        if len(hold) > max_hold:
+            yield hold[:-max_hold]
+            hold = hold[-max_hold:]
+    if started and len(hold):
+        yield hold[:pad]
+
+
+def join_parts(parts, sample_rate: int = XTTS_SAMPLE_RATE, crossfade_ms: float = 0,
+               trim_db: float = None, trim_pad_ms: float = 100):
+    """
+    Join parts (each an iterable of float32 blocks) into one stream of blocks.
+
+    crossfade_ms: linear crossfade at every boundary (the end of one part
+                  overlaps the start of the next)
+    trim_db:      trim silence quieter than this (dBFS, e.g. -45) at every
+                  part edge, leaving trim_pad_ms of it
+
+    Only the last crossfade_ms of the previous part is held back, so memory
+    does not grow with the number or length of parts.
+    """
+    n = int(sample_rate * crossfade_ms / 1000)
+    threshold = 10 ** (trim_db / 20) if trim_db is not None else None
+    pad = int(sample_rate * trim_pad_ms / 1000)
+    tail = None   # last <= n samples of the previous part, not yet written
+
+    for part in parts:
+        if threshold is not None:
+            part = trim_silence(part, threshold, pad, max_hold=sample_rate * 10)
+        buf = np.empty(0, dtype=np.float32)
+        faded = tail is None or n == 0
+        for block in part:
+            buf = np.concatenate((buf, np.asarray(block, dtype=np.float32)))
+            if not faded:
+                if len(buf) < len(tail):
+                    continue
+                k = len(tail)
+                ramp = np.linspace(0.0, 1.0, k, dtype=np.float32)
+                buf[:k] = tail * (1 - ramp) + buf[:k] * ramp
+                faded = True
+            if len(buf) > n:
+                yield buf[:len(buf) - n]
+                buf = buf[len(buf) - n:]
+        if not faded:
+            # part shorter than the crossfade - blend what there is
+            k = len(buf)
+            if k:
+                ramp = np.linspace(0.0, 1.0, k, dtype=np.float32)
+                yield tail[:len(tail) - k]
+                buf = tail[len(tail) - k:] * (1 - ramp) + buf * ramp
+            else:
+                buf = tail
+        tail = buf
+
+    if tail is not None and len(tail):
+        yield tail
+
+
+def merge_wav_files(paths, out_path: str, crossfade_ms: float = 0, trim_db: float = None) -> str:
+    """Concatenate WAV files into out_path in one streaming pass (linear time, bounded memory)"""
+    paths = list(paths)
+    sample_rate = wav_sample_rate(paths[0])
+    for path in paths[1:]:
+        if wav_sample_rate(path) != sample_rate:
+            raise ValueError(f"{path}: sample rate differs from {paths[0]} ({sample_rate} Hz)")
+    parts = (read_wav_blocks(path) for path in paths)
+    return write_wav(out_path, join_parts(parts, sample_rate, crossfade_ms, trim_db), sample_rate)
@@ -0,0 +1,60 @@
+import os
+import time
+import queue
+import threading
+from collections import Counter
+
+# How long the worker waits for more chunks after the first one arrives
+BATCH_WINDOW_MS = float(os.getenv("XTTS_BATCH_WINDOW_MS", "15"))
+# XTTSVoiceCloner.generate_batch runs a batch's chunks one after another, so
+# a larger batch only takes chunks out of the fair/priority queues early: a
+# premium chunk arriving meanwhile waits behind the free ones already taken.
+# Raise it for an engine that really synthesizes a batch in one pass.
+BATCH_MAX_SIZE = int(os.getenv("XTTS_BATCH_MAX_SIZE", "1"))
+
+
+class BatchCollector:
+    """
+    Pulls chunk tasks off a queue in batches: block for the first one,
+    then keep collecting until the window closes or the batch is full.
+    """
+
+    def __init__(self, source, window_ms: float = BATCH_WINDOW_MS, max_size: int = BATCH_MAX_SIZE):
+        self.source = source
+        self.window = window_ms / 1000.0
+        self.max_size = max(1, max_size)
+        self._sizes = Counter()
+        self._lock = threading.Lock()
+
+    def next_batch(self):
+        batch = [self.source.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self.source.get(timeout=remaining))
+                else:
+                    # window closed - still take whatever is already waiting
+                    batch.append(self.source.get_nowait())
+            except queue.Empty:
+                break
+
+        with self._lock:
+            self._sizes[len(batch)] += 1
+        return batch
+
+    def stats(self):
+        with self._lock:
+            sizes = dict(sorted(self._sizes.items()))
+        batches = sum(sizes.values())
+        items = sum(size * count for size, count in sizes.items())
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_size,
+            "batches": batches,
+            "chunks": items,
+            "mean_batch_size": round(items / batches, 2) if batches else 0,
+            "batch_size_histogram": sizes
+        }
@@ -0,0 +1,103 @@
+import os
+import shutil
+import threading
+
+import numpy as np
+
+# Process-wide budget for synthesized chunks held in RAM. Once it is used up,
+# further chunks are written to .npy files and memory-mapped back on merge.
+# Checkpointed buffers write every chunk to disk as well, so a job can resume
+# after a restart with only its missing chunks.
+CHUNK_MEMORY_MB = float(os.getenv("XTTS_CHUNK_MEMORY_MB", "512"))
+
+_budget_lock = threading.Lock()
+_in_memory = 0
+
+
+class ChunkBuffer:
+    """Ordered float32 chunks of one job, in memory or spilled to disk"""
+
+    def __init__(self, total: int, spill_dir: str, checkpoint: bool = False):
+        self.total = total
+        self.spill_dir = spill_dir
+        self.checkpoint = checkpoint
+        self.parts = [None] * total
+        self.count = 0
+        self.mem_bytes = 0
+        self.spilled = 0
+        self.released = False
+
+    def _path(self, index: int):
+        return os.path.join(self.spill_dir, f"{index}.npy")
+
+    def _write(self, index: int, samples):
+        # write-then-rename so a crash never leaves a truncated checkpoint
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self._path(index)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, samples)
+        os.replace(tmp, path)
+        return path
+
+    def put(self, index: int, samples, checkpoint: bool = None):
+        """checkpoint=False skips the disk copy for chunks that can be recovered elsewhere"""
+        global _in_memory
+        if self.released or self.parts[index] is not None:
+            return  # job is over, or already have it (restored checkpoint or a requeued duplicate)
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+
+        with _budget_lock:
+            keep = _in_memory + samples.nbytes <= CHUNK_MEMORY_MB * 1024 * 1024
+            if keep:
+                _in_memory += samples.nbytes
+
+        if checkpoint is None:
+            checkpoint = self.checkpoint
+        path = self._write(index, samples) if checkpoint or not keep else None
+        if keep:
+            self.mem_bytes += samples.nbytes
+            self.parts[index] = samples
+        else:
+            self.parts[index] = path
+            self.spilled += 1
+        self.count += 1
+
+    def restore(self):
+        """Pick up chunks checkpointed before a restart. Returns their indexes."""
+        done = []
+        for index in range(self.total):
+            if self.parts[index] is None and os.path.exists(self._path(index)):
+                self.parts[index] = self._path(index)
+                self.count += 1
+                done.append(index)
+        return done
+
+    @property
+    def complete(self):
+        return self.count == self.total
+
+    def get(self, index: int):
+        """Samples of one chunk (memory-mapped if spilled), or None if not there yet"""
+        part = self.parts[index]
+        if isinstance(part, str):
+            return np.load(part, mmap_mode="r")
+        return part
+
+    def __iter__(self):
+        """Chunks in order - spilled ones are memory-mapped, not read whole"""
+        for index in range(self.total):
+            part = self.get(index)
+            if part is not None:
+                yield part
+
+    def release(self):
+        """Free the memory and spill files; later puts are ignored"""
+        global _in_memory
+        self.released = True
+        with _budget_lock:
+            _in_memory -= self.mem_bytes
+        self.mem_bytes = 0
+        self.parts = [None] * self.total
+        if os.path.isdir(self.spill_dir):
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -2,6 +2,8 @@ import os
 import shutil
 from fastapi import UploadFile, HTTPException
 from app.audio_utils import convert_to_wav
+from app.latent_cache import latent_cache
+from app.result_cache import result_cache, fragment_cache
 
 BASE_DIR = "voices"
 
@@ -37,6 +39,10 @@ def clone_voice(audio: UploadFile, user_id: str, voice_name: str):
     with open(os.path.join(voice_dir, "meta.json"), "w") as f:
         json.dump(meta, f, indent=2)
 
+    # precompute speaker latents so the first TTS job doesn't pay for it
+    from app.job_manager import warm_voice
+    warm_voice(final_ref)
+
     return {
         "status": "cloned",
         "voice_id": voice_name,
@@ -55,6 +61,9 @@ async def delete_voice(user_id: str, voice_name: str):
         )
 
     # 🔥 Delete full voice folder
+    latent_cache.invalidate(voice_dir)
+    result_cache.invalidate(voice_dir)
+    fragment_cache.invalidate(voice_dir)
     shutil.rmtree(voice_dir)
 
     return {
@@ -0,0 +1,99 @@
+"""
+The one place an XTTS engine gets built in a process.
+
+Every module asks get_engine() for the model instead of constructing its
+own, so a process never holds more than one copy. Loading happens on first
+use, or earlier through warm_up() (called from the app's startup hook).
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+# torch = XTTSVoiceCloner, onnx = XTTSOnnxDecoderEngine (latent pass and vocoder
+# on ONNX Runtime, sampling in PyTorch - see app/onnx_engine.py)
+XTTS_ENGINE = os.getenv("XTTS_ENGINE", "torch")
+
+def resolve_device(device: str) -> str:
+    """auto = cuda when available, else cpu"""
+    if device == "auto":
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def engine_device() -> str:
+    """The device get_engine() loads the model on, without loading it"""
+    if XTTS_ENGINE == "onnx":
+        return "cpu"
+    return resolve_device(os.getenv("XTTS_DEVICE", "auto"))
+
+
+_engine = None
+_lock = threading.Lock()
+_status = {
+    "state": "not_loaded",   # not_loaded | loading | ready | failed
+    "load_seconds": None,
+    "loaded_at": None,
+    "error": None,
+    "engine": None,
+    "device": None,
+    "quantized": None
+}
+
+
+def get_engine():
+    """Return the process-wide engine, loading it on first call (thread-safe)"""
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _lock:
+        if _engine is None:
+            _status.update(state="loading", error=None)
+            t0 = time.monotonic()
+            try:
+                if XTTS_ENGINE == "onnx":
+                    from app.onnx_engine import XTTSOnnxDecoderEngine
+                    eng = XTTSOnnxDecoderEngine()
+                else:
+                    from app.xtts_engine import XTTSVoiceCloner
+                    eng = XTTSVoiceCloner()
+            except Exception as e:
+                _status.update(state="failed", error=str(e))
+                raise
+            _status.update(
+                state="ready",
+                load_seconds=round(time.monotonic() - t0, 2),
+                loaded_at=datetime.now().isoformat(),
+                engine=XTTS_ENGINE,
+                device=str(eng.device),
+                quantized=eng.quantized
+            )
+            _engine = eng
+    return _engine
+
+
+def loaded_engine():
+    """The engine if it is already loaded, else None (never triggers a load)"""
+    return _engine
+
+
+def warm_up(background: bool = True):
+    """Load the engine ahead of the first request"""
+    def _load():
+        try:
+            get_engine()
+            print(f"✅ XTTS engine ready in {_status['load_seconds']}s")
+        except Exception as e:
+            print(f"❌ XTTS engine failed to load: {e}")
+
+    if background:
+        threading.Thread(target=_load, daemon=True).start()
+    else:
+        _load()
+
+
+def engine_status():
+    return dict(_status)
@@ -0,0 +1,82 @@
+"""
+Throughput model for queue ETAs.
+
+Every synthesized chunk updates exponentially weighted moving averages of
+compute seconds per input character and of the real-time factor (compute
+seconds / audio seconds), per language and overall. Until a language has
+samples the overall average is used, and before any chunk has run the
+XTTS_ETA_SEC_PER_CHAR prior.
+"""
+
+import os
+import threading
+
+ETA_ALPHA = float(os.getenv("XTTS_ETA_ALPHA", "0.1"))
+# Rough prior for a CPU host; replaced by measurements after the first chunk
+ETA_SEC_PER_CHAR = float(os.getenv("XTTS_ETA_SEC_PER_CHAR", "0.05"))
+
+
+class _Ewma:
+    __slots__ = ("value", "samples")
+
+    def __init__(self):
+        self.value = None
+        self.samples = 0
+
+    def add(self, x, alpha):
+        self.value = x if self.value is None else alpha * x + (1 - alpha) * self.value
+        self.samples += 1
+
+
+class ThroughputModel:
+    def __init__(self, alpha: float = ETA_ALPHA, prior_sec_per_char: float = ETA_SEC_PER_CHAR):
+        self.alpha = alpha
+        self.prior = prior_sec_per_char
+        self._per_char = {}   # language (None = overall) -> _Ewma
+        self._rtf = {}
+        self._per_chunk = _Ewma()
+        self._lock = threading.Lock()
+
+    def record(self, language: str, chars: int, compute_s: float, audio_s: float = None):
+        if chars <= 0 or compute_s <= 0:
+            return
+        with self._lock:
+            for key in (language, None):
+                self._per_char.setdefault(key, _Ewma()).add(compute_s / chars, self.alpha)
+                if audio_s:
+                    self._rtf.setdefault(key, _Ewma()).add(compute_s / audio_s, self.alpha)
+            self._per_chunk.add(compute_s, self.alpha)
+
+    def sec_per_char(self, language: str = None):
+        with self._lock:
+            for key in (language, None):
+                avg = self._per_char.get(key)
+                if avg is not None and avg.value is not None:
+                    return avg.value
+        return self.prior
+
+    def sec_per_chunk(self, chunk_chars: int = 1000):
+        with self._lock:
+            if self._per_chunk.value is not None:
+                return self._per_chunk.value
+        return self.prior * chunk_chars
+
+    def seconds(self, language: str, chars: int):
+        return chars * self.sec_per_char(language)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sec_per_char": {
+                    key or "all": {"value": round(avg.value, 4), "samples": avg.samples}
+                    for key, avg in self._per_char.items()
+                },
+                "rtf": {
+                    key or "all": {"value": round(avg.value, 3), "samples": avg.samples}
+                    for key, avg in self._rtf.items()
+                },
+                "sec_per_chunk": round(self._per_chunk.value, 3) if self._per_chunk.value else None
+            }
+
+
+throughput = ThroughputModel()
@@ -1,38 +1,54 @@
 import os
-import json
 import uuid
+import time
 import threading
-import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pydub import AudioSegment
+from app.batching import BatchCollector, BATCH_MAX_SIZE
+from app.chunk_buffer import ChunkBuffer
+from app.audio_utils import audio_duration, XTTS_SAMPLE_RATE
+from app.postprocess import post_chain, transcode
+from app.eta import throughput
+from app.admission import admission, QueueFull
+from app.result_cache import result_cache, fragment_cache, link_or_copy
+from app.text_chunker import chunk_text
+from app.segments import SEGMENTS, SEGMENT_FORMAT, SEGMENT_KEEP_S, write_segment, published, segment_path, remove_segments, segment_dirs
+from app.output_store import FORMATS
+from app.worker_pool import WorkerPool, POOL_SIZE
+from app.engine_registry import get_engine, loaded_engine, engine_status, warm_up
+from app.job_store import job_store
+from app.scheduler import LaneQueue, parse_weights
 
 JOBS_DIR = "jobs"
+CHUNKS_DIR = os.path.join(JOBS_DIR, "chunks")  # spill space and chunk checkpoints
+# Write each finished chunk of a multi-chunk job to disk so it survives a restart
+CHECKPOINT_CHUNKS = os.getenv("XTTS_CHECKPOINT_CHUNKS", "1") == "1"
+# Threads for CPU work that overlaps with synthesis (buffering, merge, encode)
+POST_WORKERS = int(os.getenv("XTTS_POST_WORKERS", "2"))
+OUTPUT_MP3 = os.getenv("XTTS_OUTPUT_MP3", "0") == "1"
+# Reuse chunks other jobs already rendered (see result_cache.FragmentCache)
+FRAGMENT_CACHE = os.getenv("XTTS_FRAGMENT_CACHE", "1") == "1"
+if os.getenv("XTTS_FRAGMENT_CHARS"):
+    print("⚠️ XTTS_FRAGMENT_CHARS is deprecated and ignored: every chunk is packed to XTTS_CHUNK_TOKENS")
+# How often deferred jobs are re-checked for admission
+ADMIT_POLL_S = float(os.getenv("XTTS_ADMIT_POLL_S", "2"))
 os.makedirs(JOBS_DIR, exist_ok=True)
 os.makedirs("outputs", exist_ok=True)
 
-job_queue = queue.Queue()
-engine = None
-
-def init_engine():
-    global engine
-    if engine is None:
-        from app.xtts_engine import XTTSVoiceCloner
-        engine = XTTSVoiceCloner()
-    return engine
-
-def get_job_path(job_id):
-    return os.path.join(JOBS_DIR, f"{job_id}.json")
+# Chunk tasks by priority lane, interleaved between users within a lane;
+# rebuilt from the job store on restart
+job_queue = LaneQueue(
+    capacity=int(os.getenv("XTTS_LANE_CAPACITY", max(1, POOL_SIZE) * BATCH_MAX_SIZE)),
+    reserved=parse_weights(os.getenv("XTTS_LANE_RESERVED", ""), cast=int),
+    limits=parse_weights(os.getenv("XTTS_LANE_LIMIT", ""), cast=int),
+    weights=parse_weights(os.getenv("XTTS_USER_WEIGHTS", ""))
+)
 
 def save_job(job_id, data):
-    with open(get_job_path(job_id), "w") as f:
-        json.dump(data, f)
+    job_store.save(job_id, data)
 
 def load_job(job_id):
-    path = get_job_path(job_id)
-    if os.path.exists(path):
-        with open(path) as f:
-            return json.load(f)
-    return None
+    return job_store.load(job_id)
 
 def split_text(text, max_chars=1000):
     """Split text into chunks for processing"""
@@ -56,99 +72,277 @@ def split_text(text, max_chars=1000):
     
     return chunks if chunks else [text]
 
-def merge_audio_files(file_list, output_path):
-    """Merge multiple audio files into one"""
-    combined = AudioSegment.empty()
-    for f in file_list:
-        if os.path.exists(f):
-            audio = AudioSegment.from_wav(f)
-            combined += audio
-    combined.export(output_path, format="wav")
-    # Cleanup temp files
-    for f in file_list:
-        if os.path.exists(f):
-            os.remove(f)
+# Chunks of jobs that are queued or running: job_id -> bookkeeping
+_active = {}
+_active_lock = threading.Lock()
+# (cache_key, priority) -> job_id of the in-flight job producing that output in
+# that lane (see submit_job); a duplicate never waits on a slower lane's leader
+_leaders = {}
+batcher = BatchCollector(job_queue)
+_post_pool = ThreadPoolExecutor(max_workers=POST_WORKERS, thread_name_prefix="tts-post")
 
-def worker():
-    """Background worker - processes TTS jobs"""
-    eng = init_engine()
-    
+def _start_chunk(task):
+    """Mark the job as processing on its first chunk. False if the job already failed."""
+    job_id = task["job_id"]
+    with _active_lock:
+        state = _active.get(job_id)
+        if state is None or state["failed"]:
+            return False
+        first = not state["started"]
+        state["started"] = True
+
+    if first:
+        job_store.transition(job_id, "processing", from_statuses=("queued",),
+                             started_at=datetime.now().isoformat())
+    return True
+
+def _chunk_done(task, wav):
+    job_id = task["job_id"]
+    with _active_lock:
+        state = _active[job_id]
+    buffer = state["buffer"]
+
+    if task.get("fragment_key"):
+        fragment_cache.put_array(task["fragment_key"], task["speaker_wav"], wav)
+
+    with state["lock"]:
+        buffer.put(task["index"], wav)
+        done, total = buffer.count, buffer.total
+
+        if total > 1:
+            # Buffered - flushed with other jobs' progress in one transaction
+            job_store.set_progress(job_id, progress=f"{done}/{total}")
+
+    _publish_segments(job_id)
+    if done == total:
+        _finalize_job(task, buffer)
+
+def _publish_segments(job_id):
+    """Encode chunks that extend the in-order prefix as playable segments (see app.segments)"""
+    with _active_lock:
+        state = _active.get(job_id)
+    if state is None or not state["publish"]:
+        return
+    buffer, segments = state["buffer"], state["segments"]
+    with state["publish_lock"]:
+        start = len(segments)
+        while len(segments) < buffer.total and not state["failed"] and not state["publish_failed"]:
+            samples = buffer.get(len(segments))
+            if samples is None:
+                break
+            try:
+                segments.append(write_segment(state["out_wav"], len(segments), samples, XTTS_SAMPLE_RATE))
+            except Exception as e:
+                # the job itself is unaffected - playback just waits for the final file
+                print(f"⚠️ Could not publish segment {len(segments)} of job {job_id}: {e}")
+                state["publish_failed"] = True
+        if len(segments) > start:
+            job_store.set_progress(job_id, segments=list(segments))
+
+def _finalize_job(task, buffer):
+    """All chunks synthesized - post-process once, encode every output from the same samples"""
+    job_id = task["job_id"]
+    out_wav = task["out_wav"]
+    _publish_segments(job_id)  # before the buffer is released
+    with _active_lock:
+        state = _active.get(job_id)
+    outputs = {"wav": out_wav}
+    if OUTPUT_MP3:
+        outputs["mp3"] = out_wav.replace(".wav", ".mp3")
+    try:
+        post_chain.render(post_chain.join(buffer, XTTS_SAMPLE_RATE), XTTS_SAMPLE_RATE, outputs)
+    finally:
+        buffer.release()
+    if task.get("cache_key"):
+        result_cache.put(task["cache_key"], task["speaker_wav"], out_wav)
+
+    # Update status to completed
+    extra = {"mp3_url": outputs["mp3"]} if OUTPUT_MP3 else {}
+    job_store.transition(
+        job_id, "completed", from_statuses=("queued", "processing"),
+        completed_at=datetime.now().isoformat(),
+        audio_url=out_wav,
+        **extra
+    )
+
+    with _active_lock:
+        followers = _retire(job_id)
+    for follower_id in followers:
+        _complete_follower(follower_id, out_wav)
+    if state and state["segments"]:
+        # players that started on the segments can finish them; later ones get the final file
+        remove_segments(out_wav, delay=sum(state["segments"]) + SEGMENT_KEEP_S)
+
+def _finalize_or_fail(task, buffer):
+    """_finalize_job for a job with nothing left to synthesize; errors fail it like a chunk's would"""
+    try:
+        _finalize_job(task, buffer)
+    except Exception as e:
+        _chunk_failed(task, e)
+
+def _chunk_failed(task, error):
+    job_id = task["job_id"]
+    with _active_lock:
+        state = _active.get(job_id)
+        if state is None:
+            return  # another chunk already failed this job
+        state["failed"] = True
+        followers = _retire(job_id)
+
+    for failed_id in [job_id] + followers:
+        job_store.transition(
+            failed_id, "failed", from_statuses=("queued", "processing"),
+            error=str(error),
+            failed_at=datetime.now().isoformat()
+        )
+
+    # under the job's lock: a chunk finishing now must not put into a buffer mid-release
+    with state["lock"]:
+        state["buffer"].release()
+    if state["publish"]:
+        with state["publish_lock"]:
+            remove_segments(state["out_wav"])
+
+def _retire(job_id):
+    """Drop a finished job's bookkeeping (call with _active_lock held). Returns its followers."""
+    state = _active.pop(job_id, None)
+    if state is None:
+        return []
+    key = (state["cache_key"], state["priority"])
+    if _leaders.get(key) == job_id:
+        del _leaders[key]
+    return state["followers"]
+
+def _complete_follower(job_id, leader_wav):
+    """A coalesced duplicate gets its own link to the leader's output"""
+    job = load_job(job_id)
+    if job is None:
+        return
+    try:
+        link_or_copy(leader_wav, job["out_wav"])
+        extra = {}
+        if OUTPUT_MP3:
+            link_or_copy(leader_wav.replace(".wav", ".mp3"), job["out_wav"].replace(".wav", ".mp3"))
+            extra["mp3_url"] = job["out_wav"].replace(".wav", ".mp3")
+    except OSError as e:
+        job_store.transition(job_id, "failed", from_statuses=("queued", "processing"),
+                             error=str(e), failed_at=datetime.now().isoformat())
+        return
+    job_store.transition(
+        job_id, "completed", from_statuses=("queued", "processing"),
+        completed_at=datetime.now().isoformat(),
+        audio_url=job["out_wav"],
+        **extra
+    )
+
+def _attach_follower(job):
+    """
+    Coalesce with an identical job of the same priority that is still queued
+    or running. The duplicate keeps its own record (and billing) and
+    completes with it.
+    """
+    with _active_lock:
+        leader_id = _leaders.get((job.get("cache_key"), job.get("priority", "standard")))
+        leader = _active.get(leader_id)
+        if leader is None or leader["failed"]:
+            return False
+        job["coalesced_with"] = leader_id
+        # saved under the lock so the leader can't finish before the record exists
+        save_job(job["job_id"], job)
+        leader["followers"].append(job["job_id"])
+        return True
+
+def next_tasks():
+    """Block until a batch of runnable chunk tasks is available"""
     while True:
-        job_data = job_queue.get()
-        job_id = job_data["job_id"]
-        
-        try:
-            # Update status
-            job = load_job(job_id)
-            job["status"] = "processing"
-            job["started_at"] = datetime.now().isoformat()
-            save_job(job_id, job)
-            
-            text = job_data["text"]
-            speaker_wav = job_data["speaker_wav"]
-            out_wav = job_data["out_wav"]
-            language = job_data.get("language", "en")
-            
-            # Split long text into chunks
-            chunks = split_text(text, max_chars=1000)
-            
-            if len(chunks) == 1:
-                # Short text - direct generation
-                eng.generate(
-                    text=chunks[0],
-                    speaker_wav=speaker_wav,
-                    out_path=out_wav,
-                    language=language
-                )
+        batch = batcher.next_batch()
+        tasks = []
+        for task in batch:
+            if _start_chunk(task):
+                tasks.append(task)
             else:
-                # Long text - generate chunks and merge
-                temp_files = []
-                for i, chunk in enumerate(chunks):
-                    temp_out = out_wav.replace(".wav", f"_part{i}.wav")
-                    eng.generate(
-                        text=chunk,
-                        speaker_wav=speaker_wav,
-                        out_path=temp_out,
-                        language=language
-                    )
-                    temp_files.append(temp_out)
-                    
-                    # Update progress
-                    job = load_job(job_id)
-                    job["progress"] = f"{i+1}/{len(chunks)}"
-                    save_job(job_id, job)
-                
-                # Merge all parts
-                merge_audio_files(temp_files, out_wav)
-            
-            # Update status to completed
-            job = load_job(job_id)
-            job["status"] = "completed"
-            job["completed_at"] = datetime.now().isoformat()
-            job["audio_url"] = out_wav
-            save_job(job_id, job)
-            
-        except Exception as e:
-            job = load_job(job_id)
-            job["status"] = "failed"
-            job["error"] = str(e)
-            job["failed_at"] = datetime.now().isoformat()
-            save_job(job_id, job)
-        
-        finally:
-            job_queue.task_done()
-
-# Start worker thread
-threading.Thread(target=worker, daemon=True).start()
-
-def submit_job(user_id, voice_name, text, language="en"):
-    """Submit TTS job - returns immediately"""
-    job_id = str(uuid.uuid4())
+                job_queue.release(task)
+        if tasks:
+            return tasks
+
+def finish_task(task, result, seconds=None):
+    """
+    Route one synthesized chunk (waveform) or its Exception back to its job.
+    Buffering, progress writes and the final merge/encode run on the
+    post-processing pool so the engine can start on the next chunk right away.
+    """
+    if seconds and not isinstance(result, Exception):
+        throughput.record(task["language"], len(task["text"]), seconds, len(result) / XTTS_SAMPLE_RATE)
+    # the engine is done with the chunk: its lane slot goes to the next one now,
+    # not after the post-processing (for a last chunk, the whole render) below
+    job_queue.release(task)
+    _post_pool.submit(_finish_task, task, result)
+
+def _finish_task(task, result):
+    try:
+        if isinstance(result, Exception):
+            _chunk_failed(task, result)
+        else:
+            _chunk_done(task, result)
+    except Exception as e:
+        _chunk_failed(task, e)
+
+def requeue_tasks(tasks):
+    for task in tasks:
+        job_queue.release(task)
+        job_queue.put(task, front=True)
+
+def worker():
+    """Background worker - processes TTS chunks in batches"""
+    while True:
+        tasks = next_tasks()
+        eng = get_engine()  # loads on the first batch unless warmed up already
+        clock = [time.perf_counter()]
+
+        def on_result(i, result):
+            # chunks of a batch run back to back: compute time = time since the previous one
+            now = time.perf_counter()
+            seconds, clock[0] = now - clock[0], now
+            finish_task(tasks[i], result, seconds)
+
+        eng.generate_batch(tasks, on_result=on_result)
+
+# Engine workers: a pool of processes, or one thread in this process
+pool = None
+_workers_started = False
+_workers_lock = threading.Lock()
+
+def start_workers():
+    """
+    Startup hook - start the engine workers (and the deferred-admission
+    loop). Not done at import: a pre-fork pool loads the model in this
+    process, which importing the module for a CLI or a test must not do.
+    """
+    global pool, _workers_started
+    with _workers_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+        if POOL_SIZE > 0:
+            pool = WorkerPool(POOL_SIZE, next_tasks, finish_task, requeue_tasks).start()
+        else:
+            threading.Thread(target=worker, daemon=True).start()
+        if admission.mode == "defer":
+            threading.Thread(target=_admit_deferred, daemon=True).start()
+
+def get_speaker_wav(user_id, voice_name):
     voice_clean = voice_name.lower().replace(" ", "_")
     speaker_wav = f"voices/{user_id}/{voice_clean}/ref.wav"
     
     if not os.path.exists(speaker_wav):
         raise FileNotFoundError(f"Voice not found: {voice_name}")
+    return speaker_wav
+
+def submit_job(user_id, voice_name, text, language="en", priority="standard", segments=None):
+    """Submit TTS job - returns immediately. segments: publish playable segments (None = XTTS_SEGMENTS)"""
+    job_id = str(uuid.uuid4())
+    voice_clean = voice_name.lower().replace(" ", "_")
+    speaker_wav = get_speaker_wav(user_id, voice_name)
     
     out_dir = f"outputs/{user_id}/{voice_clean}"
     os.makedirs(out_dir, exist_ok=True)
@@ -161,21 +355,294 @@ def submit_job(user_id, voice_name, text, language="en"):
         "text": text,
         "text_length": len(text),
         "language": language,
+        "priority": priority,
         "status": "queued",
         "created_at": datetime.now().isoformat(),
         "speaker_wav": speaker_wav,
-        "out_wav": out_wav
+        "out_wav": out_wav,
+        "segments_enabled": SEGMENTS if segments is None else bool(segments)
     }
+
+    # Split long text into chunks that fit one XTTS call - each chunk is
+    # scheduled on its own. The texts are stored so a restarted service
+    # resumes the same chunks. With the fragment cache each chunk's audio
+    # is also cached on its own, for later jobs that produce the same chunk;
+    # sentences shared with earlier jobs are kept out of the packing for that.
+    keep = None
+    if FRAGMENT_CACHE:
+        def keep(sentence):
+            return fragment_cache.shared(fragment_cache.key(sentence, speaker_wav, language))
+    chunks = chunk_text(text, language, keep=keep)
+    job_data["chunks"] = len(chunks)
+    job_data["chunk_texts"] = chunks
+    job_data["fragments"] = FRAGMENT_CACHE
+    job_data["cache_key"] = result_cache.key(text, speaker_wav, language)
+
+    # Identical job already in flight (retry, double click): ride along with it.
+    # Checked before the result cache - a leader stores its output there before
+    # it stops taking followers, so one of the two always catches a duplicate.
+    if _attach_follower(job_data):
+        admission.count(priority, "coalesced", len(text))
+        return job_id
+
+    # Same text, voice, language and engine as an earlier job: reuse its audio
+    cached = result_cache.get(job_data["cache_key"])
+    if cached:
+        link_or_copy(cached, out_wav)
+        now = datetime.now().isoformat()
+        job_data.update(status="completed", cache_hit=True, started_at=now, completed_at=now, audio_url=out_wav)
+        if OUTPUT_MP3:
+            job_data["mp3_url"] = transcode(out_wav, {"mp3": out_wav.replace(".wav", ".mp3")})["mp3"]
+        save_job(job_id, job_data)
+        admission.count(priority, "cache_hits", len(text))
+        return job_id
+
+    wait_s = backlog_seconds(priority)
+    retry_after = admission.retry_after(priority, wait_s)
+    if retry_after is not None:
+        if admission.mode != "defer":
+            admission.count(priority, "rejected", len(text))
+            raise QueueFull(priority, wait_s, retry_after)
+        job_data["status"] = "deferred"
+        save_job(job_id, job_data)
+        admission.count(priority, "deferred", len(text))
+        return job_id
+
     save_job(job_id, job_data)
-    job_queue.put(job_data)
-    
+    admission.count(priority, "admitted", len(text))
+    _enqueue_job(job_data)
     return job_id
 
+def backlog_seconds(priority):
+    """
+    Estimated compute seconds of work ahead of a new job in `priority`'s lane:
+    queued in that lane and the ones served before it, plus chunks in flight.
+    """
+    engines = max(1, POOL_SIZE)
+    queued = job_queue.queued_chars(priority) * throughput.sec_per_char()
+    running = job_queue.in_flight() * throughput.sec_per_chunk()
+    return (queued + running) / engines
+
+def _admit_deferred():
+    """Move deferred jobs into the queue, oldest first, as their lanes drain"""
+    while True:
+        time.sleep(ADMIT_POLL_S)
+        try:
+            for job in job_store.by_status(("deferred",)):
+                priority = job.get("priority", "standard")
+                wait_s = backlog_seconds(priority)
+                if admission.retry_after(priority, wait_s) is not None:
+                    continue
+                job = job_store.transition(job["job_id"], "queued", from_statuses=("deferred",),
+                                           admitted_at=datetime.now().isoformat())
+                if job:
+                    admission.count(priority, "admitted_deferred", job["text_length"])
+                    _enqueue_job(job)
+        except Exception as e:
+            print(f"⚠️ Deferred admission failed: {e}")
+
+def _enqueue_job(job, restore=False):
+    """Register a job's bookkeeping and queue the chunks it still needs"""
+    job_id = job["job_id"]
+    chunks = job["chunk_texts"]
+    buffer = ChunkBuffer(
+        len(chunks),
+        os.path.join(CHUNKS_DIR, job_id),
+        checkpoint=CHECKPOINT_CHUNKS and len(chunks) > 1
+    )
+    done = set(buffer.restore()) if restore else set()
+
+    keys = [None] * len(chunks)
+    if job.get("fragments"):
+        reused, seconds = 0, 0.0
+        for i, chunk in enumerate(chunks):
+            keys[i] = fragment_cache.key(chunk, job["speaker_wav"], job["language"])
+            if i in done:
+                continue
+            samples = fragment_cache.load(keys[i])
+            if samples is not None:
+                buffer.put(i, samples, checkpoint=False)
+                done.add(i)
+                reused += 1
+                seconds += len(samples) / XTTS_SAMPLE_RATE
+        if reused:
+            job_store.update(job_id, fragments_reused=reused, seconds_reused=round(seconds, 1))
+
+    if done:
+        job_store.set_progress(job_id, progress=f"{len(done)}/{len(chunks)}")
+
+    with _active_lock:
+        _active[job_id] = {
+            "lock": threading.Lock(),
+            "started": job["status"] != "queued",
+            "failed": False,
+            "buffer": buffer,
+            "cache_key": job.get("cache_key"),
+            "priority": job.get("priority", "standard"),
+            "followers": [],
+            "out_wav": job["out_wav"],
+            "publish": job.get("segments_enabled", False),
+            "segments": published(job["out_wav"], job.get("segments")) if restore else [],
+            "publish_lock": threading.Lock(),
+            "publish_failed": False
+        }
+        if job.get("cache_key"):
+            _leaders.setdefault((job["cache_key"], job.get("priority", "standard")), job_id)
+
+    tasks = [{
+        "job_id": job_id,
+        "user_id": job["user_id"],
+        "priority": job.get("priority", "standard"),
+        "index": i,
+        "total": len(chunks),
+        "text": chunk,
+        "speaker_wav": job["speaker_wav"],
+        "language": job["language"],
+        "out_wav": job["out_wav"],
+        "cache_key": job.get("cache_key"),
+        "fragment_key": keys[i]
+    } for i, chunk in enumerate(chunks)]
+
+    if buffer.complete:
+        # every chunk was checkpointed or cached; only the merge is left
+        _post_pool.submit(_finalize_or_fail, tasks[-1], buffer)
+        return 0
+    if done:
+        _post_pool.submit(_publish_segments, job_id)
+
+    for task in tasks:
+        if task["index"] not in done:
+            job_queue.put(task)
+    return len(tasks) - len(done)
+
+def recover_jobs():
+    """
+    Startup hook - requeue jobs a previous process left queued or processing.
+    Chunks checkpointed before the restart are not synthesized again.
+    """
+    resumed = 0
+    for job in job_store.by_status(("queued", "processing")):
+        if job["job_id"] in _active:
+            continue
+        if job.get("coalesced_with"):
+            # oldest first, so a live leader has been resumed already
+            if _attach_follower(job):
+                continue
+            leader = load_job(job["coalesced_with"])
+            if leader and leader["status"] == "completed":
+                _complete_follower(job["job_id"], leader["audio_url"])
+                continue
+            # leader is gone - run the job on its own
+        if "chunk_texts" not in job:
+            # submitted before chunk texts were stored
+            job["chunk_texts"] = split_text(job["text"], max_chars=1000)
+            job_store.update(job["job_id"], chunk_texts=job["chunk_texts"])
+        try:
+            remaining = _enqueue_job(job, restore=True)
+        except Exception as e:
+            print(f"⚠️ Could not resume job {job['job_id']}: {e}")
+            job_store.transition(job["job_id"], "failed", error=f"resume failed: {e}",
+                                 failed_at=datetime.now().isoformat())
+            continue
+        resumed += 1
+        print(f"↻ Resumed job {job['job_id']}: {remaining}/{len(job['chunk_texts'])} chunk(s) left")
+    _expire_segments()
+    return resumed
+
+def _expire_segments():
+    """Re-arm segment deletion for finished jobs (the timers died with the last process)"""
+    for job_id, out_wav, age in segment_dirs():
+        job = load_job(job_id)
+        if job and job["status"] in ("queued", "processing", "deferred"):
+            continue
+        keep = sum(job.get("segments") or []) + SEGMENT_KEEP_S if job and job["status"] == "completed" else 0
+        remove_segments(out_wav, delay=keep - age)
+
+class StreamingUnavailable(Exception):
+    pass
+
+def stream_tts(user_id, voice_name, text, language="en"):
+    """
+    Synthesize directly (bypassing the queue), yielding audio chunks as they
+    are produced. Runs on this process's engine, so it is refused in pool
+    mode, where the model lives in the workers and loading it here would
+    hold a second copy in memory.
+    """
+    if POOL_SIZE:
+        raise StreamingUnavailable("Streaming is not available with XTTS_WORKERS > 0; submit a job to /tts instead")
+    speaker_wav = get_speaker_wav(user_id, voice_name)
+    eng = get_engine()
+    return eng.sample_rate, eng.stream(text=text, speaker_wav=speaker_wav, language=language)
+
+def warm_voice(speaker_wav):
+    """Precompute a new voice's latents in the background"""
+    if not POOL_SIZE:
+        threading.Thread(target=lambda: get_engine().warm_latents(speaker_wav), daemon=True).start()
+    elif loaded_engine() is not None:
+        loaded_engine().warm_latents(speaker_wav)
+    # otherwise the first worker that uses the voice fills the shared disk tier
+
+def warm_up_engine():
+    """Startup hook - in pool mode the worker processes own the model"""
+    if not POOL_SIZE:
+        warm_up()
+
+def get_readiness():
+    status = {"engine": engine_status()}
+    if pool is None:
+        status["ready"] = status["engine"]["state"] == "ready"
+    else:
+        workers = pool.stats()["workers"]
+        status["workers_ready"] = sum(1 for w in workers if w["ready"])
+        status["workers"] = len(workers)
+        status["ready"] = status["workers_ready"] > 0
+    return status
+
+def estimate_job(job):
+    """
+    Where a queued or running job stands: chunks ahead of its next chunk and
+    seconds until it completes, from the measured throughput per language.
+    """
+    job_id = job["job_id"]
+    with _active_lock:
+        state = _active.get(job_id)
+    if state is None:
+        return {}
+
+    parts = state["buffer"].parts
+    texts = job.get("chunk_texts") or []
+    remaining = [len(t) for i, t in enumerate(texts) if i < len(parts) and parts[i] is None]
+    engines = max(1, POOL_SIZE)
+
+    pos = job_queue.position(job_id, job.get("priority"))
+    ahead = pos[0] if pos else 0
+    # Chunks taken off the queue but not started yet (batched behind the one
+    # an engine is running) are ahead too, unless they are this job's own
+    own_in_flight = len(remaining) - (pos[1] if pos else 0)
+    ahead += max(0, job_queue.in_flight() - own_in_flight - engines)
+    ahead_s = ahead * throughput.sec_per_chunk() / engines
+    own_s = throughput.seconds(job["language"], sum(remaining)) / min(engines, max(1, len(remaining)))
+    return {
+        "queue_position": ahead,
+        "chunks_remaining": len(remaining),
+        "eta_seconds": round(ahead_s + own_s, 1)
+    }
+
 def get_job_status(job_id):
     job = load_job(job_id)
     if not job:
         return None
-    return {
+    if job.get("coalesced_with") and job["status"] in ("queued", "processing"):
+        # a coalesced duplicate reports the progress of the job doing the work
+        leader = load_job(job["coalesced_with"])
+        if leader and leader["status"] in ("queued", "processing"):
+            return dict(
+                get_job_status(leader["job_id"]),
+                job_id=job_id,
+                created_at=job.get("created_at"),
+                coalesced_with=leader["job_id"]
+            )
+    status = {
         "job_id": job["job_id"],
         "status": job["status"],
         "progress": job.get("progress"),
@@ -183,8 +650,61 @@ def get_job_status(job_id):
         "started_at": job.get("started_at"),
         "completed_at": job.get("completed_at"),
         "audio_url": job.get("audio_url"),
-        "error": job.get("error")
+        "error": job.get("error"),
+        "seconds_reused": job.get("seconds_reused"),
+        "segments_enabled": job.get("segments_enabled", False)
+    }
+    if job["status"] in ("queued", "processing"):
+        status.update(estimate_job(job))
+    return status
+
+def get_playlist(job_id):
+    """
+    Segments published so far, in order. A finished job whose chunks are
+    not all there (cache hit, coalesced duplicate, segments off or already
+    deleted) is one segment: the whole output in SEGMENT_FORMAT.
+    """
+    job = load_job(job_id)
+    if not job:
+        return None
+    if job.get("coalesced_with") and job["status"] in ("queued", "processing"):
+        leader = load_job(job["coalesced_with"])
+        if leader and leader["status"] in ("queued", "processing"):
+            return dict(get_playlist(leader["job_id"]), job_id=job_id)
+
+    segments = [
+        {"index": i, "path": segment_path(job["out_wav"], i), "duration": seconds}
+        for i, seconds in enumerate(published(job["out_wav"], job.get("segments")))
+    ]
+    if job["status"] == "completed" and len(segments) != len(job.get("chunk_texts") or ()):
+        whole = os.path.splitext(job["audio_url"])[0] + FORMATS[SEGMENT_FORMAT][0]
+        segments = [{"index": 0, "path": whole, "duration": round(audio_duration(job["audio_url"]), 3)}]
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "ended": job["status"] in ("completed", "failed"),
+        "segments": segments,
+        "audio_url": job.get("audio_url")
     }
 
 def get_queue_size():
-    return job_queue.qsize()
+    """Number of jobs that have not started yet"""
+    with _active_lock:
+        return sum(1 for state in _active.values() if not state["started"])
+
+def get_batch_stats():
+    return batcher.stats()
+
+def get_result_cache_stats():
+    return {"outputs": result_cache.stats(), "fragments": fragment_cache.stats()}
+
+def get_admission_stats():
+    return admission.stats()
+
+def get_scheduler_stats():
+    return dict(job_queue.backlog(), throughput=throughput.stats())
+
+def get_worker_stats():
+    if pool is None:
+        return {"mode": "thread", "workers": [{"worker": "in-process", "alive": True}]}
+    return pool.stats()
@@ -0,0 +1,237 @@
+"""
+SQLite job store shared by TTS and training jobs.
+
+One row per job, the full job dict kept as JSON next to indexed columns
+(status, user_id, created_at). WAL mode lets status readers run while a
+worker writes. Per-chunk progress is buffered and flushed in batches.
+
+Import the old one-file-per-job layout with:
+    python -m app.job_store migrate
+(also done automatically the first time the store opens next to jobs/*.json)
+"""
+
+import os
+import sys
+import json
+import glob
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+JOBS_DIR = "jobs"
+JOB_DB = os.getenv("XTTS_JOB_DB", os.path.join(JOBS_DIR, "jobs.db"))
+PROGRESS_FLUSH_MS = float(os.getenv("XTTS_PROGRESS_FLUSH_MS", "500"))
+# Buffered progress never applies to a job in one of these: the transition
+# there wrote the job's final fields
+FINAL_STATUSES = ("completed", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id     TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL DEFAULT 'tts',
+    user_id    TEXT,
+    status     TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(kind, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+"""
+
+
+class JobStore:
+    def __init__(self, path: str = JOB_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._pending = {}   # job_id -> fields waiting for the next progress flush
+        self._pending_lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+        threading.Thread(target=self._flusher, daemon=True).start()
+
+    def _conn(self):
+        """One connection per thread; autocommit unless we BEGIN explicitly"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- reads ----------
+
+    def load(self, job_id: str, kind: str = "tts"):
+        row = self._conn().execute(
+            "SELECT data FROM jobs WHERE job_id = ? AND kind = ?", (job_id, kind)
+        ).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        if job.get("status") not in FINAL_STATUSES:
+            with self._pending_lock:
+                job.update(self._pending.get(job_id, {}))
+        return job
+
+    def by_status(self, statuses, kind: str = "tts"):
+        marks = ",".join("?" * len(statuses))
+        rows = self._conn().execute(
+            f"SELECT data FROM jobs WHERE kind = ? AND status IN ({marks}) ORDER BY created_at",
+            (kind, *statuses)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def count_by_status(self, kind: str = "tts"):
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE kind = ? GROUP BY status", (kind,)
+        ).fetchall()
+        return dict(rows)
+
+    # ---------- writes ----------
+
+    def save(self, job_id: str, data: dict, kind: str = "tts"):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, kind, user_id, status, created_at, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, data.get("user_id"), data.get("status", "queued"),
+             data.get("created_at"), datetime.now().isoformat(), json.dumps(data))
+        )
+
+    def update(self, job_id: str, kind: str = "tts", **fields):
+        """Atomically merge fields into a job. Returns the new job, or None if it doesn't exist."""
+        return self._modify(job_id, kind, None, fields)
+
+    def transition(self, job_id: str, status: str, from_statuses=None, kind: str = "tts", **fields):
+        """
+        Atomically move a job to `status` (merging fields), but only if its
+        current status is in from_statuses. Returns the new job or None.
+        """
+        return self._modify(job_id, kind, from_statuses, dict(fields, status=status))
+
+    def set_progress(self, job_id: str, **fields):
+        """Buffered update for hot fields like per-chunk progress"""
+        with self._pending_lock:
+            self._pending.setdefault(job_id, {}).update(fields)
+
+    def _modify(self, job_id, kind, from_statuses, fields):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ? AND kind = ?", (job_id, kind)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            job = json.loads(row[0])
+            if from_statuses is not None and job.get("status") not in from_statuses:
+                conn.execute("ROLLBACK")
+                return None
+
+            with self._pending_lock:
+                pending = self._pending.pop(job_id, {})
+            if job.get("status") not in FINAL_STATUSES:
+                job.update(pending)
+            job.update(fields)
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE job_id = ?",
+                (job.get("status"), datetime.now().isoformat(), json.dumps(job), job_id)
+            )
+            conn.execute("COMMIT")
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _flusher(self):
+        while True:
+            time.sleep(PROGRESS_FLUSH_MS / 1000)
+            self.flush()
+
+    def flush(self):
+        with self._pending_lock:
+            if not self._pending:
+                return
+
+        conn = self._conn()
+        # Take the buffered fields only once we hold the write lock: a
+        # transition committed before that has already merged (and removed)
+        # them, and one waiting behind us will find them written
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for job_id, fields in pending.items():
+                row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    continue
+                job = json.loads(row[0])
+                if job.get("status") in FINAL_STATUSES:
+                    continue  # reported after the job finished - the row is newer
+                job.update(fields)
+                conn.execute(
+                    "UPDATE jobs SET updated_at = ?, data = ? WHERE job_id = ?",
+                    (datetime.now().isoformat(), json.dumps(job), job_id)
+                )
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            print(f"Progress flush failed: {e}")
+
+    # ---------- migration ----------
+
+    def migrate_json(self, jobs_dir: str = JOBS_DIR):
+        """Import jobs/*.json and jobs/train_*.json, then move them to jobs/migrated/"""
+        files = sorted(glob.glob(os.path.join(jobs_dir, "*.json")))
+        if not files:
+            return 0
+
+        done_dir = os.path.join(jobs_dir, "migrated")
+        os.makedirs(done_dir, exist_ok=True)
+        conn = self._conn()
+        imported = 0
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for path in files:
+                name = os.path.basename(path)[:-len(".json")]
+                kind = "train" if name.startswith("train_") else "tts"
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Skipping unreadable job file {path}: {e}")
+                    continue
+                job_id = data.get("job_id") or (name[len("train_"):] if kind == "train" else name)
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs (job_id, kind, user_id, status, created_at, updated_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, data.get("user_id") or data.get("voice_id"), data.get("status", "queued"),
+                     data.get("created_at"), datetime.now().isoformat(), json.dumps(data))
+                )
+                imported += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        for path in files:
+            shutil.move(path, os.path.join(done_dir, os.path.basename(path)))
+        print(f"✅ Migrated {imported} job file(s) into {self.path}")
+        return imported
+
+
+job_store = JobStore()
+if glob.glob(os.path.join(JOBS_DIR, "*.json")):
+    job_store.migrate_json()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        job_store.migrate_json()
+    else:
+        print("usage: python -m app.job_store migrate")
@@ -0,0 +1,151 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# In-memory tier size (number of reference voices kept hot)
+LATENT_CACHE_SIZE = int(os.getenv("XTTS_LATENT_CACHE_SIZE", "64"))
+LATENT_FILE = "latents.npz"
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's content"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class LatentCache:
+    """
+    Speaker conditioning latents keyed by reference-audio content hash.
+
+    Two tiers:
+      - memory: LRU of the last LATENT_CACHE_SIZE voices
+      - disk:   voices/<user>/<voice>/latents.npz next to ref.wav
+    """
+
+    def __init__(self, max_entries: int = LATENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._mem = OrderedDict()   # ref hash -> (gpt_cond_latent, speaker_embedding)
+        self._hashes = {}           # ref path -> (mtime, size, ref hash)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def ref_hash(self, ref_wav: str) -> str:
+        """Content hash of a reference file, memoized on (mtime, size)"""
+        st = os.stat(ref_wav)
+        with self._lock:
+            known = self._hashes.get(ref_wav)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+
+        digest = file_hash(ref_wav)
+        with self._lock:
+            self._hashes[ref_wav] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def get(self, ref_wav: str, compute):
+        """
+        Return (gpt_cond_latent, speaker_embedding) for ref_wav.
+        `compute(ref_wav)` is only called on a miss in both tiers.
+        """
+        key = self.ref_hash(ref_wav)
+
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return self._mem[key]
+
+        latents = self._load(ref_wav, key)
+        if latents is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            latents = compute(ref_wav)
+            self._store(ref_wav, key, latents)
+
+        self._remember(key, latents)
+        return latents
+
+    def warm(self, ref_wav: str, compute):
+        """Fill both tiers in the background (used right after a clone)"""
+        def _run():
+            try:
+                self.get(ref_wav, compute)
+            except Exception as e:
+                print(f"Latent warm-up failed for {ref_wav}: {e}")
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def invalidate(self, voice_dir: str):
+        """Drop every cached latent that belongs to a voice folder"""
+        prefix = os.path.join(os.path.normpath(voice_dir), "")
+        with self._lock:
+            for path in list(self._hashes):
+                if os.path.normpath(path).startswith(prefix):
+                    _, _, key = self._hashes.pop(path)
+                    self._mem.pop(key, None)
+
+        latent_path = os.path.join(voice_dir, LATENT_FILE)
+        if os.path.exists(latent_path):
+            os.remove(latent_path)
+
+    def stats(self):
+        return {
+            "entries": len(self._mem),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses
+        }
+
+    # ---------- internals ----------
+
+    def _remember(self, key, latents):
+        with self._lock:
+            self._mem[key] = latents
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def _load(self, ref_wav, key):
+        path = os.path.join(os.path.dirname(ref_wav), LATENT_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if str(data["ref_hash"]) != key:
+                    return None  # voice was re-cloned, stale file
+                gpt_cond_latent, speaker_embedding = data["gpt_cond_latent"], data["speaker_embedding"]
+        except Exception as e:
+            print(f"Ignoring unreadable latent file {path}: {e}")
+            return None
+
+        import torch
+        return torch.from_numpy(gpt_cond_latent), torch.from_numpy(speaker_embedding)
+
+    def _store(self, ref_wav, key, latents):
+        gpt_cond_latent, speaker_embedding = latents
+        path = os.path.join(os.path.dirname(ref_wav), LATENT_FILE)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    ref_hash=np.array(key),
+                    gpt_cond_latent=gpt_cond_latent.detach().cpu().numpy(),
+                    speaker_embedding=speaker_embedding.detach().cpu().numpy()
+                )
+            os.replace(tmp, path)
+        except OSError as e:
+            # voice deleted while we were computing - memory tier is still fine
+            print(f"Could not persist latents to {path}: {e}")
+
+
+latent_cache = LatentCache()
@@ -1,22 +1,48 @@
 from dotenv import load_dotenv
-import json, os
+import json, os, mimetypes
+from typing import Optional
 load_dotenv()
-from fastapi import FastAPI, UploadFile, Form, Depends, HTTPException
+from fastapi import FastAPI, UploadFile, Form, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from app.training import training_router
-from fastapi.staticfiles import StaticFiles
 from app.clone_voice import clone_voice, delete_voice
 from app.voice_service import set_voice_public
 from app.utils import get_user_voices, get_public_voices
 from app.admin_service import list_all_voices, admin_delete_voice
 from app.deps import admin_auth
-from app.job_manager import submit_job, get_job_status, get_queue_size
+from app.scheduler import LANES
+from app.admission import QueueFull
+from app.job_manager import submit_job, get_job_status, get_queue_size, get_batch_stats, get_scheduler_stats, get_admission_stats, get_result_cache_stats, get_worker_stats, get_readiness, start_workers, warm_up_engine, recover_jobs, stream_tts, get_playlist, StreamingUnavailable
+from app.audio_utils import pcm16, wav_header
+from app.output_store import encoding_store, negotiate_format, UnsupportedFormat, FORMATS
+from app.segments import hls_playlist
 
 app = FastAPI()
 
 app.include_router(training_router, prefix="/training", tags=["Training"])
-# Serve output audio files
-os.makedirs("outputs", exist_ok=True)
-app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
+# Output audio files are served by download_output below
+OUTPUTS_DIR = os.path.abspath("outputs")
+os.makedirs(OUTPUTS_DIR, exist_ok=True)
+
+@app.on_event("startup")
+def load_engine():
+    start_workers()
+    if os.getenv("XTTS_WARMUP", "1") == "1":
+        warm_up_engine()
+
+@app.on_event("startup")
+def resume_jobs():
+    """Requeue jobs interrupted by the last shutdown (finished chunks are kept)"""
+    recover_jobs()
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once an engine can take work, 503 while loading"""
+    status = get_readiness()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
 @app.post("/clone-voice")
 async def clone(audio: UploadFile, user_id: str = Form(...), voice_name: str = Form(...)):
@@ -41,21 +67,30 @@ async def tts_submit(
     user_id: str = Form(...), 
     voice_name: str = Form(...), 
     text: str = Form(...), 
-    language: str = Form("en")
+    language: str = Form("en"),
+    priority: str = Form("standard"),
+    segments: Optional[bool] = Form(None)
 ):
-    """Submit TTS job - returns job_id immediately"""
+    """Submit TTS job - returns job_id immediately. segments=true: playable while running (see /tts/playlist)"""
     # Limit check
     if len(text) > 30000:
         raise HTTPException(status_code=400, detail="Text too long. Max 30000 characters.")
+    if priority not in LANES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(LANES)}")
     
     try:
-        job_id = submit_job(user_id, voice_name, text, language)
+        job_id = submit_job(user_id, voice_name, text, language, priority, segments)
+        status = get_job_status(job_id) or {}
         return {
-            "status": "queued",
+            "status": status.get("status", "queued"),
             "job_id": job_id,
             "queue_size": get_queue_size(),
+            "queue_position": status.get("queue_position"),
+            "eta_seconds": status.get("eta_seconds"),
             "message": "Job submitted. Poll /tts/status/{job_id} for progress."
         }
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -75,9 +110,18 @@ def tts_status(job_id: str):
         "created_at": status["created_at"]
     }
     
+    if status["status"] in ("queued", "processing"):
+        # queue_position counts chunks (of any job) served before this job's next one
+        resp["queue_position"] = status.get("queue_position")
+        resp["eta_seconds"] = status.get("eta_seconds")
+        if status.get("segments_enabled"):
+            # playable before the job finishes - see /tts/playlist
+            resp["playlist_url"] = f"/tts/playlist/{job_id}.m3u8"
+
     if status["status"] == "queued":
-        resp["queue_position"] = get_queue_size()
         resp["message"] = "Waiting in queue..."
+    elif status["status"] == "deferred":
+        resp["message"] = "Server busy - job will be queued when capacity frees up"
     elif status["status"] == "processing":
         resp["started_at"] = status["started_at"]
         resp["message"] = f"Generating... {status.get('progress', '')}"
@@ -91,6 +135,201 @@ def tts_status(job_id: str):
     
     return resp
 
+# ============ PROGRESSIVE PLAYBACK ============
+
+def _output_url(path: str) -> str:
+    return f"/outputs/{path.replace('outputs/', '', 1)}"
+
+def _playlist(job_id: str):
+    playlist = get_playlist(job_id)
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Job not found")
+    for segment in playlist["segments"]:
+        segment["url"] = _output_url(segment.pop("path"))
+    if playlist["audio_url"]:
+        playlist["audio_url"] = _output_url(playlist["audio_url"])
+    return playlist
+
+# declared before /tts/playlist/{job_id}, which would match "<id>.m3u8" too
+@app.get("/tts/playlist/{job_id}.m3u8")
+def tts_playlist_hls(job_id: str):
+    """HLS EVENT playlist of the segments published so far; ends with the job"""
+    playlist = _playlist(job_id)
+    return PlainTextResponse(
+        hls_playlist(playlist["segments"], playlist["ended"]),
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-store"}
+    )
+
+@app.get("/tts/playlist/{job_id}")
+def tts_playlist(job_id: str):
+    """The same segments as JSON: [{index, url, duration}], ended once the job is finished"""
+    return JSONResponse(_playlist(job_id), headers={"Cache-Control": "no-store"})
+
+# ============ OUTPUT DOWNLOADS ============
+
+RANGE_BLOCK = 1 << 16
+
+def _parse_range(header: str, size: int):
+    """(start, end) of a single "bytes=" range; None to send the whole file"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # multipart ranges are optional - send it all
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _file_response(path: str, media_type: str, range_header: str = None, headers=None):
+    """FileResponse with Range support (206), so players can seek"""
+    size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    span = _parse_range(range_header, size) if range_header else None
+    start, end = span or (0, size - 1)
+    if span:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    def body():
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(RANGE_BLOCK, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    return StreamingResponse(body(), status_code=206 if span else 200, media_type=media_type, headers=headers)
+
+@app.api_route("/outputs/{path:path}", methods=["GET", "HEAD"])
+def download_output(path: str, request: Request, format: str = None):
+    """
+    A finished output. WAVs are served in the format asked for by ?format=
+    (wav, mp3, opus, ogg, flac) or the Accept header; other encodings are
+    made once and kept next to the WAV.
+    """
+    full = os.path.abspath(os.path.join(OUTPUTS_DIR, path))
+    if not full.startswith(OUTPUTS_DIR + os.sep):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    base, ext = os.path.splitext(full)
+    by_ext = {e: f for f, (e, _) in FORMATS.items()}
+    headers = {}
+    if ext.lower() == ".wav" and os.path.isfile(full):
+        try:
+            fmt = negotiate_format(format, request.headers.get("accept"))
+        except UnsupportedFormat as e:
+            raise HTTPException(status_code=400 if format else 406, detail=str(e))
+        if not format:
+            headers["Vary"] = "Accept"
+        wav = full
+    elif not os.path.isfile(full) and ext.lower() in by_ext and os.path.isfile(base + ".wav"):
+        # e.g. job.mp3 linked before it was ever encoded
+        fmt, wav = by_ext[ext.lower()], base + ".wav"
+    elif os.path.isfile(full):
+        media_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+        return _file_response(full, media_type, request.headers.get("range"))
+    else:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    try:
+        served = encoding_store.get(wav, fmt)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not encode {fmt}: {e}")
+    return _file_response(served, FORMATS[fmt][1], request.headers.get("range"), headers)
+
+# ============ STREAMING TTS ============
+
+# Streams bypass the lanes and admission control and hold the engine while
+# they decode, so they are kept to interactive lengths; longer text goes to /tts
+MAX_STREAM_CHARS = int(os.getenv("XTTS_MAX_STREAM_CHARS", "1000"))
+
+@app.post("/tts/stream")
+def tts_stream(
+    user_id: str = Form(...),
+    voice_name: str = Form(...),
+    text: str = Form(...),
+    language: str = Form("en"),
+    format: str = Form("wav")
+):
+    """
+    Chunked audio response - bytes are sent while XTTS is still generating.
+    503 in pool mode (XTTS_WORKERS > 0): streaming runs on an in-process engine.
+    """
+    if len(text) > MAX_STREAM_CHARS:
+        raise HTTPException(status_code=400, detail=f"Text too long. Max {MAX_STREAM_CHARS} characters; submit longer text to /tts.")
+    if format not in ("wav", "pcm"):
+        raise HTTPException(status_code=400, detail="format must be 'wav' or 'pcm'")
+
+    try:
+        sample_rate, chunks = stream_tts(user_id, voice_name, text, language)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except StreamingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    def body():
+        if format == "wav":
+            yield wav_header(sample_rate)
+        for chunk in chunks:
+            yield pcm16(chunk)
+
+    return StreamingResponse(
+        body(),
+        media_type="audio/wav" if format == "wav" else "audio/L16",
+        headers={"X-Sample-Rate": str(sample_rate), "Cache-Control": "no-store"}
+    )
+
+@app.websocket("/tts/ws")
+async def tts_ws(ws: WebSocket):
+    """
+    Send {"user_id", "voice_name", "text", "language"} as JSON.
+    Receives a JSON "start" event, binary 16-bit PCM frames, then a JSON "end" event.
+    """
+    await ws.accept()
+    try:
+        req = await ws.receive_json()
+        text = req.get("text", "")
+        if not text or len(text) > MAX_STREAM_CHARS:
+            await ws.send_json({"event": "error", "detail": f"Text must be 1-{MAX_STREAM_CHARS} characters."})
+            return await ws.close()
+
+        try:
+            # may load the model: off the event loop
+            sample_rate, chunks = await run_in_threadpool(
+                stream_tts, req["user_id"], req["voice_name"], text, req.get("language", "en")
+            )
+        except (KeyError, FileNotFoundError) as e:
+            await ws.send_json({"event": "error", "detail": f"Voice not found: {e}"})
+            return await ws.close()
+        except StreamingUnavailable as e:
+            await ws.send_json({"event": "error", "detail": str(e)})
+            return await ws.close()
+
+        await ws.send_json({"event": "start", "sample_rate": sample_rate, "format": "pcm_s16le"})
+        try:
+            while True:
+                chunk = await run_in_threadpool(next, chunks, None)
+                if chunk is None:
+                    break
+                await ws.send_bytes(pcm16(chunk))
+        finally:
+            await run_in_threadpool(chunks.close)
+        await ws.send_json({"event": "end"})
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
+
 # ============ ADMIN ============
 
 @app.post("/admin/voice-public")
@@ -126,5 +365,11 @@ def admin_stats():
         "users": len(users),
         "voices": voices,
         "public_voices": public,
-        "queue_size": get_queue_size()
+        "queue_size": get_queue_size(),
+        "batching": get_batch_stats(),
+        "scheduler": get_scheduler_stats(),
+        "admission": get_admission_stats(),
+        "result_cache": get_result_cache_stats(),
+        "encodings": encoding_store.stats(),
+        "workers": get_worker_stats()
     }
@@ -0,0 +1,170 @@
+"""
+ONNX Runtime for the XTTS decoder stack on CPU hosts.
+
+Two pieces of the XTTS decoder stack are exported:
+  gpt_decoder.onnx - the 30-layer GPT-2 transformer stack. It runs the
+                     latent pass that turns the sampled audio codes into
+                     vocoder latents.
+  hifigan.onnx     - the HiFi-GAN vocoder (latents + speaker embedding -> wav)
+
+Autoregressive code sampling (HF generate with a KV cache, repetition
+penalty, top-k/top-p) stays in PyTorch and shares the GPT weights. On CPU
+sampling takes most of a synthesis, so the end-to-end gain is bounded by
+the decoder's share of it; benchmarks.bench_onnx reports that share next
+to the measured RTF of both paths.
+
+Export once (needs `pip install onnx onnxruntime`):
+    python -m app.onnx_engine export --out onnx/xtts_v2
+then run with XTTS_ENGINE=onnx and XTTS_ONNX_DIR=onnx/xtts_v2.
+"""
+
+import os
+import argparse
+from types import SimpleNamespace
+
+import torch
+
+from app.xtts_engine import XTTSVoiceCloner, XTTS_INTRA_OP_THREADS, XTTS_INTER_OP_THREADS, XTTS_QUANTIZE
+
+try:
+    import onnxruntime as ort
+    ORT_AVAILABLE = True
+except ImportError:
+    ORT_AVAILABLE = False
+
+XTTS_ONNX_DIR = os.getenv("XTTS_ONNX_DIR", "onnx/xtts_v2")
+GPT_FILE = "gpt_decoder.onnx"
+HIFIGAN_FILE = "hifigan.onnx"
+
+
+def load_session(path: str):
+    if not ORT_AVAILABLE:
+        raise ImportError("onnxruntime is not installed (pip install onnxruntime)")
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if XTTS_INTRA_OP_THREADS:
+        opts.intra_op_num_threads = XTTS_INTRA_OP_THREADS
+    if XTTS_INTER_OP_THREADS:
+        opts.inter_op_num_threads = XTTS_INTER_OP_THREADS
+    return ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+
+class OrtGPT2Stack(torch.nn.Module):
+    """Drop-in for GPT.gpt (HF GPT2Model) as called by the XTTS latent pass"""
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+
+    def forward(self, inputs_embeds, return_dict=True, output_attentions=False, attention_mask=None):
+        assert attention_mask is None and not output_attentions, "ONNX GPT stack only serves the latent pass"
+        hidden = self.session.run(None, {"inputs_embeds": inputs_embeds.detach().cpu().float().numpy()})[0]
+        return SimpleNamespace(last_hidden_state=torch.from_numpy(hidden))
+
+
+class OrtHifiDecoder(torch.nn.Module):
+    """Drop-in for Xtts.hifigan_decoder; the speaker encoder stays in PyTorch"""
+
+    def __init__(self, session, speaker_encoder):
+        super().__init__()
+        self.session = session
+        self.speaker_encoder = speaker_encoder
+
+    def forward(self, latents, g=None):
+        wav = self.session.run(None, {
+            "latents": latents.detach().cpu().float().numpy(),
+            "speaker_embedding": g.detach().cpu().float().numpy()
+        })[0]
+        return torch.from_numpy(wav)
+
+
+def attach_onnx(model, onnx_dir: str = XTTS_ONNX_DIR):
+    """
+    Swap the latent-pass GPT stack and the vocoder of an Xtts model for ONNX
+    sessions. Returns the replaced torch modules so callers can swap back.
+    """
+    replaced = (model.gpt.gpt, model.hifigan_decoder)
+    model.gpt.gpt = OrtGPT2Stack(load_session(os.path.join(onnx_dir, GPT_FILE)))
+    model.hifigan_decoder = OrtHifiDecoder(
+        load_session(os.path.join(onnx_dir, HIFIGAN_FILE)),
+        model.hifigan_decoder.speaker_encoder
+    )
+    return replaced
+
+
+def detach_onnx(model, replaced):
+    model.gpt.gpt, model.hifigan_decoder = replaced
+
+
+class XTTSOnnxDecoderEngine(XTTSVoiceCloner):
+    """
+    Same interface as XTTSVoiceCloner (generate, generate_batch, stream,
+    synthesize), with the GPT latent pass and HiFi-GAN running on ONNX
+    Runtime. Code sampling is the PyTorch engine's.
+    """
+
+    def __init__(self, onnx_dir: str = XTTS_ONNX_DIR, quantize: str = XTTS_QUANTIZE):
+        # GPT-2 weights used by sampling stay on CPU next to the ORT sessions
+        super().__init__(device="cpu", quantize=quantize)
+        attach_onnx(self.model, onnx_dir)
+        self.onnx_dir = onnx_dir
+
+
+# ==================== Export ====================
+
+def export(out_dir: str, opset: int = 17):
+    class GPT2Stack(torch.nn.Module):
+        def __init__(self, gpt2):
+            super().__init__()
+            self.gpt2 = gpt2
+
+        def forward(self, inputs_embeds):
+            return self.gpt2(inputs_embeds=inputs_embeds, return_dict=True).last_hidden_state
+
+    class HifiGan(torch.nn.Module):
+        def __init__(self, decoder):
+            super().__init__()
+            self.decoder = decoder
+
+        def forward(self, latents, speaker_embedding):
+            return self.decoder(latents, g=speaker_embedding)
+
+    os.makedirs(out_dir, exist_ok=True)
+    eng = XTTSVoiceCloner(device="cpu", quantize="").freeze()
+    model = eng.model
+    dim = model.gpt.model_dim
+
+    with torch.no_grad():
+        torch.onnx.export(
+            GPT2Stack(model.gpt.gpt).eval(),
+            (torch.randn(1, 96, dim),),
+            os.path.join(out_dir, GPT_FILE),
+            input_names=["inputs_embeds"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"inputs_embeds": {1: "seq"}, "last_hidden_state": {1: "seq"}},
+            opset_version=opset
+        )
+        print(f"✅ exported {GPT_FILE}")
+
+        torch.onnx.export(
+            HifiGan(model.hifigan_decoder).eval(),
+            (torch.randn(1, 64, dim), torch.randn(1, 512, 1)),
+            os.path.join(out_dir, HIFIGAN_FILE),
+            input_names=["latents", "speaker_embedding"],
+            output_names=["wav"],
+            dynamic_axes={"latents": {1: "frames"}, "wav": {2: "samples"}},
+            opset_version=opset
+        )
+        print(f"✅ exported {HIFIGAN_FILE}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XTTS ONNX export")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--out", default=XTTS_ONNX_DIR)
+    p_export.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        export(args.out, args.opset)
@@ -0,0 +1,155 @@
+"""
+Compressed copies of finished outputs, encoded on first download.
+
+/outputs/<path>.wav?format=opus (or an Accept header such as audio/ogg)
+encodes the WAV once into <path>.opus next to it and serves that file from
+then on. Concurrent requests for the same encoding wait for the one encode
+in flight instead of starting their own. An encoding older than its WAV
+(the job was re-run) is encoded again.
+
+    XTTS_OUTPUT_DEFAULT_FORMAT  format when the client asks for none (wav)
+"""
+
+import os
+import threading
+
+from app.postprocess import transcode
+
+# format -> (file extension, media type)
+FORMATS = {
+    "wav": (".wav", "audio/wav"),
+    "mp3": (".mp3", "audio/mpeg"),
+    "opus": (".opus", "audio/ogg; codecs=opus"),
+    "ogg": (".ogg", "audio/ogg; codecs=vorbis"),
+    "flac": (".flac", "audio/flac"),
+}
+# Accept media types -> format, for negotiation. Only types whose container
+# we actually write: no audio/webm (Opus here is in Ogg, served as audio/ogg)
+MEDIA_TYPES = {
+    "audio/wav": "wav", "audio/wave": "wav", "audio/x-wav": "wav",
+    "audio/mpeg": "mp3", "audio/mp3": "mp3",
+    "audio/opus": "opus", "audio/ogg": "opus",
+    "audio/flac": "flac", "audio/x-flac": "flac",
+}
+DEFAULT_FORMAT = os.getenv("XTTS_OUTPUT_DEFAULT_FORMAT", "wav")
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def negotiate_format(fmt: str = None, accept: str = None, default: str = DEFAULT_FORMAT) -> str:
+    """
+    ?format= wins; otherwise the Accept type with the highest q that we can
+    produce. Raises UnsupportedFormat when neither leaves anything to serve.
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise UnsupportedFormat(f"format must be one of {', '.join(FORMATS)}")
+        return fmt
+    if not accept:
+        return default
+
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        media, *params = [p.strip() for p in item.split(";")]
+        media = media.lower()
+        q, codecs = 1.0, ""
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+            elif name.strip() == "codecs":
+                codecs = value.strip('"').lower()
+        if media in ("*/*", "audio/*"):
+            candidate = default
+        elif media == "audio/ogg" and "vorbis" in codecs:
+            candidate = "ogg"
+        else:
+            candidate = MEDIA_TYPES.get(media)
+        # ties keep the earlier entry, the order the client listed them in
+        if candidate and q > best_q:
+            best, best_q = candidate, q
+    if best is None:
+        raise UnsupportedFormat(f"none of the accepted types can be produced ({', '.join(FORMATS)})")
+    return best
+
+
+class EncodingStore:
+    def __init__(self):
+        self._inflight = {}   # target path -> [threading.Event, exception or None]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.encodes = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    @staticmethod
+    def path_for(wav_path: str, fmt: str) -> str:
+        return os.path.splitext(wav_path)[0] + FORMATS[fmt][0]
+
+    @staticmethod
+    def _fresh(path: str, wav_path: str) -> bool:
+        try:
+            return os.stat(path).st_mtime >= os.stat(wav_path).st_mtime
+        except OSError:
+            return False
+
+    def get(self, wav_path: str, fmt: str) -> str:
+        """Path of wav_path encoded as fmt, encoding it (once) if needed"""
+        if fmt == "wav":
+            return wav_path
+        target = self.path_for(wav_path, fmt)
+        while True:
+            if self._fresh(target, wav_path):
+                with self._lock:
+                    self.hits += 1
+                return target
+
+            with self._lock:
+                entry = self._inflight.get(target)
+                leader = entry is None
+                if leader:
+                    entry = self._inflight[target] = [threading.Event(), None]
+                else:
+                    self.coalesced += 1
+
+            if not leader:
+                entry[0].wait()
+                if entry[1] is not None:
+                    raise entry[1]
+                continue  # re-check: the leader's file is fresh now
+
+            try:
+                if not self._fresh(target, wav_path):  # may have finished while we took the lock
+                    transcode(wav_path, {fmt: target})
+                    with self._lock:
+                        self.encodes += 1
+                return target
+            except Exception as e:
+                entry[1] = e
+                with self._lock:
+                    self.failures += 1
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(target, None)
+                entry[0].set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "encodes": self.encodes,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+                "in_flight": len(self._inflight),
+                "default_format": DEFAULT_FORMAT
+            }
+
+
+encoding_store = EncodingStore()
@@ -0,0 +1,320 @@
+"""
+Post-processing of synthesized audio, in one pass over the waveform.
+
+A chain of stages runs on float32 blocks in memory and the result goes
+straight to the encoders (WAV, FLAC, OGG, MP3), so no stage costs a
+decode/encode round-trip through a file:
+
+    XTTS_POST_CHAIN="trim,normalize,fade,resample"
+
+    trim       drop leading/trailing silence below XTTS_POST_TRIM_DB
+               (keeping XTTS_POST_TRIM_PAD_MS of it)
+    normalize  scale to XTTS_POST_LOUDNESS_DBFS (RMS of the non-silent
+               50 ms windows), never above XTTS_POST_PEAK_DBFS peak
+    fade       linear fade-in/out of XTTS_POST_FADE_MS
+    resample   to XTTS_OUTPUT_SAMPLE_RATE (0 = keep the engine's rate)
+
+Stages run in the order given. The default, "fade", is what outputs got
+before. trim and fade only hold back a little audio; normalize reads the
+source twice (measure, then apply), and resample joins the whole signal,
+since the polyphase filter needs the neighbouring samples at every edge.
+
+Before the chain, a job's chunks can be joined at their boundaries
+(Chain.join, see audio_utils.join_parts): XTTS_JOIN_CROSSFADE_MS crossfades
+each chunk into the next, XTTS_JOIN_TRIM_DB trims the silence XTTS leaves
+at chunk edges (keeping XTTS_POST_TRIM_PAD_MS). Both are off by default;
+published segments (app.segments) are cut from the chunks as synthesized.
+"""
+
+import os
+import wave
+
+import numpy as np
+
+from app.audio_utils import apply_fades, join_parts, pcm16, resample, trim_silence, read_wav_blocks, wav_sample_rate
+
+POST_CHAIN = os.getenv("XTTS_POST_CHAIN", "fade")
+POST_FADE_MS = float(os.getenv("XTTS_POST_FADE_MS", "50"))
+POST_LOUDNESS_DBFS = float(os.getenv("XTTS_POST_LOUDNESS_DBFS", "-20"))
+POST_PEAK_DBFS = float(os.getenv("XTTS_POST_PEAK_DBFS", "-1"))
+POST_TRIM_DB = float(os.getenv("XTTS_POST_TRIM_DB", "-45"))
+POST_TRIM_PAD_MS = float(os.getenv("XTTS_POST_TRIM_PAD_MS", "100"))
+OUTPUT_SAMPLE_RATE = int(os.getenv("XTTS_OUTPUT_SAMPLE_RATE", "0"))
+JOIN_CROSSFADE_MS = float(os.getenv("XTTS_JOIN_CROSSFADE_MS", "0"))
+JOIN_TRIM_DB = float(os.getenv("XTTS_JOIN_TRIM_DB")) if os.getenv("XTTS_JOIN_TRIM_DB") else None
+
+# Windows quieter than this don't count towards loudness (pauses, breaths)
+LOUDNESS_GATE_DBFS = -50
+LOUDNESS_WINDOW_MS = 50
+
+# soundfile (libsndfile) format/subtype per output format; WAV is written
+# with pcm16() like every other WAV here
+SOUNDFILE_FORMATS = {
+    "flac": ("FLAC", "PCM_16"),
+    "ogg": ("OGG", "VORBIS"),
+    "opus": ("OGG", "OPUS"),
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+}
+# Opus only encodes these rates; others go to ffmpeg, which resamples
+OPUS_SAMPLE_RATES = {8000, 12000, 16000, 24000, 48000}
+
+
+def _db(x):
+    return 10 ** (x / 20)
+
+
+class Fade:
+    def __init__(self, fade_ms: float = POST_FADE_MS):
+        self.fade_ms = fade_ms
+
+    def __call__(self, blocks, sample_rate):
+        return apply_fades(blocks, sample_rate, fade_ms=self.fade_ms), sample_rate
+
+    def signature(self):
+        return f"fade:{self.fade_ms:g}"
+
+
+class Trim:
+    def __init__(self, threshold_db: float = POST_TRIM_DB, pad_ms: float = POST_TRIM_PAD_MS):
+        self.threshold_db = threshold_db
+        self.pad_ms = pad_ms
+
+    def __call__(self, blocks, sample_rate):
+        blocks = (np.asarray(b, dtype=np.float32) for b in blocks)
+        pad = int(sample_rate * self.pad_ms / 1000)
+        return trim_silence(blocks, _db(self.threshold_db), pad, max_hold=sample_rate * 10), sample_rate
+
+    def signature(self):
+        return f"trim:{self.threshold_db:g}/{self.pad_ms:g}"
+
+
+class Normalize:
+    """Gain to a target RMS level, measured in a first pass over the source"""
+    needs_source = True
+
+    def __init__(self, target_dbfs: float = POST_LOUDNESS_DBFS, peak_dbfs: float = POST_PEAK_DBFS):
+        self.target_dbfs = target_dbfs
+        self.peak_dbfs = peak_dbfs
+
+    def gain(self, source, sample_rate):
+        window = max(1, int(sample_rate * LOUDNESS_WINDOW_MS / 1000))
+        gate = _db(LOUDNESS_GATE_DBFS) ** 2
+        energy, windows, peak = 0.0, 0, 0.0
+        for block in source:
+            block = np.asarray(block, dtype=np.float32)
+            if not len(block):
+                continue
+            peak = max(peak, float(np.abs(block).max()))
+            n = len(block) // window * window
+            if not n:
+                continue
+            ms = np.square(block[:n], dtype=np.float64).reshape(-1, window).mean(axis=1)
+            loud = ms[ms >= gate]
+            energy += float(loud.sum())
+            windows += len(loud)
+        if not windows or not peak:
+            return 1.0
+        rms_dbfs = 10 * np.log10(energy / windows)
+        return min(_db(self.target_dbfs - rms_dbfs), _db(self.peak_dbfs) / peak)
+
+    def __call__(self, blocks, sample_rate, gain=1.0):
+        return (np.asarray(b, dtype=np.float32) * np.float32(gain) for b in blocks), sample_rate
+
+    def signature(self):
+        return f"normalize:{self.target_dbfs:g}/{self.peak_dbfs:g}"
+
+
+class Resample:
+    def __init__(self, target_sr: int = OUTPUT_SAMPLE_RATE):
+        self.target_sr = target_sr
+
+    def __call__(self, blocks, sample_rate):
+        if not self.target_sr or self.target_sr == sample_rate:
+            return blocks, sample_rate
+        blocks = [np.asarray(b, dtype=np.float32) for b in blocks]
+        joined = np.concatenate(blocks) if blocks else np.empty(0, dtype=np.float32)
+        return iter([resample(joined, sample_rate, self.target_sr)]), self.target_sr
+
+    def signature(self):
+        return f"resample:{self.target_sr}"
+
+
+STAGES = {"fade": Fade, "trim": Trim, "normalize": Normalize, "resample": Resample}
+
+
+class Joined:
+    """Chunks joined by join_parts, as a source that can be read more than once"""
+
+    def __init__(self, chunks, sample_rate, crossfade_ms, trim_db, trim_pad_ms=POST_TRIM_PAD_MS):
+        self.chunks = chunks
+        self.sample_rate = sample_rate
+        self.crossfade_ms = crossfade_ms
+        self.trim_db = trim_db
+        self.trim_pad_ms = trim_pad_ms
+
+    def __iter__(self):
+        parts = ([chunk] for chunk in self.chunks)
+        return join_parts(parts, self.sample_rate, self.crossfade_ms, self.trim_db, self.trim_pad_ms)
+
+
+class Chain:
+    def __init__(self, stages=(), crossfade_ms: float = JOIN_CROSSFADE_MS, trim_db: float = JOIN_TRIM_DB):
+        self.stages = list(stages)
+        self.crossfade_ms = crossfade_ms
+        self.trim_db = trim_db
+
+    def join(self, chunks, sample_rate: int):
+        """A job's chunk waveforms (list or ChunkBuffer) -> the source for run/render"""
+        if not self.crossfade_ms and self.trim_db is None:
+            return chunks
+        return Joined(chunks, sample_rate, self.crossfade_ms, self.trim_db)
+
+    def run(self, source, sample_rate: int):
+        """
+        (blocks, sample_rate) after every stage. `source` is an iterable of
+        float32 blocks; with a normalize stage it is read twice, so pass a
+        list or ChunkBuffer rather than a generator.
+        """
+        blocks = iter(source)
+        for stage in self.stages:
+            if getattr(stage, "needs_source", False):
+                blocks, sample_rate = stage(blocks, sample_rate, gain=stage.gain(source, sample_rate))
+            else:
+                blocks, sample_rate = stage(blocks, sample_rate)
+        return blocks, sample_rate
+
+    def render(self, source, sample_rate: int, outputs):
+        """Run the chain once and encode the result to every {format: path} in outputs"""
+        blocks, sample_rate = self.run(source, sample_rate)
+        return encode(blocks, sample_rate, outputs)
+
+    def signature(self):
+        stages = ",".join(stage.signature() for stage in self.stages) or "none"
+        if not self.crossfade_ms and self.trim_db is None:
+            return stages
+        return f"join:{self.crossfade_ms:g}/{self.trim_db},{stages}"
+
+
+def build_chain(spec: str = POST_CHAIN) -> Chain:
+    """'trim,normalize,fade' -> Chain"""
+    stages = []
+    for name in (s.strip().lower() for s in spec.split(",")):
+        if not name:
+            continue
+        if name not in STAGES:
+            raise ValueError(f"Unknown post-processing stage '{name}' (known: {', '.join(STAGES)})")
+        stages.append(STAGES[name]())
+    return Chain(stages)
+
+
+def _soundfile_format(fmt: str):
+    try:
+        import soundfile as sf
+    except ImportError:
+        return None
+    spec = SOUNDFILE_FORMATS.get(fmt)
+    if spec is None or spec[0] not in sf.available_formats():
+        return None  # e.g. MP3 needs libsndfile >= 1.1
+    return spec
+
+
+class _WavSink:
+    def __init__(self, path, sample_rate):
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.w = wave.open(self.tmp, "wb")
+        self.w.setnchannels(1)
+        self.w.setsampwidth(2)
+        self.w.setframerate(sample_rate)
+
+    def write(self, block):
+        self.w.writeframes(pcm16(block))
+
+    def close(self, ok=True):
+        self.w.close()
+        if ok:
+            # new inode via rename: the path may be hard-linked into the result cache
+            os.replace(self.tmp, self.path)
+        elif os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+class _SoundFileSink:
+    def __init__(self, path, sample_rate, spec):
+        import soundfile as sf
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.f = sf.SoundFile(self.tmp, "w", samplerate=sample_rate, channels=1,
+                              format=spec[0], subtype=spec[1])
+
+    def write(self, block):
+        self.f.write(np.clip(block, -1.0, 1.0))
+
+    def close(self, ok=True):
+        self.f.close()
+        if ok:
+            os.replace(self.tmp, self.path)
+        elif os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+class _PydubSink:
+    """ffmpeg via pydub, fed raw PCM - one encode, no decode"""
+
+    def __init__(self, path, sample_rate, fmt):
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.fmt = fmt
+        self.sample_rate = sample_rate
+        self.data = []
+
+    def write(self, block):
+        self.data.append(pcm16(block))
+
+    def close(self, ok=True):
+        if not ok:
+            return
+        from pydub import AudioSegment
+        audio = AudioSegment(data=b"".join(self.data), sample_width=2, frame_rate=self.sample_rate, channels=1)
+        audio.export(self.tmp, format=self.fmt)
+        os.replace(self.tmp, self.path)
+
+
+def encode(blocks, sample_rate: int, outputs):
+    """
+    Write float32 blocks to every {format: path} in outputs, in one pass.
+    libsndfile encodes directly where it supports the format; otherwise
+    pydub/ffmpeg encodes from the PCM. Returns outputs.
+    """
+    sinks = []
+    try:
+        for fmt, path in outputs.items():
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            spec = _soundfile_format(fmt)
+            if fmt == "opus" and sample_rate not in OPUS_SAMPLE_RATES:
+                spec = None
+            if fmt == "wav":
+                sinks.append(_WavSink(path, sample_rate))
+            elif spec:
+                sinks.append(_SoundFileSink(path, sample_rate, spec))
+            else:
+                sinks.append(_PydubSink(path, sample_rate, fmt))
+        for block in blocks:
+            block = np.asarray(block, dtype=np.float32)
+            for sink in sinks:
+                sink.write(block)
+    except BaseException:
+        for sink in sinks:
+            sink.close(ok=False)
+        raise
+    for sink in sinks:
+        sink.close()
+    return outputs
+
+
+def transcode(src_wav: str, outputs):
+    """Encode an already processed WAV to other formats (no chain)"""
+    return encode(read_wav_blocks(src_wav), wav_sample_rate(src_wav), outputs)
+
+
+post_chain = build_chain()
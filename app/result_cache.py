@@ -0,0 +1,252 @@
+"""
+Content-addressed cache of finished TTS outputs.
+
+Key = sha256(normalized text, reference-audio hash, language, engine version
+and post-processing chain).
+Entries are WAV files under outputs/_cache/<user>/<voice>/<key>.wav; a hit is
+hard-linked to the new job's output path, so evicting the cache copy never
+breaks an already-delivered file. Eviction is LRU (file mtime is bumped on
+every hit, so the order survives restarts) within XTTS_RESULT_CACHE_MB.
+
+FragmentCache applies the same scheme to single chunks (float32 .npy
+under outputs/_fragments/), so long jobs that share chunks with earlier ones
+only synthesize the chunks that are new. New text is packed into chunks of
+several sentences, and a packed chunk's audio cannot be cut back into its
+sentences - so the cache also remembers the sentences it has seen per voice
+(the last XTTS_FRAGMENT_SEEN, in memory). A sentence that is cached, or was
+seen in an earlier job, is kept a chunk of its own: the shared intro of two
+jobs is synthesized on its own once and reused from then on, and only the
+sentences between the shared ones are packed.
+"""
+
+import os
+import shutil
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from app.latent_cache import latent_cache
+from app.audio_utils import XTTS_SAMPLE_RATE
+from app.postprocess import post_chain
+
+RESULT_CACHE_DIR = os.path.join("outputs", "_cache")
+RESULT_CACHE_MB = float(os.getenv("XTTS_RESULT_CACHE_MB", "2048"))
+FRAGMENT_CACHE_DIR = os.path.join("outputs", "_fragments")
+FRAGMENT_CACHE_MB = float(os.getenv("XTTS_FRAGMENT_CACHE_MB", "1024"))
+FRAGMENT_SEEN = int(os.getenv("XTTS_FRAGMENT_SEEN", "100000"))
+VOICES_DIR = "voices"
+# Anything that changes the audio for the same input must change this
+ENGINE_VERSION = os.getenv(
+    "XTTS_RESULT_CACHE_VERSION",
+    "xtts_v2/{}/{}".format(os.getenv("XTTS_ENGINE", "torch"), os.getenv("XTTS_QUANTIZE", "") or "fp32")
+)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def link_or_copy(src: str, dst: str):
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    suffix = ".wav"
+    # outputs are post-processed, so the chain is part of the key
+    version = f"{ENGINE_VERSION}/{post_chain.signature()}"
+
+    def __init__(self, root: str = RESULT_CACHE_DIR, max_mb: float = RESULT_CACHE_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries = OrderedDict()   # key -> (path, size), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the index from disk, oldest mtime first"""
+        found = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(self.suffix):
+                    path = os.path.join(dirpath, name)
+                    st = os.stat(path)
+                    found.append((st.st_mtime, name[:-len(self.suffix)], path, st.st_size))
+        for _, key, path, size in sorted(found):
+            self._entries[key] = (path, size)
+            self._bytes += size
+
+    @staticmethod
+    def voice_subdir(speaker_wav: str) -> str:
+        """voices/<user>/<voice>/ref.wav -> <user>/<voice>"""
+        return os.path.relpath(os.path.abspath(os.path.dirname(speaker_wav)), os.path.abspath(VOICES_DIR))
+
+    def key(self, text: str, speaker_wav: str, language: str) -> str:
+        h = hashlib.sha256()
+        for part in (normalize_text(text), latent_cache.ref_hash(speaker_wav), language, self.version):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def path_for(self, key: str, speaker_wav: str) -> str:
+        return os.path.join(self.root, self.voice_subdir(speaker_wav), key + self.suffix)
+
+    def get(self, key: str):
+        """Path of the cached file, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(entry[0])
+        except OSError:
+            pass
+        return entry[0]
+
+    def put(self, key: str, speaker_wav: str, wav_path: str):
+        """Add a finished output (hard link, no copy when on the same filesystem)"""
+        path = self.path_for(key, speaker_wav)
+        try:
+            link_or_copy(wav_path, path)
+        except OSError as e:
+            print(f"Could not cache {wav_path}: {e}")
+            return
+        self._add(key, path)
+
+    def _add(self, key, path):
+        size = os.path.getsize(path)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (path, size)
+            self._bytes += size
+            self.stores += 1
+            self._evict()
+
+    def invalidate(self, voice_dir: str):
+        """Drop every cached output of a voice folder"""
+        rel = os.path.relpath(os.path.abspath(voice_dir), os.path.abspath(VOICES_DIR))
+        prefix = os.path.join(os.path.abspath(os.path.join(self.root, rel)), "")
+        with self._lock:
+            for key, (path, _) in list(self._entries.items()):
+                if os.path.abspath(path).startswith(prefix):
+                    self._drop(key)
+        shutil.rmtree(os.path.join(self.root, rel), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._bytes / 1024 / 1024, 1),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "engine_version": self.version
+            }
+
+    # ---------- internals (lock held) ----------
+
+    def _drop(self, key):
+        path, size = self._entries.pop(key)
+        self._bytes -= size
+        return path
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            path = self._drop(key)
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class FragmentCache(ResultCache):
+    """Per-chunk waveforms, keyed like ResultCache with the chunk as text"""
+    suffix = ".npy"
+    version = ENGINE_VERSION   # raw synthesis, before post-processing
+
+    def __init__(self, root: str = FRAGMENT_CACHE_DIR, max_mb: float = FRAGMENT_CACHE_MB,
+                 max_seen: int = FRAGMENT_SEEN):
+        super().__init__(root, max_mb)
+        self.max_seen = max_seen
+        self._seen = OrderedDict()   # sentence keys of earlier jobs, least recent first
+        self.seconds_reused = 0.0
+        self.seconds_synthesized = 0.0
+
+    def shared(self, key: str) -> bool:
+        """Whether a sentence is cached or was in an earlier job (it is recorded as seen)"""
+        with self._lock:
+            seen = key in self._seen or key in self._entries
+            self._seen[key] = None
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+        return seen
+
+    def load(self, key: str):
+        """Cached float32 samples, or None"""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            samples = np.load(path)
+        except (OSError, ValueError):
+            return None  # evicted or half-written by a crashed process
+        with self._lock:
+            self.seconds_reused += len(samples) / XTTS_SAMPLE_RATE
+        return samples
+
+    def put_array(self, key: str, speaker_wav: str, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self.seconds_synthesized += len(samples) / XTTS_SAMPLE_RATE
+        path = self.path_for(key, speaker_wav)
+        tmp = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.save(f, samples)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not cache fragment {key}: {e}")
+            return
+        self._add(key, path)
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            total = self.seconds_reused + self.seconds_synthesized
+            stats.update(
+                seconds_reused=round(self.seconds_reused, 1),
+                seconds_synthesized=round(self.seconds_synthesized, 1),
+                avoided_share=round(self.seconds_reused / total, 3) if total else None
+            )
+        return stats
+
+
+result_cache = ResultCache()
+fragment_cache = FragmentCache()
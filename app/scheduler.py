@@ -0,0 +1,315 @@
+"""
+Weighted fair queueing for chunk tasks.
+
+Each user has their own stream of chunks. A chunk gets a virtual finish tag
+
+    finish = max(virtual_time, user's last finish) + len(text) / weight
+
+and the queue always hands out the smallest tag (self-clocked fair queueing:
+virtual_time is the tag of the chunk last handed out). A user with ten
+30k-character jobs queued therefore gets one chunk in, then everyone else
+with work waiting gets theirs, and a short request from a new user is served
+after at most about one chunk per active user.
+
+Weights: XTTS_USER_WEIGHTS="alice=2,bob=0.5" (unlisted users get
+XTTS_DEFAULT_USER_WEIGHT, 1.0). A weight of 2 gets twice the characters.
+
+LaneQueue puts one FairQueue per priority lane (premium > standard > free,
+from the user's plan) in front of the engine. Each lane can reserve part of
+the in-flight capacity and be capped at a concurrency limit:
+
+    XTTS_LANE_CAPACITY=16                   chunks in flight across all lanes
+    XTTS_LANE_RESERVED="premium=8,standard=4"
+    XTTS_LANE_LIMIT="free=4"                (unset = whole capacity)
+
+A reservation only holds back capacity while its lane has work queued.
+"""
+
+import os
+import time
+import heapq
+import bisect
+import queue
+import itertools
+import threading
+from collections import defaultdict, deque
+
+DEFAULT_WEIGHT = float(os.getenv("XTTS_DEFAULT_USER_WEIGHT", "1"))
+LANES = ("premium", "standard", "free")   # highest priority first
+DEFAULT_LANE = "standard"
+
+
+def parse_weights(spec: str, cast=float):
+    """"a=2,b=0.5" -> {"a": 2.0, "b": 0.5}"""
+    weights = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        key, value = item.split("=", 1)
+        try:
+            weights[key.strip()] = cast(value)
+        except ValueError:
+            print(f"⚠️ Ignoring bad value for {key.strip()}: {value}")
+    return weights
+
+
+class FairQueue:
+    """
+    Drop-in for the queue.Queue of chunk tasks (put/get/get_nowait/
+    task_done/qsize) that interleaves users instead of serving FIFO.
+    Tasks are dicts with at least user_id and text.
+    """
+
+    def __init__(self, weights=None, default_weight: float = DEFAULT_WEIGHT):
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self._heap = []            # (finish tag, seq, task)
+        self._order = []           # the same (tag, seq) keys kept sorted, for positions
+        self._job_keys = {}        # job_id -> keys of its queued chunks
+        self._seq = itertools.count()
+        self._last_finish = {}     # user -> finish tag of their newest queued chunk
+        self._vtime = 0.0
+        self._backlog = defaultdict(lambda: {"chunks": 0, "chars": 0})
+        self._served = defaultdict(lambda: {"chunks": 0, "chars": 0})
+        self._unfinished = 0
+        self._chars = 0
+        self._cond = threading.Condition()
+
+    def weight(self, user):
+        return max(self.weights.get(user, self.default_weight), 1e-3)
+
+    def set_weight(self, user, weight: float):
+        with self._cond:
+            self.weights[user] = weight
+
+    # ---------- queue.Queue interface ----------
+
+    def put(self, task, front: bool = False):
+        """front=True re-admits a task at the current virtual time (e.g. after a worker crash)"""
+        user = task.get("user_id")
+        chars = len(task.get("text", ""))
+        with self._cond:
+            if front:
+                tag = self._vtime
+            else:
+                start = max(self._vtime, self._last_finish.get(user, 0.0))
+                tag = start + max(chars, 1) / self.weight(user)
+                self._last_finish[user] = tag
+            key = (tag, next(self._seq))
+            heapq.heappush(self._heap, key + (task,))
+            bisect.insort(self._order, key)
+            self._job_keys.setdefault(task.get("job_id"), []).append(key)
+            self._backlog[user]["chunks"] += 1
+            self._backlog[user]["chars"] += chars
+            self._chars += chars
+            self._unfinished += 1
+            self._cond.notify()
+
+    def get(self, block: bool = True, timeout: float = None):
+        with self._cond:
+            if not block:
+                if not self._heap:
+                    raise queue.Empty
+            elif not self._cond.wait_for(lambda: self._heap, timeout):
+                raise queue.Empty
+
+            tag, seq, task = heapq.heappop(self._heap)
+            self._vtime = max(self._vtime, tag)
+            del self._order[bisect.bisect_left(self._order, (tag, seq))]
+            keys = self._job_keys[task.get("job_id")]
+            keys.remove((tag, seq))
+            if not keys:
+                del self._job_keys[task.get("job_id")]
+            user = task.get("user_id")
+            chars = len(task.get("text", ""))
+            backlog = self._backlog[user]
+            backlog["chunks"] -= 1
+            backlog["chars"] -= chars
+            self._chars -= chars
+            if backlog["chunks"] == 0:
+                del self._backlog[user]
+                self._last_finish.pop(user, None)
+            self._served[user]["chunks"] += 1
+            self._served[user]["chars"] += chars
+            return task
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        with self._cond:
+            self._unfinished = max(0, self._unfinished - 1)
+
+    def qsize(self):
+        with self._cond:
+            return len(self._heap)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def queued_chars(self):
+        with self._cond:
+            return self._chars
+
+    def position(self, job_id):
+        """(chunks served before the job's next chunk, its queued chunks), or None if none queued"""
+        with self._cond:
+            keys = self._job_keys.get(job_id)
+            if not keys:
+                return None
+            return bisect.bisect_left(self._order, min(keys)), len(keys)
+
+    # ---------- stats ----------
+
+    def backlog(self):
+        """Per-user queued chunks/characters, weight, and what has been served so far"""
+        with self._cond:
+            users = set(self._backlog) | set(self._served)
+            return {
+                "virtual_time": round(self._vtime, 1),
+                "queued_chunks": len(self._heap),
+                "users": {
+                    str(user): {
+                        "weight": self.weight(user),
+                        "queued_chunks": self._backlog[user]["chunks"] if user in self._backlog else 0,
+                        "queued_chars": self._backlog[user]["chars"] if user in self._backlog else 0,
+                        "served_chunks": self._served[user]["chunks"] if user in self._served else 0,
+                        "served_chars": self._served[user]["chars"] if user in self._served else 0
+                    }
+                    for user in users
+                }
+            }
+
+
+class LaneQueue:
+    """
+    Priority lanes over per-lane FairQueues, with the same queue interface.
+    Chunks count as in flight from get() until release(), which the caller
+    invokes once the engine has returned the chunk's result (or failure).
+    """
+
+    def __init__(self, capacity: int, reserved=None, limits=None, weights=None):
+        self.capacity = max(1, capacity)
+        self.reserved = {lane: (reserved or {}).get(lane, 0) for lane in LANES}
+        self.limits = {lane: (limits or {}).get(lane) or self.capacity for lane in LANES}
+        self.lanes = {lane: FairQueue(weights) for lane in LANES}
+        self._inflight = dict.fromkeys(LANES, 0)
+        self._served = dict.fromkeys(LANES, 0)
+        self._waits = {lane: deque(maxlen=1000) for lane in LANES}  # queue wait samples (s)
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def lane_of(task):
+        lane = task.get("priority")
+        return lane if lane in LANES else DEFAULT_LANE
+
+    def _can_take(self, lane):
+        """Called with the lock held"""
+        if self.lanes[lane].empty() or self._inflight[lane] >= self.limits[lane]:
+            return False
+        if self._inflight[lane] < self.reserved[lane]:
+            # may briefly exceed capacity if others borrowed it while this lane was idle
+            return True
+        # unreserved capacity, minus reservations other busy lanes haven't used yet
+        free = self.capacity - sum(self._inflight.values())
+        held = sum(
+            max(0, self.reserved[other] - self._inflight[other])
+            for other in LANES
+            if other != lane and not self.lanes[other].empty()
+        )
+        return free - held > 0
+
+    def _pick(self):
+        for lane in LANES:
+            if self._can_take(lane):
+                return lane
+        return None
+
+    # ---------- queue.Queue interface ----------
+
+    def put(self, task, front: bool = False):
+        task.setdefault("enqueued_at", time.time())
+        with self._cond:
+            self.lanes[self.lane_of(task)].put(task, front=front)
+            self._cond.notify_all()
+
+    def get(self, block: bool = True, timeout: float = None):
+        with self._cond:
+            if not block:
+                lane = self._pick()
+            elif not self._cond.wait_for(lambda: self._pick() is not None, timeout):
+                lane = None
+            else:
+                lane = self._pick()
+            if lane is None:
+                raise queue.Empty
+
+            task = self.lanes[lane].get_nowait()
+            self._inflight[lane] += 1
+            self._served[lane] += 1
+            self._waits[lane].append(time.time() - task.get("enqueued_at", time.time()))
+            return task
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        pass
+
+    def release(self, task):
+        lane = self.lane_of(task)
+        with self._cond:
+            self._inflight[lane] = max(0, self._inflight[lane] - 1)
+            self._cond.notify_all()
+
+    def qsize(self):
+        return sum(q.qsize() for q in self.lanes.values())
+
+    def position(self, job_id, lane: str):
+        """
+        Chunks ahead of the job's next chunk (everything queued in higher
+        lanes plus what its own lane serves first) and its own queued chunks.
+        None once none of its chunks are waiting.
+        """
+        lane = lane if lane in LANES else DEFAULT_LANE
+        pos = self.lanes[lane].position(job_id)
+        if pos is None:
+            return None
+        higher = sum(self.lanes[l].qsize() for l in LANES[:LANES.index(lane)])
+        return higher + pos[0], pos[1]
+
+    def queued_chars(self, lane: str = None):
+        """Characters queued in `lane` and every lane served before it (all lanes if None)"""
+        lanes = LANES if lane not in LANES else LANES[:LANES.index(lane) + 1]
+        return sum(self.lanes[l].queued_chars() for l in lanes)
+
+    def in_flight(self):
+        with self._cond:
+            return sum(self._inflight.values())
+
+    def empty(self):
+        return self.qsize() == 0
+
+    # ---------- stats ----------
+
+    def backlog(self):
+        with self._cond:
+            lanes = {}
+            for lane in LANES:
+                waits = sorted(self._waits[lane])
+                fair = self.lanes[lane].backlog()
+                lanes[lane] = {
+                    "queued_chunks": fair["queued_chunks"],
+                    "in_flight": self._inflight[lane],
+                    "reserved": self.reserved[lane],
+                    "limit": self.limits[lane],
+                    "served_chunks": self._served[lane],
+                    "wait_p50_s": round(waits[len(waits) // 2], 3) if waits else None,
+                    "wait_p95_s": round(waits[int(len(waits) * 0.95)], 3) if waits else None,
+                    "users": fair["users"]
+                }
+            return {
+                "capacity": self.capacity,
+                "in_flight": sum(self._inflight.values()),
+                "lanes": lanes
+            }
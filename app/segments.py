@@ -0,0 +1,108 @@
+"""
+Progressive playback of long jobs.
+
+Every chunk is published as a playable segment as soon as it and all the
+chunks before it are synthesized, so playback can start after the first
+chunk while the rest of the job (and the final merge) is still running:
+
+    outputs/<user>/<voice>/<job_id>_segments/00000.mp3, 00001.mp3, ...
+
+/tts/playlist/<job_id>.m3u8 lists them as an HLS EVENT playlist that grows
+with the job and gets #EXT-X-ENDLIST once it is finished;
+/tts/playlist/<job_id> is the same list as JSON. Segments hold the chunks
+as synthesized - the post-processing chain (app.postprocess) only runs on
+the final file.
+
+Publishing costs an extra encode per chunk, so it is opt-in: per job with
+the /tts form field segments=true, or for every job with XTTS_SEGMENTS=1.
+A job's segments are deleted when it fails, and once it has completed as
+soon as a player that started at the first segment has had time to play
+them all (their total duration plus XTTS_SEGMENT_KEEP_S); the playlist then
+lists the final file instead.
+
+    XTTS_SEGMENTS=1            publish segments unless the request says not to
+    XTTS_SEGMENT_FORMAT=mp3    an app.output_store format; HLS players expect
+                               mp3, the JSON playlist can use any
+    XTTS_SEGMENT_TARGET_S=10   #EXT-X-TARGETDURATION floor (players reload the
+                               playlist about this often)
+    XTTS_SEGMENT_KEEP_S=300    grace period after completion
+"""
+
+import os
+import glob
+import math
+import time
+import shutil
+import threading
+
+from app.output_store import FORMATS
+from app.postprocess import encode
+
+SEGMENTS = os.getenv("XTTS_SEGMENTS", "0") == "1"
+SEGMENT_FORMAT = os.getenv("XTTS_SEGMENT_FORMAT", "mp3")
+SEGMENT_TARGET_S = int(os.getenv("XTTS_SEGMENT_TARGET_S", "10"))
+SEGMENT_KEEP_S = float(os.getenv("XTTS_SEGMENT_KEEP_S", "300"))
+
+
+def segment_dir(out_wav: str) -> str:
+    return os.path.splitext(out_wav)[0] + "_segments"
+
+
+def segment_path(out_wav: str, index: int) -> str:
+    return os.path.join(segment_dir(out_wav), f"{index:05d}{FORMATS[SEGMENT_FORMAT][0]}")
+
+
+def write_segment(out_wav: str, index: int, samples, sample_rate: int) -> float:
+    """Encode one chunk as a segment. Returns its duration in seconds."""
+    encode([samples], sample_rate, {SEGMENT_FORMAT: segment_path(out_wav, index)})
+    return round(len(samples) / sample_rate, 3)
+
+
+def remove_segments(out_wav: str, delay: float = 0):
+    """Delete a job's segment dir, now or after `delay` seconds"""
+    if delay > 0:
+        timer = threading.Timer(delay, remove_segments, args=(out_wav,))
+        timer.daemon = True
+        timer.start()
+    else:
+        shutil.rmtree(segment_dir(out_wav), ignore_errors=True)
+
+
+def segment_dirs(outputs_dir: str = "outputs"):
+    """(job_id, out_wav, seconds since last written) of every segment dir on disk"""
+    now = time.time()
+    for path in glob.glob(os.path.join(outputs_dir, "*", "*", "*_segments")):
+        try:
+            age = now - os.stat(path).st_mtime
+        except OSError:
+            continue
+        base = path[:-len("_segments")]
+        yield os.path.basename(base), base + ".wav", age
+
+
+def published(out_wav: str, durations):
+    """The durations whose segment files still exist (a prefix; used on resume)"""
+    kept = []
+    for index, seconds in enumerate(durations or ()):
+        if not os.path.exists(segment_path(out_wav, index)):
+            break
+        kept.append(seconds)
+    return kept
+
+
+def hls_playlist(segments, ended: bool) -> str:
+    """segments: [{"url", "duration"}, ...] in order"""
+    target = max([SEGMENT_TARGET_S] + [math.ceil(s["duration"]) for s in segments])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+    ]
+    for segment in segments:
+        lines.append(f"#EXTINF:{segment['duration']:.3f},")
+        lines.append(segment["url"])
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
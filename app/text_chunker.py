@@ -0,0 +1,179 @@
+"""
+Language-aware text chunking for XTTS.
+
+Text is split into sentences on the punctuation of each language
+(. ! ? … for Latin/Cyrillic scripts, 。！？ for Chinese/Japanese, । ॥ for
+Devanagari/Bengali, ؟ ۔ for Arabic script), sentences that are too long are
+split again at clause punctuation and then at word (or, for CJK, character)
+boundaries, and the pieces are packed greedily into chunks of at most
+XTTS_CHUNK_TOKENS tokens and at most the per-language character limit XTTS
+uses for one GPT call - so XTTS never has to re-split a chunk itself.
+
+Token counts come from the XTTS BPE tokenizer (the loaded engine's, or the
+vocab file of the downloaded model); without either, a per-language
+characters-per-token estimate is used.
+
+With the default budget it is the character limit that ends a chunk, in
+every language (python -m benchmarks.bench_chunk_size --chunks-only
+--language all: the chunks stop changing from about 90-120 tokens up): a
+chunk is as long as XTTS takes in one GPT call, the fewest calls per text
+without XTTS splitting anything itself. A lower budget only pays off if it
+measures a lower RTF on the serving host:
+    python -m benchmarks.bench_chunk_size --speaker voices/<user>/<voice>/ref.wav
+"""
+
+import os
+import re
+import math
+import threading
+
+CHUNK_TOKENS = int(os.getenv("XTTS_CHUNK_TOKENS", "150"))
+
+# Characters per GPT call in XTTS v2 (tokenizer.char_limits); one entry per
+# language in app.training.SUPPORTED_LANGUAGES
+CHAR_LIMITS = {
+    "en": 250, "de": 253, "fr": 273, "es": 239, "it": 213, "pt": 203,
+    "pl": 224, "tr": 226, "ru": 182, "nl": 251, "cs": 186, "ar": 166,
+    "zh": 82, "ja": 71, "ko": 95, "hu": 224, "hi": 150
+}
+# Fallback estimate when the tokenizer is not available
+CHARS_PER_TOKEN = {"zh": 1.0, "ja": 1.0, "ko": 1.5, "hi": 2.0, "ar": 2.5}
+DEFAULT_CHARS_PER_TOKEN = 3.0
+NO_SPACE_LANGUAGES = {"zh", "ja"}
+
+# Sentence end: Latin-style terminators need whitespace (or the end) after
+# them so "3.14" and "v2.0" stay whole; CJK, Indic and Arabic ones don't.
+SENTENCE_END = re.compile(
+    r"[.!?…]+[\"'”’»)\]]*(?=\s|$)"
+    r"|[。！？]+[\"”’」』）)]*"
+    r"|[।॥؟۔]+"
+)
+CLAUSE_SPLIT = re.compile(r"(?<=[,;:，、；：،])\s*")
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "sr", "jr", "vs", "etc", "e.g", "i.e", "no"}
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def base_language(language: str) -> str:
+    """'zh-cn' -> 'zh'"""
+    return (language or "en").split("-")[0].lower()
+
+
+def _load_tokenizer():
+    """XTTS tokenizer from the loaded engine, else from the downloaded model's vocab"""
+    global _tokenizer
+    if _tokenizer is not None:
+        return _tokenizer or None
+
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            from app.engine_registry import loaded_engine
+            eng = loaded_engine()
+            if eng is not None:
+                _tokenizer = eng.model.tokenizer
+            else:
+                try:
+                    from TTS.utils.generic_utils import get_user_data_dir
+                    from TTS.tts.layers.xtts.tokenizer import VoiceBpeTokenizer
+                    vocab = os.path.join(
+                        get_user_data_dir("tts"), "tts_models--multilingual--multi-dataset--xtts_v2", "vocab.json"
+                    )
+                    _tokenizer = VoiceBpeTokenizer(vocab) if os.path.exists(vocab) else False
+                except ImportError:
+                    _tokenizer = False
+    return _tokenizer or None
+
+
+def count_tokens(text: str, language: str = "en") -> int:
+    tokenizer = _load_tokenizer()
+    lang = base_language(language)
+    if tokenizer is not None:
+        try:
+            return len(tokenizer.encode(text, "zh-cn" if lang == "zh" else lang))
+        except Exception:
+            pass  # e.g. a language the installed tokenizer predates
+    return math.ceil(len(text) / CHARS_PER_TOKEN.get(lang, DEFAULT_CHARS_PER_TOKEN))
+
+
+def split_sentences(text: str, language: str = "en"):
+    text = " ".join(text.split())
+    sentences, start = [], 0
+    for m in SENTENCE_END.finditer(text):
+        if m.group().startswith(".") and len(m.group()) == 1:
+            word = text[start:m.start()].rsplit(" ", 1)[-1].lower()
+            if word in ABBREVIATIONS:
+                continue
+        sentences.append(text[start:m.end()].strip())
+        start = m.end()
+    if text[start:].strip():
+        sentences.append(text[start:].strip())
+    return [s for s in sentences if s]
+
+
+def _split_long(piece: str, language: str, max_tokens: int, max_chars: int):
+    """Break a piece that is over budget at clauses, then words (characters for CJK)"""
+    if len(piece) <= max_chars and count_tokens(piece, language) <= max_tokens:
+        return [piece]
+
+    lang = base_language(language)
+    parts = [p for p in CLAUSE_SPLIT.split(piece) if p]
+    if len(parts) == 1:
+        words = list(piece) if lang in NO_SPACE_LANGUAGES else piece.split(" ")
+        # an enormous word (a URL, a hash) is cut by characters
+        parts = []
+        for word in words:
+            parts.extend(word[i:i + max_chars] for i in range(0, len(word), max_chars))
+        return _pack(parts, language, max_tokens, max_chars)
+
+    out = []
+    for part in parts:
+        out.extend(_split_long(part, language, max_tokens, max_chars))
+    return _pack(out, language, max_tokens, max_chars)
+
+
+def _pack(pieces, language: str, max_tokens: int, max_chars: int):
+    """Greedy packing of pieces that each fit the budget"""
+    sep = "" if base_language(language) in NO_SPACE_LANGUAGES else " "
+    chunks, current, tokens = [], "", 0
+    for piece in pieces:
+        n = count_tokens(piece, language)
+        if current and (tokens + n > max_tokens or len(current) + len(sep) + len(piece) > max_chars):
+            chunks.append(current)
+            current, tokens = "", 0
+        current = f"{current}{sep}{piece}" if current else piece
+        tokens += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_text(text: str, language: str = "en", max_tokens: int = CHUNK_TOKENS, pack: bool = True,
+               keep=None):
+    """
+    Split text into XTTS-sized chunks. pack=False keeps one sentence per
+    chunk (long sentences are still split to fit the budget). keep(sentence)
+    -> True also keeps that sentence a chunk of its own; the runs of
+    sentences between such ones are packed.
+    """
+    max_chars = CHAR_LIMITS.get(base_language(language), 250)
+    pieces = []
+    for sentence in split_sentences(text, language):
+        pieces.extend(_split_long(sentence, language, max_tokens, max_chars))
+    if not pieces:
+        return [text]
+    if not pack:
+        return pieces
+    if keep is None:
+        return _pack(pieces, language, max_tokens, max_chars)
+
+    chunks, run = [], []
+    for piece in pieces:
+        if keep(piece):
+            chunks.extend(_pack(run, language, max_tokens, max_chars))
+            chunks.append(piece)
+            run = []
+        else:
+            run.append(piece)
+    chunks.extend(_pack(run, language, max_tokens, max_chars))
+    return chunks
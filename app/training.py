@@ -21,6 +21,9 @@ from typing import Optional, List
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from pydantic import BaseModel
 
+from app.job_store import job_store
+from app.audio_utils import load_audio, audio_duration, write_wav
+
 # Audio processing
 try:
     from pydub import AudioSegment
@@ -66,12 +69,10 @@ training_router = APIRouter()
 # ==================== Helper Functions ====================
 
 def convert_audio(input_path: str, output_path: str, sample_rate: int = SAMPLE_RATE) -> bool:
-    """Convert audio to 22,050Hz mono WAV"""
+    """Convert audio to 22,050Hz mono WAV (in-process for WAV/FLAC/OGG/MP3)"""
     try:
         if PYDUB_AVAILABLE:
-            audio = AudioSegment.from_file(input_path)
-            audio = audio.set_frame_rate(sample_rate).set_channels(1)
-            audio.export(output_path, format="wav")
+            write_wav(output_path, [load_audio(input_path, sample_rate)], sample_rate)
         else:
             import subprocess
             subprocess.run([
@@ -87,25 +88,18 @@ def get_audio_duration(file_path: str) -> float:
     """Get audio duration in seconds"""
     try:
         if PYDUB_AVAILABLE:
-            audio = AudioSegment.from_file(file_path)
-            return len(audio) / 1000.0
+            return audio_duration(file_path)
         return 0
     except:
         return 0
 
 def save_job(job_id: str, data: dict):
     """Save training job status"""
-    job_path = JOBS_DIR / f"train_{job_id}.json"
-    with open(job_path, "w") as f:
-        json.dump(data, f, indent=2)
+    job_store.save(job_id, data, kind="train")
 
 def load_job(job_id: str) -> Optional[dict]:
     """Load training job status"""
-    job_path = JOBS_DIR / f"train_{job_id}.json"
-    if not job_path.exists():
-        return None
-    with open(job_path, "r") as f:
-        return json.load(f)
+    return job_store.load(job_id, kind="train")
 
 # ==================== Endpoints ====================
 
@@ -216,14 +210,9 @@ def run_training(job_id: str, voice_id: str, voice_name: str, languages: List[st
     import time
     
     def update(status: str, progress: int, message: str, **kwargs):
-        job = load_job(job_id) or {}
-        job.update({
-            "status": status,
-            "progress": progress,
-            "message": message,
-            **kwargs
-        })
-        save_job(job_id, job)
+        fields = {"status": status, "progress": progress, "message": message, **kwargs}
+        if job_store.update(job_id, kind="train", **fields) is None:
+            save_job(job_id, fields)
     
     try:
         update("processing", 10, "Preparing training data...")
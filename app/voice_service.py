@@ -1,23 +1,9 @@
 import os
 import uuid
 import json
-from TTS.api import TTS
-from app.audio_utils import wav_to_mp3
-from app.xtts_engine import XTTSVoiceCloner
-from pydub import AudioSegment  # 🔥 ADD THIS
-
-# 🔥 ADD THIS FUNCTION
-def smooth_audio(audio_path):
-    """Add fade in/out for smoother transitions"""
-    audio = AudioSegment.from_wav(audio_path)
-    audio = audio.fade_in(50).fade_out(50)
-    audio.export(audio_path, format="wav")
-
-# 🔥 Load XTTS once (GPU)
-tts = TTS(
-    model_name="tts_models/multilingual/multi-dataset/xtts_v2",
-    gpu=True
-)
+from fastapi import HTTPException
+from app.engine_registry import get_engine
+from app.postprocess import post_chain
 
 # -------------------------
 # ONE-TIME VOICE CLONE
@@ -41,8 +27,6 @@ def clone_voice(user_id: str, ref_wav_path: str):
 # -------------------------
 # GENERATE TTS (REUSE VOICE)
 # -------------------------
-engine = XTTSVoiceCloner()
-
 BASE_DIR = "voices"
 OUTPUT_DIR = "outputs"
 
@@ -65,15 +49,10 @@ def generate_voice(
         OUTPUT_DIR, user_id, voice_name, "output.wav"
     )
 
-    engine.generate(
-        text=text,
-        speaker_wav=ref_wav,
-        out_path=out_wav,
-        language=language
-    )
-
-    # 🔥 ADD THIS LINE - smooth audio after generation
-    smooth_audio(out_wav)
+    # fade (and the rest of the chain) on the waveform, encoded once
+    eng = get_engine()
+    samples = eng.synthesize(text, ref_wav, language)
+    post_chain.render([samples], eng.sample_rate, {"wav": out_wav})
 
     return out_wav
 
@@ -0,0 +1,257 @@
+import os
+import gc
+import time
+import queue
+import threading
+import multiprocessing as mp
+
+# 0 keeps the single in-process worker thread
+POOL_SIZE = int(os.getenv("XTTS_WORKERS", "0"))
+# torch threads per worker, 0 = size of the worker's CPU slice
+WORKER_THREADS = int(os.getenv("XTTS_WORKER_THREADS", "0"))
+PIN_CORES = os.getenv("XTTS_PIN_CORES", "1") == "1"
+# Load the model once here and fork workers so they share its pages copy-on-write
+PREFORK = os.getenv("XTTS_PREFORK", "0") == "1"
+# A chunk that was on a worker this many times when it died fails its job
+MAX_CHUNK_CRASHES = int(os.getenv("XTTS_MAX_CHUNK_CRASHES", "3"))
+
+
+def cpu_slices(n):
+    """Split the CPUs this process may use into n contiguous groups"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    per = max(1, len(cpus) // n)
+    return [cpus[i * per:(i + 1) * per] or cpus for i in range(n)]
+
+
+def memory_usage(pid):
+    """RSS and PSS (shared pages split between sharers) of a process, in MB"""
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Dirty"):
+                    usage[key.lower() + "_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return usage
+
+
+def _worker_main(wid, gen, tasks, results, cpus, threads):
+    """Entry point of an engine worker process"""
+    if PIN_CORES and cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    import torch
+    torch.set_num_threads(threads or len(cpus) or 1)
+
+    # forked workers inherit the parent's engine, spawned ones load their own
+    from app.engine_registry import get_engine
+    eng = get_engine()
+    results.put(("ready", wid, gen, os.getpid()))
+
+    while True:
+        batch = tasks.get()
+        if batch is None:
+            break
+
+        clock = [time.perf_counter()]
+
+        def report(i, result):
+            # chunks of a batch run back to back: compute time = time since the previous one
+            now = time.perf_counter()
+            seconds, clock[0] = now - clock[0], now
+            if isinstance(result, Exception):
+                results.put(("chunk", wid, gen, (i, str(result), None, seconds)))
+            else:
+                results.put(("chunk", wid, gen, (i, None, result, seconds)))
+
+        eng.generate_batch(batch, on_result=report)
+        results.put(("idle", wid, gen, None))
+
+
+class WorkerPool:
+    """
+    Engine worker processes fed by a dispatcher thread in the API process.
+
+    next_tasks()           -> blocks until a batch of chunk tasks is ready
+    on_result(task, result, seconds)
+                           -> called once per finished chunk with its waveform or an
+                              Exception, and the seconds of compute it took
+    requeue(tasks)         -> gives back chunks a crashed worker never finished
+
+    A chunk that keeps killing its worker (task["crashes"] reaching
+    max_crashes) is not requeued again but reported to on_result as failed.
+    """
+
+    def __init__(self, size, next_tasks, on_result, requeue, threads=WORKER_THREADS, prefork=PREFORK,
+                 max_crashes=MAX_CHUNK_CRASHES):
+        self.size = size
+        self.next_tasks = next_tasks
+        self.on_result = on_result
+        self.requeue = requeue
+        self.threads = threads
+        self.prefork = prefork
+        self.max_crashes = max_crashes
+        self.parent_load_s = None
+        self.workers = {}
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _load_parent_engine(self):
+        """
+        Pre-fork: load and freeze the model here, then fork workers from this
+        process. Returns False, before loading anything, when forking is not
+        safe (model on CUDA): the spawned workers load their own copies.
+        """
+        from app.engine_registry import get_engine, engine_status, engine_device
+        if engine_device() == "cuda":
+            print("⚠️ XTTS_PREFORK ignored: a CUDA context cannot be shared with forked workers")
+            return False
+
+        import torch
+        # parallel regions in the parent leave an OpenMP pool that is not fork-safe
+        torch.set_num_threads(1)
+
+        get_engine().freeze()
+        self.parent_load_s = engine_status()["load_seconds"]
+
+        # move everything loaded so far out of the GC's reach, so collections in
+        # the children don't write to (and un-share) the parent's object pages
+        gc.collect()
+        gc.freeze()
+        print(f"✅ Pre-fork model loaded in {self.parent_load_s}s, forking {self.size} worker(s)")
+        return True
+
+    def start(self):
+        forked = self.prefork and self._load_parent_engine()
+        self.mode = "prefork" if forked else "spawn"
+        self.ctx = mp.get_context("fork" if forked else "spawn")
+        self.results = self.ctx.Queue()
+
+        for wid, cpus in enumerate(cpu_slices(self.size)):
+            self.workers[wid] = {"gen": 0, "cpus": cpus, "restarts": 0, "chunks": 0, "respawn_at": None}
+            self._spawn(wid)
+
+        for target in (self._dispatch, self._collect, self._monitor):
+            threading.Thread(target=target, daemon=True).start()
+        return self
+
+    def _spawn(self, wid):
+        w = self.workers[wid]
+        w["gen"] += 1
+        w["tasks"] = self.ctx.Queue()
+        w["pending"] = {}   # batch position -> task, until its result arrives
+        w["ready"] = False
+        w["spawned_at"] = time.monotonic()
+        w["proc"] = self.ctx.Process(
+            target=_worker_main,
+            args=(wid, w["gen"], w["tasks"], self.results, w["cpus"], self.threads),
+            daemon=True
+        )
+        w["proc"].start()
+
+    def _dispatch(self):
+        while True:
+            wid, gen = self._idle.get()
+            tasks = self.next_tasks()
+
+            with self._lock:
+                w = self.workers[wid]
+                if w["gen"] != gen or not w["proc"].is_alive():
+                    stale = True
+                else:
+                    stale = False
+                    w["pending"] = dict(enumerate(tasks))
+                    w["tasks"].put(tasks)
+
+            if stale:
+                # worker died between becoming idle and getting work
+                self.requeue(tasks)
+
+    def _collect(self):
+        while True:
+            kind, wid, gen, payload = self.results.get()
+
+            with self._lock:
+                w = self.workers[wid]
+                if w["gen"] != gen:
+                    continue  # message from a process we already replaced
+                if kind == "ready":
+                    w["ready"] = True
+                    w["pid"] = payload
+                    w["startup_s"] = round(time.monotonic() - w["spawned_at"], 2)
+                elif kind == "chunk":
+                    task = w["pending"].pop(payload[0], None)
+                    w["chunks"] += 1
+
+            if kind in ("ready", "idle"):
+                self._idle.put((wid, gen))
+            elif kind == "chunk" and task is not None:
+                _, error, wav, seconds = payload
+                self.on_result(task, RuntimeError(error) if error else wav, seconds)
+
+    def _monitor(self):
+        while True:
+            time.sleep(1)
+            self._check_workers(time.monotonic())
+
+    def _check_workers(self, now):
+        """Respawn dead workers and give back (or fail) the chunks they held"""
+        for wid, w in self.workers.items():
+            lost = []
+            with self._lock:
+                if w.get("respawn_at") is not None:
+                    if now >= w["respawn_at"]:
+                        w["respawn_at"] = None
+                        w["restarts"] += 1
+                        self._spawn(wid)
+                    continue
+                if w["proc"].is_alive():
+                    continue
+
+                lost = list(w["pending"].values())
+                w["pending"] = {}
+                # a worker that dies while loading the model backs off before retrying
+                w["failures"] = 0 if w["ready"] else w.get("failures", 0) + 1
+                w["respawn_at"] = now + (min(60, 2 ** w["failures"]) if w["failures"] else 0)
+                code = w["proc"].exitcode
+
+            retry, poison = [], []
+            for task in lost:
+                task["crashes"] = task.get("crashes", 0) + 1
+                (poison if task["crashes"] >= self.max_crashes else retry).append(task)
+
+            print(f"⚠️ TTS worker {wid} exited ({code}); requeueing {len(retry)} chunk(s)")
+            if retry:
+                self.requeue(retry)
+            for task in poison:
+                print(f"⚠️ Chunk {task['index']} of job {task['job_id']} was on {task['crashes']} crashed workers")
+                self.on_result(task, RuntimeError(f"TTS worker crashed {task['crashes']} times on this chunk"), None)
+
+    def stats(self):
+        with self._lock:
+            workers = [
+                {
+                    "worker": wid,
+                    "pid": w.get("pid"),
+                    "alive": w["proc"].is_alive(),
+                    "ready": w["ready"],
+                    "busy": bool(w["pending"]),
+                    "cpus": w["cpus"],
+                    "restarts": w["restarts"],
+                    "chunks": w["chunks"],
+                    "startup_s": w.get("startup_s"),
+                    "memory": memory_usage(w["pid"]) if w.get("pid") else {}
+                }
+                for wid, w in self.workers.items()
+            ]
+        return {
+            "mode": self.mode,
+            "parent_load_s": self.parent_load_s,
+            "parent_memory": memory_usage(os.getpid()),
+            "workers": workers
+        }
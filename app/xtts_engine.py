@@ -1,13 +1,152 @@
 import os
+import queue
+import threading
+import numpy as np
 from TTS.api import TTS
+from app.latent_cache import latent_cache
+from app.engine_registry import resolve_device
+
+# auto = cuda when available, else cpu
+XTTS_DEVICE = os.getenv("XTTS_DEVICE", "auto")
+# "int8" = dynamic int8 quantization of the GPT and vocoder linear layers (cpu only)
+XTTS_QUANTIZE = os.getenv("XTTS_QUANTIZE", "")
+# torch thread pools, 0 = leave torch's default
+XTTS_INTRA_OP_THREADS = int(os.getenv("XTTS_INTRA_OP_THREADS", "0"))
+XTTS_INTER_OP_THREADS = int(os.getenv("XTTS_INTER_OP_THREADS", "0"))
+
+
+def configure_threads(intra_op: int = 0, inter_op: int = 0):
+    import torch
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # can only be set once, before any inter-op work has run
+            print("⚠️ torch inter-op threads already fixed, ignoring XTTS_INTER_OP_THREADS")
+
+
+def _conv1d_to_linear(module):
+    """
+    Swap HF GPT-2 Conv1D layers (a transposed Linear) for nn.Linear so that
+    dynamic quantization, which only knows nn.Linear, covers the attention
+    and MLP projections too.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            nx, nf = child.weight.shape
+            linear = torch.nn.Linear(nx, nf)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
 
 class XTTSVoiceCloner:
-    def __init__(self):
-        self.tts = TTS(
-            "tts_models/multilingual/multi-dataset/xtts_v2",
-            gpu=True
+    def __init__(
+        self,
+        device: str = XTTS_DEVICE,
+        quantize: str = XTTS_QUANTIZE,
+        intra_op_threads: int = XTTS_INTRA_OP_THREADS,
+        inter_op_threads: int = XTTS_INTER_OP_THREADS
+    ):
+        device = resolve_device(device)
+        configure_threads(intra_op_threads, inter_op_threads)
+
+        self.tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
+        self.model = self.tts.synthesizer.tts_model
+        # XTTS keeps per-call GPT prefix state, so only one inference at a time
+        self._lock = threading.Lock()
+
+        self.quantized = None
+        if quantize:
+            if quantize != "int8":
+                raise ValueError(f"Unsupported XTTS_QUANTIZE: {quantize}")
+            if device != "cpu":
+                print("⚠️ int8 dynamic quantization is CPU only, running unquantized")
+            else:
+                self._quantize_int8()
+
+    def _quantize_int8(self):
+        import torch
+        from torch.ao.quantization import quantize_dynamic
+
+        if torch.backends.quantized.engine in (None, "none"):
+            # pick a kernel backend explicitly, e.g. ARM hosts only ship qnnpack
+            engines = torch.backends.quantized.supported_engines
+            torch.backends.quantized.engine = next(e for e in ("x86", "fbgemm", "qnnpack") if e in engines)
+
+        self.model.eval()
+        _conv1d_to_linear(self.model.gpt)
+        quantize_dynamic(self.model.gpt, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        quantize_dynamic(self.model.hifigan_decoder, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        self.quantized = "int8"
+
+    def freeze(self):
+        """Inference only: eval mode and no autograd state on any weight"""
+        self.model.eval()
+        for p in self.model.parameters():
+            p.requires_grad_(False)
+        return self
+
+    @property
+    def device(self):
+        return next(self.model.parameters()).device
+
+    @property
+    def sample_rate(self):
+        return self.model.config.audio.output_sample_rate
+
+    def get_latents(self, speaker_wav: str):
+        """Conditioning latents for a reference wav (cached per content hash)"""
+        return latent_cache.get(speaker_wav, self._compute_latents)
+
+    def warm_latents(self, speaker_wav: str):
+        latent_cache.warm(speaker_wav, self._compute_latents)
+
+    def _compute_latents(self, speaker_wav: str):
+        c = self.model.config
+        return self.model.get_conditioning_latents(
+            audio_path=speaker_wav,
+            gpt_cond_len=c.gpt_cond_len,
+            gpt_cond_chunk_len=c.gpt_cond_chunk_len,
+            max_ref_length=c.max_ref_len,
+            sound_norm_refs=c.sound_norm_refs
         )
 
+    def _settings(self):
+        c = self.model.config
+        return {
+            "temperature": c.temperature,
+            "length_penalty": c.length_penalty,
+            "repetition_penalty": c.repetition_penalty,
+            "top_k": c.top_k,
+            "top_p": c.top_p
+        }
+
+    def _infer(self, text, language, latents):
+        gpt_cond_latent, speaker_embedding = latents
+        with self._lock:
+            out = self.model.inference(
+                text=text,
+                language=language,
+                gpt_cond_latent=gpt_cond_latent,
+                speaker_embedding=speaker_embedding,
+                enable_text_splitting=True,
+                **self._settings()
+            )
+        return out["wav"]
+
+    def synthesize(self, text: str, speaker_wav: str, language: str = "en"):
+        """Float32 waveform at self.sample_rate"""
+        wav = self._infer(text, language, self.get_latents(speaker_wav))
+        return np.asarray(wav, dtype=np.float32)
+
     def generate(
         self,
         text: str,
@@ -17,11 +156,92 @@ class XTTSVoiceCloner:
     ):
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
-        self.tts.tts_to_file(
-            text=text,
-            speaker_wav=speaker_wav,
-            language=language,
-            file_path=out_path
-        )
+        wav = self._infer(text, language, self.get_latents(speaker_wav))
+        self.tts.synthesizer.save_wav(wav=wav, path=out_path)
 
         return out_path
+
+    def generate_batch(self, items, on_result=None):
+        """
+        Synthesize several chunks (dicts with text/speaker_wav/language).
+
+        XTTS v2 decodes a single text sequence per GPT call (the prompt
+        prefix is stored on the model), so a batch cannot be padded into
+        one forward pass. Items are grouped by speaker and language instead,
+        latents are resolved once per group and the group runs back to back.
+        Returns one entry per item: the float32 waveform or the Exception raised.
+        `on_result(i, result)` is called as soon as item i is finished.
+        """
+        results = [None] * len(items)
+        groups = {}
+        for i, item in enumerate(items):
+            groups.setdefault((item["speaker_wav"], item["language"]), []).append(i)
+
+        for (speaker_wav, language), idxs in groups.items():
+            try:
+                latents = self.get_latents(speaker_wav)
+            except Exception as e:
+                latents = e
+
+            for i in idxs:
+                try:
+                    if isinstance(latents, Exception):
+                        raise latents
+                    wav = self._infer(items[i]["text"], language, latents)
+                    results[i] = np.asarray(wav, dtype=np.float32)
+                except Exception as e:
+                    results[i] = e
+                if on_result:
+                    on_result(i, results[i])
+
+        return results
+
+    def stream(
+        self,
+        text: str,
+        speaker_wav: str,
+        language: str = "en",
+        stream_chunk_size: int = 20
+    ):
+        """
+        Yield float32 numpy chunks as soon as XTTS decodes them.
+
+        Decoding runs on its own thread into a buffer, so the engine lock is
+        held while XTTS works and not while a slow client reads: queued jobs
+        get the engine as soon as the text is decoded. Closing the generator
+        stops decoding at the next chunk.
+        """
+        gpt_cond_latent, speaker_embedding = self.get_latents(speaker_wav)
+        out = queue.Queue()
+        stop = threading.Event()
+
+        def decode():
+            try:
+                with self._lock:
+                    for chunk in self.model.inference_stream(
+                        text,
+                        language,
+                        gpt_cond_latent,
+                        speaker_embedding,
+                        stream_chunk_size=stream_chunk_size,
+                        enable_text_splitting=True,
+                        **self._settings()
+                    ):
+                        if stop.is_set():
+                            break
+                        out.put(chunk.squeeze().cpu().numpy())
+                out.put(None)
+            except Exception as e:
+                out.put(e)
+
+        threading.Thread(target=decode, daemon=True).start()
+        try:
+            while True:
+                item = out.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
@@ -32,6 +32,22 @@ ADMIN_SECRET = os.environ.get('ADMIN_SECRET', 'admin_super_secret_key')
 XTTS_SERVER_URL = os.environ.get('XTTS_SERVER_URL', 'http://localhost:8001')
 XTTS_ADMIN_KEY = os.environ.get('XTTS_ADMIN_KEY', '')
 
+# XTTS priority lane per subscription plan (case-insensitive plan name).
+# Users without a plan go to the free lane; unknown plans to standard.
+# Override with XTTS_PLAN_PRIORITY="Lite=free,Advance=premium".
+PLAN_PRIORITY = {"premium": "premium", "ultra": "premium", "advance": "standard", "lite": "standard"}
+for item in os.environ.get('XTTS_PLAN_PRIORITY', '').split(","):
+    if "=" in item:
+        plan, lane = item.split("=", 1)
+        PLAN_PRIORITY[plan.strip().lower()] = lane.strip()
+
+def plan_priority(user) -> str:
+    plan = user.get("plan_name")
+    expires = user.get("plan_expires_at")
+    if not plan or (expires and expires < datetime.now(timezone.utc).isoformat()):
+        return "free"
+    return PLAN_PRIORITY.get(plan.lower(), "standard")
+
 # HTTP Client for XTTS
 http_client = httpx.AsyncClient(timeout=120.0)
 
@@ -622,12 +638,22 @@ async def generate_voice(request: GenerateVoiceRequest, user = Depends(get_curre
             "user_id": xtts_user_id,
             "voice_name": voice_name,
             "text": request.text,
-            "language": request.language or "en"
+            "language": request.language or "en",
+            "priority": plan_priority(user)
         }
         
         # Long timeout for sync generation (5 minutes)
         response = await http_client.post(f"{XTTS_SERVER_URL}/tts", data=data, timeout=300.0)
         
+        if response.status_code == 429:
+            # XTTS is over its backlog limit for this plan - pass the back-off on, nothing charged
+            retry_after = response.headers.get("Retry-After", "60")
+            raise HTTPException(
+                status_code=429,
+                detail=response.json().get("detail", "TTS server is busy. Please try again later."),
+                headers={"Retry-After": retry_after}
+            )
+        
         if response.status_code != 200:
             error_detail = response.json().get("detail", "TTS generation failed")
             raise HTTPException(status_code=response.status_code, detail=error_detail)
@@ -651,7 +677,7 @@ async def generate_voice(request: GenerateVoiceRequest, user = Depends(get_curre
                 "text": request.text,
                 "text_length": text_length,
                 "credits_used": credits_needed,
-                "status": "queued",
+                "status": result.get("status", "queued"),
                 "created_at": datetime.now(timezone.utc).isoformat()
             })
             
@@ -666,7 +692,9 @@ async def generate_voice(request: GenerateVoiceRequest, user = Depends(get_curre
             return {
                 "id": generation_id,
                 "job_id": xtts_job_id,
-                "status": "queued",
+                "status": result.get("status", "queued"),
+                "queue_position": result.get("queue_position"),
+                "eta_seconds": result.get("eta_seconds"),
                 "message": "Voice generation started. Poll status endpoint for progress.",
                 "credits_used": credits_needed
             }
@@ -722,7 +750,7 @@ async def generate_voice(request: GenerateVoiceRequest, user = Depends(get_curre
 async def get_generation_status(job_id: str, user = Depends(get_current_user)):
     """
     Poll this endpoint to check TTS job status
-    Returns: queued | processing | completed | failed
+    Returns: deferred | queued | processing | completed | failed
     """
     # Find job in our DB
     job = await db.voice_generations.find_one(
@@ -770,6 +798,9 @@ async def get_generation_status(job_id: str, user = Depends(get_current_user)):
                 "status": status,
                 "audio_url": update_data.get("audio_url"),
                 "error": update_data.get("error"),
+                "queue_position": xtts_status.get("queue_position"),
+                "eta_seconds": xtts_status.get("eta_seconds"),
+                "playlist_url": f"{XTTS_SERVER_URL}{xtts_status['playlist_url']}" if xtts_status.get("playlist_url") else None,
                 "message": xtts_status.get("message", "")
             }
             
@@ -0,0 +1,96 @@
+"""
+RTF of a long text against the chunk token budget (XTTS_CHUNK_TOKENS).
+
+For each budget the text is chunked with app.text_chunker and every chunk is
+synthesized on its own, the way the job queue runs it. RTF = total synthesis
+seconds / total audio seconds; lower is better. Budgets above what the
+per-language character limit allows produce the same chunks, and show up
+with identical chunk counts.
+
+Run from the repo root, then set XTTS_CHUNK_TOKENS to the best budget:
+    python -m benchmarks.bench_chunk_size --speaker voices/<user>/<voice>/ref.wav
+    python -m benchmarks.bench_chunk_size --speaker ref.wav --language de --text-file article.txt
+
+--chunks-only prints just the chunking per budget (no model needed), which
+shows from which budget on the character limit decides the chunks:
+    python -m benchmarks.bench_chunk_size --chunks-only --language all
+"""
+
+import time
+import argparse
+
+TEXT = (
+    "The committee met on Tuesday to review the budget. Several members raised "
+    "concerns about the timeline, which they felt was too ambitious given the "
+    "staffing changes announced last month. After a long discussion, the chair "
+    "proposed a compromise: the first phase would go ahead as planned, while the "
+    "second phase would be reviewed again in the autumn. Nobody objected. "
+    "The minutes were approved without changes, and the meeting closed shortly "
+    "after four o'clock. A short summary will be sent to all staff next week, "
+    "together with the revised schedule and a list of open questions. "
+) * 4
+
+
+def run(eng, chunks, speaker, language):
+    synth = audio = 0.0
+    for chunk in chunks:
+        t0 = time.perf_counter()
+        wav = eng.synthesize(chunk, speaker, language)
+        synth += time.perf_counter() - t0
+        audio += len(wav) / eng.sample_rate
+    return synth, audio
+
+
+def chunks_only(text, languages, budgets):
+    from app.text_chunker import chunk_text, count_tokens, CHUNK_TOKENS, _load_tokenizer
+
+    print(f"tokens: {'XTTS tokenizer' if _load_tokenizer() else 'per-language estimate'}, "
+          f"current default {CHUNK_TOKENS}")
+    print(f"{'lang':>4} {'budget':>6} {'chunks':>6} {'mean chars':>10} {'max chars':>9} {'max tokens':>10}")
+    for language in languages:
+        for budget in budgets:
+            chunks = chunk_text(text, language, max_tokens=budget)
+            print(f"{language:>4} {budget:>6} {len(chunks):>6} {len(text) / len(chunks):>10.0f} "
+                  f"{max(map(len, chunks)):>9} {max(count_tokens(c, language) for c in chunks):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speaker")
+    parser.add_argument("--language", default="en", help="'all' with --chunks-only: every CHAR_LIMITS language")
+    parser.add_argument("--text-file", default=None)
+    parser.add_argument("--budgets", default="30,60,90,120,150,200,300", help="token budgets to try")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--chunks-only", action="store_true", help="chunk statistics only, no synthesis")
+    args = parser.parse_args()
+
+    text = open(args.text_file, encoding="utf-8").read() if args.text_file else TEXT
+    budgets = sorted({int(b) for b in args.budgets.split(",") if b})
+    if args.chunks_only:
+        from app.text_chunker import CHAR_LIMITS
+        return chunks_only(text, list(CHAR_LIMITS) if args.language == "all" else [args.language], budgets)
+    if not args.speaker:
+        parser.error("--speaker is required unless --chunks-only is given")
+
+    from app.xtts_engine import XTTSVoiceCloner
+    from app.text_chunker import chunk_text, CHUNK_TOKENS
+
+    eng = XTTSVoiceCloner(**({"device": args.device} if args.device else {}))
+    eng.synthesize("Warm-up.", args.speaker, args.language)  # also fills the latent cache
+
+    print(f"{len(text)} chars, language {args.language}, current default {CHUNK_TOKENS} tokens")
+    print(f"{'budget':>6} {'chunks':>6} {'mean chars':>10} {'synth s':>8} {'audio s':>8} {'RTF':>6}")
+    results = []
+    for budget in budgets:
+        chunks = chunk_text(text, args.language, max_tokens=budget)
+        synth, audio = run(eng, chunks, args.speaker, args.language)
+        rtf = synth / audio
+        results.append((rtf, budget))
+        print(f"{budget:>6} {len(chunks):>6} {len(text) / len(chunks):>10.0f} {synth:>8.1f} {audio:>8.1f} {rtf:>6.3f}")
+
+    best_rtf, best = min(results)
+    print(f"\nbest: XTTS_CHUNK_TOKENS={best} (RTF {best_rtf:.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Real-time factor of the XTTS engine per CPU configuration.
+
+RTF = synthesis seconds / audio seconds (below 1.0 is faster than real time).
+
+Run from the repo root:
+    python -m benchmarks.bench_cpu_rtf --speaker voices/<user>/<voice>/ref.wav
+    python -m benchmarks.bench_cpu_rtf --speaker ref.wav --threads 2,4,8 --quantize none,int8
+"""
+
+import os
+import time
+import argparse
+
+TEXT = (
+    "The quick brown fox jumps over the lazy dog. "
+    "This sentence is long enough to exercise the decoder for a few seconds of audio."
+)
+
+
+def measure(eng, text, speaker, language, repeat):
+    eng.synthesize(text, speaker, language)  # warm-up, also fills the latent cache
+    rtfs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        wav = eng.synthesize(text, speaker, language)
+        elapsed = time.perf_counter() - t0
+        rtfs.append(elapsed / (len(wav) / eng.sample_rate))
+    return min(rtfs), sum(rtfs) / len(rtfs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speaker", required=True, help="reference wav")
+    parser.add_argument("--text", default=TEXT)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--threads", default=f"1,2,4,{os.cpu_count()}", help="intra-op thread counts to try")
+    parser.add_argument("--quantize", default="none,int8", help="comma list of none/int8")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    import torch
+    from app.xtts_engine import XTTSVoiceCloner
+
+    threads = sorted({int(t) for t in args.threads.split(",") if t})
+    print(f"host: {os.cpu_count()} cpus, torch {torch.__version__}, device {args.device}")
+    print(f"{'quantize':>8} {'threads':>7} {'best RTF':>9} {'mean RTF':>9}")
+
+    for quantize in args.quantize.split(","):
+        eng = XTTSVoiceCloner(device=args.device, quantize="" if quantize == "none" else quantize)
+        for n in threads:
+            torch.set_num_threads(n)
+            best, mean = measure(eng, args.text, args.speaker, args.language, args.repeat)
+            print(f"{quantize:>8} {n:>7} {best:>9.3f} {mean:>9.3f}")
+        del eng
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Upload conversion: pydub/ffmpeg subprocess vs in-process decode + resample.
+
+Writes a --seconds clip (44.1 kHz stereo, the usual phone/DAW export) as
+WAV, FLAC, OGG and MP3, then converts each to 22,050 Hz mono WAV with the
+previous pydub path and with audio_utils.load_audio. Reports the best wall
+time and the CPU time of this process plus its children (ffmpeg runs as a
+child, so its cost is counted too).
+
+Needs ffmpeg on PATH for the pydub column. Run from the repo root:
+    python -m benchmarks.bench_decode --seconds 30
+    python -m benchmarks.bench_decode --input upload.m4a
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+
+def pydub_convert(path, out_path):
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(path)
+    audio.set_channels(1).set_frame_rate(22050).export(out_path, format="wav")
+
+
+def native_convert(path, out_path):
+    from app.audio_utils import load_audio, write_wav, REFERENCE_SAMPLE_RATE
+    write_wav(out_path, [load_audio(path)], REFERENCE_SAMPLE_RATE)
+
+
+def cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def measure(fn, path, out, repeat):
+    best_wall = best_cpu = float("inf")
+    for _ in range(repeat):
+        w0, c0 = time.perf_counter(), cpu_seconds()
+        fn(path, out)
+        best_wall = min(best_wall, time.perf_counter() - w0)
+        best_cpu = min(best_cpu, cpu_seconds() - c0)
+    return best_wall * 1000, best_cpu * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--input", action="append", default=[], help="convert these files instead")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import soundfile as sf
+
+    tmp = tempfile.mkdtemp(prefix="bench_decode_")
+    try:
+        files = list(args.input)
+        if not files:
+            sr = 44100
+            t = np.arange(int(args.seconds * sr)) / sr
+            rng = np.random.default_rng(0)
+            left = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.02 * rng.standard_normal(len(t))
+            clip = np.stack([left, np.roll(left, 50)], axis=1).astype(np.float32)
+            for ext, fmt, subtype in (("wav", "WAV", "PCM_16"), ("flac", "FLAC", "PCM_16"),
+                                      ("ogg", "OGG", "VORBIS"), ("mp3", "MP3", "MPEG_LAYER_III")):
+                path = os.path.join(tmp, f"clip.{ext}")
+                sf.write(path, clip, sr, format=fmt, subtype=subtype)
+                files.append(path)
+
+        has_ffmpeg = shutil.which("ffmpeg") is not None
+        impls = [("native", native_convert)] + ([("pydub", pydub_convert)] if has_ffmpeg else [])
+        if not has_ffmpeg:
+            print("ffmpeg not found - pydub column skipped")
+        print(f"{'file':>12} {'impl':>7} {'wall ms':>8} {'cpu ms':>8}")
+        for path in files:
+            for name, fn in impls:
+                out = os.path.join(tmp, f"out_{name}.wav")
+                try:
+                    wall, cpu = measure(fn, path, out, args.repeat)
+                except Exception as e:
+                    print(f"{os.path.basename(path):>12} {name:>7} failed: {e}")
+                    continue
+                print(f"{os.path.basename(path):>12} {name:>7} {wall:>8.1f} {cpu:>8.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
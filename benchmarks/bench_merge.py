@@ -0,0 +1,89 @@
+"""
+WAV merging: pydub `combined += audio` vs the streaming merger (merge_wav_files).
+
+Writes --parts synthetic 16-bit WAVs of --seconds each (24 kHz mono), then
+merges them with both implementations. Reports wall time and peak Python
+heap (tracemalloc; covers pydub's byte strings and NumPy buffers) and checks
+that both outputs hold the same samples. Exits 1 if they differ.
+
+Run from the repo root (pydub handles WAV without ffmpeg):
+    python -m benchmarks.bench_merge --parts 60 --seconds 10
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+
+def pydub_merge(file_list, output_path):
+    """The original pydub merge of the chunk files"""
+    from pydub import AudioSegment
+    combined = AudioSegment.empty()
+    for f in file_list:
+        combined += AudioSegment.from_wav(f)
+    combined.export(output_path, format="wav")
+
+
+def streaming_merge(file_list, output_path):
+    from app.audio_utils import merge_wav_files
+    merge_wav_files(file_list, output_path)
+
+
+def measure(fn, files, out):
+    t0 = time.perf_counter()
+    fn(files, out)
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    fn(files, out)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--sample-rate", type=int, default=24000)
+    args = parser.parse_args()
+
+    from app.audio_utils import write_wav, read_wav_blocks
+
+    tmp = tempfile.mkdtemp(prefix="bench_merge_")
+    try:
+        rng = np.random.default_rng(0)
+        files = []
+        for i in range(args.parts):
+            samples = (rng.standard_normal(int(args.seconds * args.sample_rate)) * 0.1).astype(np.float32)
+            path = os.path.join(tmp, f"part_{i:03d}.wav")
+            write_wav(path, [samples], args.sample_rate)
+            files.append(path)
+
+        total_s = args.parts * args.seconds
+        print(f"{args.parts} parts x {args.seconds:g}s = {total_s / 60:.1f} min of audio")
+        print(f"{'impl':>10} {'seconds':>8} {'peak MB':>8}")
+        results = {}
+        for name, fn in (("pydub", pydub_merge), ("streaming", streaming_merge)):
+            out = os.path.join(tmp, f"{name}.wav")
+            elapsed, peak = measure(fn, files, out)
+            results[name] = out
+            print(f"{name:>10} {elapsed:>8.2f} {peak:>8.1f}")
+
+        a = np.concatenate(list(read_wav_blocks(results["pydub"])))
+        b = np.concatenate(list(read_wav_blocks(results["streaming"])))
+        same = len(a) == len(b) and np.array_equal(a, b)
+        print(f"identical output: {'yes' if same else 'NO'} ({len(a)} vs {len(b)} samples)")
+        sys.exit(0 if same else 1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
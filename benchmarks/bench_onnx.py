@@ -0,0 +1,136 @@
+"""
+ONNX Runtime vs PyTorch for the XTTS decoder stack.
+
+1. Equivalence: audio codes are sampled once (greedy, PyTorch), then both
+   paths decode the *same* codes. GPT latents and waveforms must match
+   within --atol, otherwise the script exits with status 1.
+2. Latency and memory: code sampling and the decoder stack on the same
+   input, then end-to-end RTF of synthesize() with each path. Sampling
+   always runs in PyTorch, so the decoder's share of sampling + decoding
+   is the most of a synthesis that ONNX Runtime can speed up.
+
+Run from the repo root after `python -m app.onnx_engine export`:
+    python -m benchmarks.bench_onnx --speaker voices/<user>/<voice>/ref.wav
+"""
+
+import sys
+import time
+import argparse
+import resource
+
+import numpy as np
+import torch
+
+TEXT = "Both decoder paths should produce the same waveform for the same audio codes."
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def sample_codes(model, text, language, latents):
+    gpt_cond_latent, _ = latents
+    tokens = torch.IntTensor(model.tokenizer.encode(text.strip().lower(), lang=language)).unsqueeze(0)
+    with torch.inference_mode():
+        codes = model.gpt.generate(
+            cond_latents=gpt_cond_latent,
+            text_inputs=tokens,
+            input_tokens=None,
+            do_sample=False,
+            num_beams=1,
+            repetition_penalty=model.config.repetition_penalty
+        )
+    return tokens, codes
+
+
+def decode(model, tokens, codes, latents):
+    """The part of Xtts.inference that runs after sampling"""
+    gpt_cond_latent, speaker_embedding = latents
+    with torch.inference_mode():
+        t0 = time.perf_counter()
+        gpt_latents = model.gpt(
+            tokens,
+            torch.tensor([tokens.shape[-1]]),
+            codes,
+            torch.tensor([codes.shape[-1] * model.gpt.code_stride_len]),
+            cond_latents=gpt_cond_latent,
+            return_attentions=False,
+            return_latent=True
+        )
+        wav = model.hifigan_decoder(gpt_latents, g=speaker_embedding)
+        elapsed = time.perf_counter() - t0
+    return gpt_latents.cpu().numpy(), wav.cpu().numpy().squeeze(), elapsed
+
+
+def rtf(eng, text, speaker, language, repeat):
+    values = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        wav = eng.synthesize(text, speaker, language)
+        values.append((time.perf_counter() - t0) / (len(wav) / eng.sample_rate))
+    return min(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speaker", required=True)
+    parser.add_argument("--text", default=TEXT)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--onnx-dir", default=None)
+    parser.add_argument("--atol", type=float, default=1e-3, help="max abs difference allowed")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from app.xtts_engine import XTTSVoiceCloner
+    from app.onnx_engine import attach_onnx, detach_onnx, XTTS_ONNX_DIR
+
+    eng = XTTSVoiceCloner(device="cpu", quantize="").freeze()
+    model = eng.model
+    latents = eng.get_latents(args.speaker)
+    sample_codes(model, args.text, args.language, latents)  # warm-up
+    t0 = time.perf_counter()
+    tokens, codes = sample_codes(model, args.text, args.language, latents)
+    sample_s = time.perf_counter() - t0
+
+    decode(model, tokens, codes, latents)  # warm-up
+    torch_lat, torch_wav, torch_s = decode(model, tokens, codes, latents)
+    torch_rtf = rtf(eng, args.text, args.speaker, args.language, args.repeat)
+
+    before = rss_mb()
+    replaced = attach_onnx(model, args.onnx_dir or XTTS_ONNX_DIR)
+    onnx_sessions_mb = rss_mb() - before
+
+    decode(model, tokens, codes, latents)
+    onnx_lat, onnx_wav, onnx_s = decode(model, tokens, codes, latents)
+    onnx_rtf = rtf(eng, args.text, args.speaker, args.language, args.repeat)
+    detach_onnx(model, replaced)
+
+    lat_diff = float(np.abs(torch_lat - onnx_lat).max())
+    n = min(len(torch_wav), len(onnx_wav))
+    wav_diff = float(np.abs(torch_wav[:n] - onnx_wav[:n]).max())
+    ok = lat_diff <= args.atol and wav_diff <= args.atol and len(torch_wav) == len(onnx_wav)
+
+    print(f"codes: {codes.shape[-1]}  audio: {len(torch_wav) / eng.sample_rate:.2f}s")
+    print(f"latents   max|diff| {lat_diff:.2e}")
+    print(f"waveform  max|diff| {wav_diff:.2e}  (samples torch={len(torch_wav)} onnx={len(onnx_wav)})")
+    print(f"equivalence within atol={args.atol}: {'PASS' if ok else 'FAIL'}")
+    print()
+    share = torch_s / (sample_s + torch_s)
+    print(f"sampling (PyTorch on both paths) {sample_s * 1000:.1f} ms")
+    print(f"{'path':>8} {'decoder ms':>11} {'e2e RTF':>8}")
+    print(f"{'torch':>8} {torch_s * 1000:>11.1f} {torch_rtf:>8.3f}")
+    print(f"{'onnx':>8} {onnx_s * 1000:>11.1f} {onnx_rtf:>8.3f}")
+    print(f"ONNX share of end-to-end time: {share:.1%} with torch, "
+          f"{onnx_s / (sample_s + onnx_s):.1%} with onnx "
+          f"(e2e speedup bound {1 / (1 - share):.2f}x)")
+    print(f"ORT sessions add {onnx_sessions_mb:.0f} MB RSS (torch modules kept for comparison)")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Post-processing: pydub round-trips vs the in-memory chain.
+
+The previous path wrote the synthesized WAV, decoded it again to fade it
+(smooth_audio), re-exported it, then decoded it a third time to encode MP3
+(wav_to_mp3). The chain fades the waveform and feeds both encoders from it.
+Reports wall time per --seconds of synthetic 24 kHz audio; --mp3 adds the
+MP3 output (needs ffmpeg for the pydub side).
+
+Run from the repo root:
+    python -m benchmarks.bench_postprocess --seconds 600
+    python -m benchmarks.bench_postprocess --seconds 600 --mp3
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+
+def pydub_path(samples, sample_rate, out_wav, mp3):
+    from pydub import AudioSegment
+    from app.audio_utils import write_wav
+    write_wav(out_wav, [samples], sample_rate)
+    audio = AudioSegment.from_wav(out_wav)
+    audio.fade_in(50).fade_out(50).export(out_wav, format="wav")
+    if mp3:
+        AudioSegment.from_wav(out_wav).export(out_wav.replace(".wav", ".mp3"), format="mp3")
+
+
+def chain_path(samples, sample_rate, out_wav, mp3):
+    from app.postprocess import build_chain
+    outputs = {"wav": out_wav}
+    if mp3:
+        outputs["mp3"] = out_wav.replace(".wav", ".mp3")
+    build_chain("fade").render([samples], sample_rate, outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--sample-rate", type=int, default=24000)
+    parser.add_argument("--mp3", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(int(args.seconds * args.sample_rate)) * 0.1).astype(np.float32)
+
+    tmp = tempfile.mkdtemp(prefix="bench_post_")
+    try:
+        print(f"{args.seconds / 60:.1f} min of audio, outputs: wav{' + mp3' if args.mp3 else ''}")
+        print(f"{'impl':>8} {'best s':>8}")
+        for name, fn in (("pydub", pydub_path), ("chain", chain_path)):
+            out = os.path.join(tmp, f"{name}.wav")
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                fn(samples, args.sample_rate, out, args.mp3)
+                best = min(best, time.perf_counter() - t0)
+            print(f"{name:>8} {best:>8.2f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
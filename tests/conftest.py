@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The app modules keep their state in directories relative to the working
+# directory (jobs/, outputs/, voices/) and create them on import, so the
+# tests run from a scratch directory with the repo on the path.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="xtts_tests_"))
@@ -0,0 +1,35 @@
+import pytest
+
+from app.admission import AdmissionController, QueueFull
+
+
+def test_lanes_without_a_limit_always_admit():
+    admission = AdmissionController({"free": 300})
+    assert admission.retry_after("premium", 10_000) is None
+
+
+def test_retry_after_is_the_excess_over_the_limit():
+    admission = AdmissionController({"free": 300})
+    assert admission.retry_after("free", 0) is None
+    assert admission.retry_after("free", 300) is None
+    assert admission.retry_after("free", 350) == 50
+    assert admission.retry_after("free", 300.2) == 1
+
+
+def test_counts_per_lane_and_outcome():
+    admission = AdmissionController({"free": 300}, mode="defer")
+    admission.count("free", "admitted", 100)
+    admission.count("free", "admitted", 50)
+    admission.count("free", "deferred", 7000)
+    stats = admission.stats()
+    assert stats["mode"] == "defer"
+    free = stats["lanes"]["free"]
+    assert free["max_backlog_s"] == 300
+    assert (free["admitted"], free["admitted_chars"], free["deferred"]) == (2, 150, 1)
+    assert stats["lanes"]["premium"]["max_backlog_s"] is None
+
+
+def test_queue_full_message():
+    with pytest.raises(QueueFull, match=r"~350s of work ahead\). Retry in 50s") as e:
+        raise QueueFull("free", 350.4, 50)
+    assert e.value.retry_after == 50
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from app.audio_utils import join_parts, merge_wav_files, read_wav_blocks, write_wav, wav_sample_rate
+
+SR = 1000
+
+
+def blocks(samples, size):
+    return [samples[i:i + size] for i in range(0, len(samples), size)]
+
+
+def joined(parts, **kwargs):
+    return np.concatenate(list(join_parts(parts, SR, **kwargs)))
+
+
+def test_plain_join_is_concatenation_whatever_the_block_size():
+    a, b = np.arange(500, dtype=np.float32), -np.arange(300, dtype=np.float32)
+    for size in (1, 7, 1000):
+        assert np.array_equal(joined([blocks(a, size), blocks(b, size)]), np.concatenate((a, b)))
+
+
+def test_crossfade_overlaps_the_boundary_linearly():
+    a, b = np.ones(500, dtype=np.float32), np.zeros(400, dtype=np.float32)
+    for size in (3, 64, 1000):
+        out = joined([blocks(a, size), blocks(b, size)], crossfade_ms=100)
+        assert len(out) == 500 + 400 - 100
+        assert np.all(out[:400] == 1) and np.all(out[500:] == 0)
+        assert np.allclose(out[400:500], 1 - np.linspace(0, 1, 100))
+
+
+def test_crossfade_with_a_part_shorter_than_it():
+    a, b, c = (np.full(n, v, dtype=np.float32) for n, v in ((500, 1.0), (30, 0.0), (500, 1.0)))
+    out = joined([[a], [b], [c]], crossfade_ms=100)
+    # b is blended into a's last 30 samples, and fades into c over those 30
+    assert len(out) == 500 + 30 + 500 - 30 - 30
+    assert np.all(out[:470] == 1) and np.all(out[-470:] == 1)
+    assert out.min() < 1
+
+
+def test_trim_removes_silence_at_part_edges_keeping_the_pad():
+    speech = np.full(200, 0.5, dtype=np.float32)
+    quiet = np.zeros(300, dtype=np.float32)
+    part = np.concatenate((quiet, speech, quiet))
+    out = joined([blocks(part, 64), blocks(part, 64)], trim_db=-45, trim_pad_ms=50)
+    # 50 ms = 50 samples of silence on each side of each part, across block edges
+    assert len(out) == 2 * (50 + 200 + 50)
+    assert np.all(out[50:250] == 0.5) and np.all(out[:50] == 0) and np.all(out[250:350] == 0)
+
+
+def test_merge_wav_files(tmp_path):
+    a, b = str(tmp_path / "a.wav"), str(tmp_path / "b.wav")
+    write_wav(a, [np.full(100, 0.25, dtype=np.float32)], 22050)
+    write_wav(b, [np.full(50, -0.25, dtype=np.float32)], 22050)
+    out = merge_wav_files([a, b], str(tmp_path / "out.wav"))
+    assert wav_sample_rate(out) == 22050
+    samples = np.concatenate(list(read_wav_blocks(out)))
+    assert len(samples) == 150
+    assert np.allclose(samples[:100], 0.25, atol=1e-4) and np.allclose(samples[100:], -0.25, atol=1e-4)
+
+    other = str(tmp_path / "other.wav")
+    write_wav(other, [np.zeros(10, dtype=np.float32)], 24000)
+    with pytest.raises(ValueError):
+        merge_wav_files([a, other], str(tmp_path / "bad.wav"))
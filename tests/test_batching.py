@@ -0,0 +1,30 @@
+from app.batching import BatchCollector
+from app.scheduler import LaneQueue
+
+
+def task(job_id, priority, text="x" * 100, user_id=None):
+    return {"job_id": job_id, "user_id": user_id or job_id, "priority": priority, "text": text}
+
+
+def test_batch_collects_up_to_max_size():
+    q = LaneQueue(capacity=8)
+    for i in range(5):
+        q.put(task(f"job{i}", "standard"))
+    batch = BatchCollector(q, window_ms=0, max_size=3).next_batch()
+    assert len(batch) == 3
+    assert q.qsize() == 2
+
+
+def test_premium_arriving_later_is_served_before_queued_free_chunks():
+    q = LaneQueue(capacity=1)
+    batcher = BatchCollector(q, window_ms=0, max_size=1)
+    for i in range(8):
+        q.put(task("free-job", "free"))
+
+    running = batcher.next_batch()
+    q.put(task("premium-job", "premium"))
+    assert q.position("premium-job", "premium") == (0, 1)
+
+    q.release(running[0])
+    assert [t["job_id"] for t in batcher.next_batch()] == ["premium-job"]
+    assert q.qsize() == 7
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+
+from app import chunk_buffer
+from app.chunk_buffer import ChunkBuffer
+
+
+def samples(n, value=0.5):
+    return np.full(n, value, dtype=np.float32)
+
+
+def test_chunks_come_back_in_order(tmp_path):
+    buffer = ChunkBuffer(3, str(tmp_path / "job"))
+    buffer.put(2, samples(10, 0.3))
+    buffer.put(0, samples(10, 0.1))
+    assert not buffer.complete
+    buffer.put(1, samples(10, 0.2))
+    assert buffer.complete
+    assert [round(float(part[0]), 1) for part in buffer] == [0.1, 0.2, 0.3]
+    assert not os.path.exists(tmp_path / "job")  # all in memory, nothing written
+    buffer.release()
+
+
+def test_spills_to_disk_over_the_memory_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunk_buffer, "CHUNK_MEMORY_MB", 0)
+    buffer = ChunkBuffer(2, str(tmp_path / "job"))
+    buffer.put(0, samples(100))
+    buffer.put(1, samples(100))
+    assert buffer.spilled == 2 and buffer.mem_bytes == 0
+    assert sorted(os.listdir(tmp_path / "job")) == ["0.npy", "1.npy"]
+    assert np.array_equal(np.concatenate(list(buffer)), samples(200))
+    buffer.release()
+
+
+def test_restore_picks_up_checkpoints(tmp_path):
+    first = ChunkBuffer(3, str(tmp_path / "job"), checkpoint=True)
+    first.put(0, samples(10, 0.1))
+    first.put(2, samples(10, 0.3), checkpoint=False)  # e.g. from the fragment cache
+
+    second = ChunkBuffer(3, str(tmp_path / "job"), checkpoint=True)
+    assert second.restore() == [0]
+    assert second.count == 1 and second.get(1) is None
+    assert np.array_equal(second.get(0), samples(10, 0.1))
+    first.release()
+
+
+def test_release_frees_budget_and_files(tmp_path, monkeypatch):
+    buffer = ChunkBuffer(2, str(tmp_path / "job"), checkpoint=True)
+    before = chunk_buffer._in_memory
+    buffer.put(0, samples(1000))
+    assert chunk_buffer._in_memory == before + 4000
+    buffer.release()
+    assert chunk_buffer._in_memory == before
+    assert not os.path.exists(tmp_path / "job")
+    assert list(buffer) == []
+
+
+def test_put_after_release_is_ignored(tmp_path):
+    # a chunk finishing after its job failed must not re-create the spill
+    # dir or take budget that nothing will give back
+    buffer = ChunkBuffer(2, str(tmp_path / "job"), checkpoint=True)
+    buffer.put(0, samples(10))
+    buffer.release()
+    before = chunk_buffer._in_memory
+    buffer.put(1, samples(1000))
+    assert chunk_buffer._in_memory == before
+    assert not os.path.exists(tmp_path / "job")
+    assert buffer.count == 1
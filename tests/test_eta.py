@@ -0,0 +1,39 @@
+import pytest
+
+from app.eta import ThroughputModel
+
+
+def test_prior_until_the_first_chunk():
+    model = ThroughputModel(prior_sec_per_char=0.05)
+    assert model.sec_per_char("en") == 0.05
+    assert model.sec_per_chunk() == pytest.approx(50)
+    assert model.seconds("en", 200) == pytest.approx(10)
+    assert model.stats() == {"sec_per_char": {}, "rtf": {}, "sec_per_chunk": None}
+
+
+def test_first_sample_replaces_the_prior_then_ewma():
+    model = ThroughputModel(alpha=0.5, prior_sec_per_char=1.0)
+    model.record("en", 100, 2.0, audio_s=4.0)    # 0.02 s/char
+    assert model.sec_per_char("en") == pytest.approx(0.02)
+    model.record("en", 100, 4.0, audio_s=4.0)    # 0.04 s/char
+    assert model.sec_per_char("en") == pytest.approx(0.03)
+    assert model.sec_per_chunk() == pytest.approx(3.0)
+    stats = model.stats()
+    assert stats["rtf"]["en"] == {"value": 0.75, "samples": 2}
+    assert stats["sec_per_char"]["all"]["samples"] == 2
+
+
+def test_languages_without_samples_use_the_overall_average():
+    model = ThroughputModel(alpha=1.0)
+    model.record("en", 100, 1.0)
+    model.record("zh", 100, 3.0)
+    assert model.sec_per_char("zh") == pytest.approx(0.03)
+    assert model.sec_per_char("de") == pytest.approx(0.03)   # latest overall, alpha=1
+    assert model.sec_per_char("en") == pytest.approx(0.01)
+
+
+def test_empty_samples_are_ignored():
+    model = ThroughputModel(prior_sec_per_char=0.05)
+    model.record("en", 0, 1.0)
+    model.record("en", 100, 0)
+    assert model.sec_per_char("en") == 0.05
@@ -0,0 +1,360 @@
+import os
+import math
+import time
+import uuid
+import threading
+
+import numpy as np
+import pytest
+
+from app import job_manager
+from app.admission import AdmissionController, QueueFull
+from app.audio_utils import read_wav_blocks, write_wav
+from app.chunk_buffer import ChunkBuffer
+from app.eta import ThroughputModel
+from app.job_store import JobStore
+from app.postprocess import Chain, encode
+from app.result_cache import FragmentCache
+from app.scheduler import LaneQueue
+from app.segments import segment_dir, segment_path, write_segment
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """A private LaneQueue; jobs registered by the test are dropped afterwards"""
+    q = LaneQueue(capacity=16)
+    monkeypatch.setattr(job_manager, "job_queue", q)
+    monkeypatch.setattr(job_manager, "POOL_SIZE", 0)
+    yield q
+    with job_manager._active_lock:
+        job_manager._active.clear()
+        job_manager._leaders.clear()
+
+
+def make_job(chunks, priority="standard", **fields):
+    job_id = str(uuid.uuid4())
+    job = {
+        "job_id": job_id,
+        "user_id": f"user-{job_id[:8]}",
+        "voice_name": "voice",
+        "text": " ".join(chunks),
+        "text_length": sum(len(c) for c in chunks),
+        "language": "en",
+        "priority": priority,
+        "status": "queued",
+        "speaker_wav": "voices/user/voice/ref.wav",
+        "out_wav": f"outputs/user/voice/{job_id}.wav",
+        "chunks": len(chunks),
+        "chunk_texts": list(chunks),
+        "fragments": False,
+        "cache_key": None,
+    }
+    job.update(fields)
+    job_manager.save_job(job_id, job)
+    return job
+
+
+def test_import_starts_no_workers():
+    # a pre-fork pool would load the model at import; the startup hook starts it
+    assert job_manager.pool is None
+    assert not job_manager._workers_started
+
+
+def test_stream_refused_in_pool_mode(monkeypatch):
+    def no_engine():
+        raise AssertionError("would load a second model copy")
+
+    monkeypatch.setattr(job_manager, "POOL_SIZE", 2)
+    monkeypatch.setattr(job_manager, "get_engine", no_engine)
+    with pytest.raises(job_manager.StreamingUnavailable):
+        job_manager.stream_tts("user", "voice", "Hello.")
+
+
+def test_position_counts_chunks_taken_but_not_started(queue):
+    free = make_job(["Free chunk."] * 8, priority="free")
+    job_manager._enqueue_job(free)
+    for _ in range(8):
+        queue.get()  # one batch of 8 handed to the only engine
+
+    premium = make_job(["Premium chunk."], priority="premium")
+    job_manager._enqueue_job(premium)
+    estimate = job_manager.estimate_job(premium)
+    # one free chunk is running, seven more are waiting in the engine's batch
+    assert estimate["queue_position"] == 7
+    assert estimate["chunks_remaining"] == 1
+
+
+def test_own_chunks_taken_are_not_counted_ahead(queue):
+    job = make_job(["First."] * 3)
+    job_manager._enqueue_job(job)
+    for _ in range(3):
+        queue.get()
+    assert job_manager.estimate_job(job)["queue_position"] == 0
+
+
+def test_failed_job_releases_its_buffer_under_the_job_lock(queue):
+    job = make_job(["One.", "Two."])
+    job_manager._enqueue_job(job)
+    state = job_manager._active[job["job_id"]]
+    task = queue.get()
+
+    # a chunk of the job is being put into the buffer right now
+    with state["lock"]:
+        failing = threading.Thread(target=job_manager._chunk_failed, args=(task, RuntimeError("boom")))
+        failing.start()
+        failing.join(0.2)
+        assert failing.is_alive() and not state["buffer"].released
+        state["buffer"].put(0, np.zeros(10, dtype=np.float32))
+    failing.join(5)
+
+    assert state["buffer"].released
+    assert job_manager.load_job(job["job_id"])["status"] == "failed"
+    assert job["job_id"] not in job_manager._active
+
+
+def wait_for_status(job_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_manager.load_job(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_failed_merge_of_fully_restored_job_fails_it(queue, monkeypatch):
+    def broken_render(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(job_manager.post_chain, "render", broken_render)
+    job = make_job(["One.", "Two."], cache_key="same-text-and-voice")
+    buffer = ChunkBuffer(2, os.path.join(job_manager.CHUNKS_DIR, job["job_id"]), checkpoint=True)
+    buffer.put(0, np.zeros(10, dtype=np.float32))
+    buffer.put(1, np.zeros(10, dtype=np.float32))
+
+    # every chunk checkpointed before a restart: only the merge is left
+    assert job_manager._enqueue_job(job, restore=True) == 0
+    failed = wait_for_status(job["job_id"], ("failed", "completed"))
+    assert failed["status"] == "failed" and "disk full" in failed["error"]
+    assert job["job_id"] not in job_manager._active
+    assert ("same-text-and-voice", "standard") not in job_manager._leaders
+
+    # an identical job runs on its own instead of waiting on the dead one
+    duplicate = make_job(["One.", "Two."], cache_key="same-text-and-voice")
+    assert not job_manager._attach_follower(duplicate)
+
+
+def test_duplicate_rides_along_with_a_queued_leader(queue):
+    leader = make_job(["One.", "Two."], cache_key="same")
+    job_manager._enqueue_job(leader)
+    duplicate = make_job(["One.", "Two."], cache_key="same")
+
+    assert job_manager._attach_follower(duplicate)
+    assert job_manager.load_job(duplicate["job_id"])["coalesced_with"] == leader["job_id"]
+    assert queue.qsize() == 2   # nothing queued for the duplicate
+
+
+def test_follower_completes_with_its_own_output(queue):
+    leader = make_job(["One.", "Two."], cache_key="same")
+    job_manager._enqueue_job(leader)
+    follower = make_job(["One.", "Two."], cache_key="same")
+    assert job_manager._attach_follower(follower)
+
+    for _ in range(2):
+        job_manager._chunk_done(queue.get(), np.zeros(2205, dtype=np.float32))
+    done = wait_for_status(follower["job_id"], ("completed", "failed"))
+    assert done["status"] == "completed"
+    assert done["audio_url"] == follower["out_wav"] != leader["out_wav"]
+    with open(follower["out_wav"], "rb") as a, open(leader["out_wav"], "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_leader_failure_fails_its_followers(queue):
+    leader = make_job(["One.", "Two."], cache_key="same")
+    job_manager._enqueue_job(leader)
+    follower = make_job(["One.", "Two."], cache_key="same")
+    assert job_manager._attach_follower(follower)
+
+    job_manager._chunk_failed(queue.get(), RuntimeError("boom"))
+    assert job_manager.load_job(follower["job_id"])["status"] == "failed"
+
+
+def test_duplicate_in_a_faster_lane_does_not_wait_on_the_leader(queue):
+    job_manager._enqueue_job(make_job(["One."], priority="free", cache_key="same"))
+    premium = make_job(["One."], priority="premium", cache_key="same")
+    assert not job_manager._attach_follower(premium)
+
+    job_manager._enqueue_job(premium)
+    assert job_manager._attach_follower(make_job(["One."], priority="premium", cache_key="same"))
+
+
+def test_restart_reattaches_a_follower_to_its_resumed_leader(queue, monkeypatch, tmp_path):
+    monkeypatch.setattr(job_manager, "job_store", JobStore(str(tmp_path / "jobs.db")))
+    monkeypatch.setattr(job_manager, "_expire_segments", lambda: None)
+    leader = make_job(["One.", "Two."], cache_key="same", created_at="2026-01-01T00:00:00")
+    follower = make_job(["One.", "Two."], cache_key="same", created_at="2026-01-01T00:00:01",
+                        coalesced_with=leader["job_id"])
+
+    assert job_manager.recover_jobs() == 1
+    assert queue.qsize() == 2
+    assert job_manager._active[leader["job_id"]]["followers"] == [follower["job_id"]]
+
+
+@pytest.fixture
+def voice():
+    user = f"user-{uuid.uuid4().hex[:8]}"
+    path = f"voices/{user}/voice/ref.wav"
+    os.makedirs(os.path.dirname(path))
+    write_wav(path, [np.zeros(2205, dtype=np.float32)], 22050)
+    return user
+
+
+@pytest.fixture
+def free_limit(monkeypatch):
+    monkeypatch.setattr(job_manager, "admission", AdmissionController({"free": 300}, mode="reject"))
+    monkeypatch.setattr(job_manager, "throughput", ThroughputModel(prior_sec_per_char=0.05))
+
+
+def long_text(chars):
+    sentence = "This sentence is here to make the text long. "
+    return (sentence * (chars // len(sentence) + 1))[:chars]
+
+
+def test_long_job_is_admitted_when_nothing_is_ahead(queue, voice, free_limit):
+    # ~350s of its own work against a 300s limit: it could never get under it
+    job_id = job_manager.submit_job(voice, "voice", long_text(7000), priority="free")
+    assert job_manager.load_job(job_id)["status"] == "queued"
+
+
+def test_rejection_reports_the_work_ahead(queue, voice, free_limit):
+    job_manager.submit_job(voice, "voice", long_text(7000), priority="free")
+    ahead = queue.queued_chars("free") * 0.05
+
+    with pytest.raises(QueueFull) as e:
+        job_manager.submit_job(voice, "voice", "Short one.", priority="free")
+    assert e.value.backlog_s == pytest.approx(ahead)
+    assert e.value.retry_after == math.ceil(ahead - 300)
+    # a premium job only waits behind premium work
+    assert job_manager.submit_job(voice, "voice", long_text(7000), priority="premium")
+
+
+def test_chunks_are_packed_with_the_fragment_cache_on(queue, voice, monkeypatch):
+    monkeypatch.setattr(job_manager, "FRAGMENT_CACHE", True)
+    text = " ".join(f"Sentence number {i} is short." for i in range(20))
+    job = job_manager.load_job(job_manager.submit_job(voice, "voice", text))
+    assert job["fragments"]
+    assert job["chunks"] < 20
+    assert " ".join(job["chunk_texts"]) == text
+
+
+def test_sentences_shared_with_earlier_jobs_are_cached_on_their_own(queue, voice, monkeypatch, tmp_path):
+    monkeypatch.setattr(job_manager, "FRAGMENT_CACHE", True)
+    monkeypatch.setattr(job_manager, "fragment_cache", FragmentCache(str(tmp_path)))
+    intro = "Welcome to the daily brief from the newsroom."
+    disclaimer = "This summary is not financial advice."
+
+    def submit(topic):
+        body = " ".join(f"Item {i} about {topic} is short." for i in range(6))
+        return job_manager.submit_job(voice, "voice", f"{intro} {body} {disclaimer}")
+
+    first = job_manager.load_job(submit("rain"))
+    assert intro not in first["chunk_texts"]   # nothing seen yet: all packed
+    second = job_manager.load_job(submit("snow"))
+    assert second["chunk_texts"][0] == intro and second["chunk_texts"][-1] == disclaimer
+    assert second["chunks"] < 8   # the body between them is still packed
+
+    while queue.qsize():
+        task = queue.get()
+        job_manager._chunk_done(task, np.zeros(2205, dtype=np.float32))
+        queue.release(task)
+    third = job_manager.load_job(submit("sun"))
+    assert third["fragments_reused"] == 2
+
+
+def test_chunks_are_joined_at_their_boundaries(queue, monkeypatch):
+    monkeypatch.setattr(job_manager, "post_chain", Chain([], crossfade_ms=10))
+    job = make_job(["One.", "Two."])
+    job_manager._enqueue_job(job)
+    for _ in range(2):
+        job_manager._chunk_done(queue.get(), np.ones(2205, dtype=np.float32))
+
+    assert wait_for_status(job["job_id"], ("completed",))
+    overlap = job_manager.XTTS_SAMPLE_RATE // 100
+    samples = np.concatenate(list(read_wav_blocks(job["out_wav"])))
+    assert len(samples) == 2 * 2205 - overlap
+
+
+def test_segments_are_opt_in(queue, voice):
+    job = job_manager.load_job(job_manager.submit_job(voice, "voice", "One. Two."))
+    assert job["segments_enabled"] is False
+    job = job_manager.load_job(job_manager.submit_job(voice, "voice", "Three. Four.", segments=True))
+    assert job["segments_enabled"] is True
+
+
+def test_failed_job_deletes_its_segments(queue):
+    published_job = make_job(["One.", "Two."], segments_enabled=True)
+    quiet_job = make_job(["One.", "Two."])
+    for job in (published_job, quiet_job):
+        job_manager._enqueue_job(job)
+    tasks = {}
+    for _ in range(2):
+        task = queue.get()
+        tasks[task["job_id"]] = task
+        job_manager._chunk_done(task, np.zeros(2205, dtype=np.float32))
+    assert os.path.exists(segment_path(published_job["out_wav"], 0))
+    assert not os.path.exists(segment_dir(quiet_job["out_wav"]))
+
+    job_manager._chunk_failed(tasks[published_job["job_id"]], RuntimeError("boom"))
+    assert not os.path.exists(segment_dir(published_job["out_wav"]))
+
+
+def test_restart_expires_segments_of_finished_jobs(queue):
+    running = make_job(["One."], status="processing")
+    failed = make_job(["One."], status="failed")
+    completed = make_job(["One."], status="completed", segments=[0.1])
+    for job in (running, failed, completed):
+        write_segment(job["out_wav"], 0, np.zeros(2205, dtype=np.float32), 22050)
+
+    job_manager._expire_segments()
+    assert os.path.exists(segment_dir(running["out_wav"]))
+    assert not os.path.exists(segment_dir(failed["out_wav"]))
+    assert os.path.exists(segment_dir(completed["out_wav"]))  # still in its grace period
+
+
+class StubEngine:
+    """Synthesizes each chunk in `seconds`, recording when every chunk started"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = {}
+
+    def generate_batch(self, tasks, on_result):
+        for i, task in enumerate(tasks):
+            self.started[task["job_id"]] = time.monotonic()
+            time.sleep(self.seconds)
+            on_result(i, np.zeros(2205, dtype=np.float32))
+
+
+def test_engine_takes_the_next_chunk_while_the_last_one_is_rendered(monkeypatch):
+    # the lane capacity the service runs with when XTTS_LANE_CAPACITY is unset
+    q = LaneQueue(capacity=job_manager.job_queue.capacity)
+    monkeypatch.setattr(job_manager, "job_queue", q)
+    monkeypatch.setattr(job_manager, "batcher", job_manager.BatchCollector(q))
+    monkeypatch.setattr(job_manager, "POOL_SIZE", 0)
+    engine = StubEngine(0.2)
+    monkeypatch.setattr(job_manager, "get_engine", lambda: engine)
+
+    def slow_render(source, sample_rate, outputs):
+        time.sleep(1.0)
+        return encode(list(source), sample_rate, outputs)
+
+    monkeypatch.setattr(job_manager.post_chain, "render", slow_render)
+    first, second = make_job(["First job."]), make_job(["Second job."])
+    t0 = time.monotonic()
+    job_manager._enqueue_job(first)
+    job_manager._enqueue_job(second)
+    threading.Thread(target=job_manager.worker, daemon=True).start()
+
+    wait_for_status(second["job_id"], ("completed",))
+    # synthesis of the second job overlaps the first job's render
+    assert engine.started[second["job_id"]] - t0 < 0.6
@@ -0,0 +1,65 @@
+import pytest
+
+from app.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def job(job_id, status="queued", **fields):
+    return dict({"job_id": job_id, "user_id": "u", "status": status, "created_at": job_id}, **fields)
+
+
+def test_save_load_update(store):
+    store.save("a", job("a", text="hi"))
+    assert store.load("a")["text"] == "hi"
+    assert store.load("a", kind="train") is None
+    assert store.update("a", audio_url="x.wav")["audio_url"] == "x.wav"
+    assert store.load("a")["text"] == "hi"
+    assert store.update("missing", status="failed") is None
+
+
+def test_transition_only_from_allowed_statuses(store):
+    store.save("a", job("a"))
+    assert store.transition("a", "processing", from_statuses=("queued",))["status"] == "processing"
+    assert store.transition("a", "processing", from_statuses=("queued",)) is None
+    assert store.transition("a", "completed", from_statuses=("queued", "processing"), audio_url="a.wav")
+    assert store.transition("a", "failed", from_statuses=("queued", "processing")) is None
+    assert store.load("a")["status"] == "completed"
+    assert store.count_by_status() == {"completed": 1}
+
+
+def test_by_status_oldest_first(store):
+    for job_id, status in (("2", "queued"), ("1", "processing"), ("3", "deferred"), ("0", "completed")):
+        store.save(job_id, job(job_id, status))
+    assert [j["job_id"] for j in store.by_status(("queued", "processing"))] == ["1", "2"]
+
+
+def test_progress_is_buffered_then_flushed(store):
+    store.save("a", job("a", "processing"))
+    store.set_progress("a", progress="1/3")
+    assert store.load("a")["progress"] == "1/3"
+    store.flush()
+    assert store.by_status(("processing",))[0]["progress"] == "1/3"
+
+
+def test_transition_takes_buffered_progress(store):
+    store.save("a", job("a", "processing"))
+    store.set_progress("a", progress="3/3", segments=[1.0, 2.0, 3.0])
+    store.transition("a", "completed", from_statuses=("processing",))
+    done = store.by_status(("completed",))[0]
+    assert done["progress"] == "3/3" and done["segments"] == [1.0, 2.0, 3.0]
+
+
+def test_progress_reported_after_the_job_finished_is_dropped(store):
+    store.save("a", job("a", "processing"))
+    store.transition("a", "completed", from_statuses=("processing",), segments=[1.0, 2.0])
+    # a late update from before completion must not overwrite the final row
+    store.set_progress("a", progress="1/2", segments=[1.0])
+    assert store.load("a")["segments"] == [1.0, 2.0]
+    store.flush()
+    done = store.load("a")
+    assert done["status"] == "completed"
+    assert done["segments"] == [1.0, 2.0] and "progress" not in done
@@ -0,0 +1,40 @@
+import numpy as np
+
+from app.latent_cache import LatentCache, LATENT_FILE, file_hash
+
+
+class Latent:
+    """Stands in for a torch tensor: what _store calls to persist it"""
+
+    def __init__(self, value):
+        self.value = np.full(4, value, dtype=np.float32)
+
+    def detach(self):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.value
+
+
+def test_latents_of_a_recloned_voice_are_not_reused(tmp_path):
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"first recording")
+    LatentCache().get(str(ref), lambda path: (Latent(1), Latent(1)))
+
+    # the voice is cloned again, then the service restarts
+    ref.write_bytes(b"second recording, longer")
+    computed = []
+
+    def compute(path):
+        computed.append(path)
+        return Latent(2), Latent(2)
+
+    latents = LatentCache().get(str(ref), compute)
+    assert computed == [str(ref)]
+    assert latents[0].value[0] == 2
+    with np.load(tmp_path / LATENT_FILE) as data:
+        assert str(data["ref_hash"]) == file_hash(str(ref))
+        assert data["gpt_cond_latent"][0] == 2
@@ -0,0 +1,75 @@
+"""
+ONNX Runtime and PyTorch decode the same audio codes to the same waveform.
+
+Needs onnxruntime, torch, TTS, the downloaded XTTS v2 model and an export
+(`python -m app.onnx_engine export`); skipped otherwise. Set
+XTTS_TEST_SPEAKER to a reference WAV to use a real voice instead of the
+synthetic one.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+torch = pytest.importorskip("torch")
+pytest.importorskip("TTS")
+
+from tests.conftest import ROOT
+from app.audio_utils import write_wav
+from app.onnx_engine import XTTS_ONNX_DIR, GPT_FILE, HIFIGAN_FILE, attach_onnx, detach_onnx
+from benchmarks.bench_onnx import TEXT, sample_codes, decode
+
+ATOL = 1e-3
+
+
+def model_dir():
+    from TTS.utils.generic_utils import get_user_data_dir
+    return os.path.join(get_user_data_dir("tts"), "tts_models--multilingual--multi-dataset--xtts_v2")
+
+
+@pytest.fixture(scope="module")
+def onnx_dir():
+    path = XTTS_ONNX_DIR if os.path.isabs(XTTS_ONNX_DIR) else os.path.join(ROOT, XTTS_ONNX_DIR)
+    if not all(os.path.exists(os.path.join(path, f)) for f in (GPT_FILE, HIFIGAN_FILE)):
+        pytest.skip(f"no ONNX export in {path}")
+    return path
+
+
+@pytest.fixture(scope="module")
+def engine():
+    if not os.path.exists(os.path.join(model_dir(), "model.pth")):
+        pytest.skip("XTTS v2 model not downloaded")
+    from app.xtts_engine import XTTSVoiceCloner
+    return XTTSVoiceCloner(device="cpu", quantize="").freeze()
+
+
+@pytest.fixture(scope="module")
+def speaker(tmp_path_factory):
+    if os.getenv("XTTS_TEST_SPEAKER"):
+        return os.getenv("XTTS_TEST_SPEAKER")
+    sr = 22050
+    t = np.arange(3 * sr) / sr
+    voiced = 0.3 * np.sin(2 * np.pi * 140 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    path = str(tmp_path_factory.mktemp("speaker") / "ref.wav")
+    write_wav(path, [voiced.astype(np.float32)], sr)
+    return path
+
+
+def test_onnx_decoder_matches_torch(engine, onnx_dir, speaker):
+    model = engine.model
+    latents = engine.get_latents(speaker)
+    tokens, codes = sample_codes(model, TEXT, "en", latents)
+
+    torch_lat, torch_wav, _ = decode(model, tokens, codes, latents)
+    replaced = attach_onnx(model, onnx_dir)
+    try:
+        onnx_lat, onnx_wav, _ = decode(model, tokens, codes, latents)
+    finally:
+        detach_onnx(model, replaced)
+
+    assert onnx_lat.shape == torch_lat.shape
+    np.testing.assert_allclose(onnx_lat, torch_lat, rtol=0, atol=ATOL)
+    assert len(onnx_wav) == len(torch_wav)
+    np.testing.assert_allclose(onnx_wav, torch_wav, rtol=0, atol=ATOL)
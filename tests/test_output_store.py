@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from app import output_store
+from app.audio_utils import write_wav
+from app.output_store import EncodingStore, negotiate_format, UnsupportedFormat, MEDIA_TYPES
+
+
+def test_format_parameter_wins():
+    assert negotiate_format("MP3", "audio/flac") == "mp3"
+    with pytest.raises(UnsupportedFormat):
+        negotiate_format("aac")
+
+
+def test_no_preference_gets_the_default():
+    assert negotiate_format(default="wav") == "wav"
+    assert negotiate_format(accept="*/*", default="mp3") == "mp3"
+    assert negotiate_format(accept="audio/*", default="opus") == "opus"
+
+
+def test_highest_q_wins_and_ties_keep_client_order():
+    assert negotiate_format(accept="audio/wav;q=0.5, audio/mpeg;q=0.9, audio/flac;q=0.7") == "mp3"
+    assert negotiate_format(accept="audio/flac, audio/mpeg") == "flac"
+    assert negotiate_format(accept="audio/mpeg;q=0, audio/wav;q=0.1") == "wav"
+
+
+def test_ogg_codecs():
+    assert negotiate_format(accept="audio/ogg") == "opus"
+    assert negotiate_format(accept='audio/ogg; codecs="vorbis"') == "ogg"
+    assert negotiate_format(accept="audio/ogg; codecs=opus") == "opus"
+
+
+def test_webm_is_not_served_as_ogg():
+    # we write Opus in an Ogg container, which a WebM-only client can't play
+    assert "audio/webm" not in MEDIA_TYPES
+    with pytest.raises(UnsupportedFormat):
+        negotiate_format(accept="audio/webm")
+    assert negotiate_format(accept="audio/webm, */*;q=0.1", default="wav") == "wav"
+
+
+def test_unplayable_accept_is_refused():
+    with pytest.raises(UnsupportedFormat):
+        negotiate_format(accept="video/mp4, audio/aac")
+
+
+def test_encodes_once_and_re_encodes_a_newer_wav(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_transcode(src, outputs):
+        calls.append(src)
+        for path in outputs.values():
+            with open(path, "wb") as f:
+                f.write(b"encoded")
+        return outputs
+
+    monkeypatch.setattr(output_store, "transcode", fake_transcode)
+    wav = str(tmp_path / "job.wav")
+    write_wav(wav, [np.zeros(100, dtype=np.float32)], 22050)
+    store = EncodingStore()
+
+    assert store.get(wav, "wav") == wav
+    target = store.get(wav, "mp3")
+    assert target == str(tmp_path / "job.mp3") and store.get(wav, "mp3") == target
+    assert len(calls) == 1 and store.stats()["hits"] == 1
+
+    later = os.stat(target).st_mtime + 10
+    os.utime(wav, (later, later))
+    store.get(wav, "mp3")
+    assert len(calls) == 2
@@ -0,0 +1,109 @@
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from app.audio_utils import read_wav_blocks
+from app.postprocess import Chain, Fade, Normalize, Resample, Trim, build_chain, encode, transcode
+
+SR = 8000
+
+
+def tone(seconds, amplitude=0.1, sr=SR):
+    t = np.arange(int(seconds * sr)) / sr
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def run(chain, source, sr=SR):
+    blocks, sr = chain.run(source, sr)
+    return np.concatenate([np.asarray(b, dtype=np.float32) for b in blocks]), sr
+
+
+def rms_dbfs(x):
+    return 20 * np.log10(np.sqrt(np.mean(np.square(x, dtype=np.float64))))
+
+
+def test_build_chain_and_signature():
+    chain = build_chain("trim, Normalize,,fade")
+    assert [type(s) for s in chain.stages] == [Trim, Normalize, Fade]
+    assert chain.signature().startswith("trim:")
+    assert build_chain("").signature() == "none"
+    with pytest.raises(ValueError, match="echo"):
+        build_chain("fade,echo")
+
+
+def test_signature_changes_with_parameters():
+    assert Chain([Fade(50)]).signature() != Chain([Fade(20)]).signature()
+
+
+def test_fade_ramps_the_edges_only():
+    out, sr = run(Chain([Fade(100)]), [np.ones(2000, dtype=np.float32)])
+    assert sr == SR and len(out) == 2000
+    assert out[0] == 0 and out[-1] == 0
+    assert np.all(out[800:1200] == 1)
+
+
+def test_normalize_reads_the_source_twice_and_hits_the_target():
+    source = [tone(0.5, 0.01), np.zeros(SR // 2, dtype=np.float32), tone(0.5, 0.01)]
+    out, _ = run(Chain([Normalize(target_dbfs=-20, peak_dbfs=-1)]), source)
+    speech = np.concatenate((out[:SR // 2], out[-SR // 2:]))
+    assert rms_dbfs(speech) == pytest.approx(-20, abs=0.5)  # pauses don't count
+
+
+def test_normalize_never_clips_past_the_peak_ceiling():
+    out, _ = run(Chain([Normalize(target_dbfs=0, peak_dbfs=-6)]), [tone(0.5, 0.1)])
+    assert np.abs(out).max() == pytest.approx(10 ** (-6 / 20), rel=1e-3)
+
+
+def test_trim_then_resample():
+    quiet = np.zeros(SR, dtype=np.float32)
+    source = [quiet, tone(1.0, 0.3), quiet]
+    out, sr = run(Chain([Trim(threshold_db=-45, pad_ms=100), Resample(16000)]), source)
+    assert sr == 16000
+    assert len(out) == pytest.approx(2 * (SR + 2 * SR // 10), abs=4)
+
+
+def test_join_crossfades_chunk_boundaries_before_the_chain():
+    chunks = [tone(0.5, 0.01), tone(0.5, 0.01)]
+    chain = Chain([Normalize(target_dbfs=-20)], crossfade_ms=10)
+    out, _ = run(chain, chain.join(chunks, SR))  # normalize reads the joined source twice
+    assert len(out) == SR - SR // 100
+    assert rms_dbfs(out) == pytest.approx(-20, abs=0.5)
+    assert chain.signature() != Chain([Normalize(target_dbfs=-20)]).signature()
+
+
+def test_join_is_off_by_default():
+    chunks = [tone(0.1), tone(0.1)]
+    assert Chain([Fade(20)]).join(chunks, SR) is chunks
+    assert Chain([Fade(20)]).signature() == "fade:20"
+
+
+def test_render_encodes_every_output_from_one_pass(tmp_path):
+    outputs = {"wav": str(tmp_path / "a.wav"), "flac": str(tmp_path / "a.flac")}
+    Chain([Fade(10)]).render([tone(0.5)], SR, outputs)
+    with wave.open(outputs["wav"]) as w:
+        assert (w.getframerate(), w.getnframes(), w.getsampwidth()) == (SR, SR // 2, 2)
+    sf = pytest.importorskip("soundfile")
+    flac, sr = sf.read(outputs["flac"], dtype="float32")
+    assert sr == SR and len(flac) == SR // 2
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+
+def test_failed_encode_leaves_no_partial_files(tmp_path):
+    def broken():
+        yield tone(0.1)
+        raise RuntimeError("engine died")
+
+    out = str(tmp_path / "a.wav")
+    with pytest.raises(RuntimeError):
+        encode(broken(), SR, {"wav": out})
+    assert os.listdir(tmp_path) == []
+
+
+def test_transcode_keeps_the_samples(tmp_path):
+    src = str(tmp_path / "a.wav")
+    encode([tone(0.25)], SR, {"wav": src})
+    copy = str(tmp_path / "b.wav")
+    transcode(src, {"wav": copy})
+    assert np.array_equal(np.concatenate(list(read_wav_blocks(src))), np.concatenate(list(read_wav_blocks(copy))))
@@ -0,0 +1,56 @@
+import os
+
+from app.result_cache import ResultCache
+
+SIZE = 1000
+
+
+def output(tmp_path, name):
+    path = tmp_path / f"{name}.wav"
+    path.write_bytes(os.urandom(SIZE))
+    return str(path)
+
+
+def cache_of(tmp_path, entries):
+    """A cache under tmp_path with room for `entries` outputs of SIZE bytes"""
+    return ResultCache(str(tmp_path / "cache"), max_mb=(entries + 0.5) * SIZE / 1024 / 1024)
+
+
+def test_least_recently_used_output_is_evicted_past_the_byte_budget(tmp_path):
+    cache = cache_of(tmp_path, 2)
+    speaker = "voices/user/voice/ref.wav"
+    cache.put("a", speaker, output(tmp_path, "a"))
+    cache.put("b", speaker, output(tmp_path, "b"))
+    assert cache.get("a")   # a is now the most recently used
+
+    cache.put("c", speaker, output(tmp_path, "c"))
+    assert cache.get("b") is None
+    assert not os.path.exists(cache.path_for("b", speaker))
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_drops_only_that_voice(tmp_path):
+    cache = cache_of(tmp_path, 4)
+    cache.put("old", "voices/user/voice/ref.wav", output(tmp_path, "old"))
+    cache.put("other", "voices/user/other/ref.wav", output(tmp_path, "other"))
+
+    cache.invalidate("voices/user/voice")
+    assert cache.get("old") is None
+    assert not os.path.exists(os.path.dirname(cache.path_for("old", "voices/user/voice/ref.wav")))
+    assert cache.get("other")
+
+
+def test_index_is_rebuilt_from_disk_in_lru_order(tmp_path):
+    cache = cache_of(tmp_path, 2)
+    speaker = "voices/user/voice/ref.wav"
+    for key, mtime in (("newer", 2_000_000), ("older", 1_000_000)):
+        cache.put(key, speaker, output(tmp_path, key))
+        os.utime(cache.path_for(key, speaker), (mtime, mtime))
+
+    restarted = cache_of(tmp_path, 2)
+    assert restarted.stats()["entries"] == 2
+    assert restarted.stats()["size_mb"] == cache.stats()["size_mb"]
+    restarted.put("new", speaker, output(tmp_path, "new"))
+    assert restarted.get("older") is None
+    assert restarted.get("newer") and restarted.get("new")
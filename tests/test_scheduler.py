@@ -0,0 +1,132 @@
+import queue
+
+import pytest
+
+from app.scheduler import FairQueue, LaneQueue, parse_weights
+
+
+def task(user, job=None, chars=100, priority="standard"):
+    return {"user_id": user, "job_id": job or user, "text": "x" * chars, "priority": priority}
+
+
+def drain(q):
+    out = []
+    while True:
+        try:
+            out.append(q.get_nowait())
+        except queue.Empty:
+            return out
+
+
+def test_parse_weights():
+    assert parse_weights("alice=2, bob=0.5,junk,carol=x") == {"alice": 2.0, "bob": 0.5}
+    assert parse_weights("premium=8", cast=int) == {"premium": 8}
+
+
+def test_long_job_does_not_starve_a_short_one():
+    q = FairQueue()
+    for _ in range(10):
+        q.put(task("heavy"))
+    q.put(task("light"))
+    order = [t["user_id"] for t in drain(q)]
+    assert order.index("light") <= 1
+
+
+def test_users_alternate_by_characters_and_weight():
+    q = FairQueue(weights={"alice": 2})
+    for _ in range(6):
+        q.put(task("alice"))
+        q.put(task("bob"))
+    first = [t["user_id"] for t in drain(q)][:6]
+    assert first.count("alice") == 4 and first.count("bob") == 2
+
+
+def test_front_readmits_ahead_of_the_queue():
+    q = FairQueue()
+    for _ in range(3):
+        q.put(task("a"))
+    q.get_nowait()
+    q.put(task("b", job="requeued"), front=True)
+    assert q.get_nowait()["job_id"] == "requeued"
+
+
+def test_position_and_backlog():
+    q = FairQueue()
+    q.put(task("a", job="a1", chars=100))
+    q.put(task("a", job="a1", chars=100))
+    q.put(task("b", job="b1", chars=50))
+    # b's 50 characters finish before a's first 100
+    assert q.position("b1") == (0, 1)
+    assert q.position("a1") == (1, 2)
+    assert q.position("none") is None
+    assert q.queued_chars() == 250
+    assert q.get_nowait()["job_id"] == "b1"
+    assert q.position("a1") == (0, 2)
+    users = q.backlog()["users"]
+    assert users["b"]["queued_chunks"] == 0 and users["b"]["served_chunks"] == 1
+    assert users["a"]["queued_chars"] == 200
+
+
+def test_get_times_out_when_empty():
+    with pytest.raises(queue.Empty):
+        FairQueue().get(timeout=0.01)
+
+
+def test_lanes_are_served_in_priority_order():
+    q = LaneQueue(capacity=10)
+    q.put(task("f", priority="free"))
+    q.put(task("s", priority="standard"))
+    q.put(task("p", priority="premium"))
+    q.put(task("x", priority="unknown"))  # unknown plans go to the default lane
+    assert [t["user_id"] for t in drain(q)] == ["p", "s", "x", "f"]
+    assert q.in_flight() == 4
+
+
+def test_capacity_counts_chunks_until_released():
+    q = LaneQueue(capacity=1)
+    q.put(task("a"))
+    q.put(task("b"))
+    first = q.get_nowait()
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+    q.release(first)
+    assert q.get_nowait()["user_id"] == "b"
+
+
+def test_lane_limit():
+    q = LaneQueue(capacity=4, limits={"free": 1})
+    q.put(task("f1", priority="free"))
+    q.put(task("f2", priority="free"))
+    q.get_nowait()
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_reservation_holds_capacity_only_while_its_lane_has_work():
+    q = LaneQueue(capacity=2, reserved={"premium": 1})
+    for i in range(3):
+        q.put(task(f"f{i}", priority="free"))
+    # premium idle: free may use the whole capacity
+    assert len(drain(q)) == 2
+
+    q = LaneQueue(capacity=2, reserved={"premium": 1})
+    q.put(task("f0", priority="free"))
+    q.put(task("f1", priority="free"))
+    free = q.get_nowait()
+    q.put(task("p", priority="premium"))
+    q.put(task("p2", priority="premium"))
+    # the last slot is premium's even though free was queued first
+    assert q.get_nowait()["user_id"] == "p"
+    q.release(free)
+    assert q.get_nowait()["user_id"] == "p2"
+
+
+def test_lane_position_counts_higher_lanes():
+    q = LaneQueue(capacity=4)
+    q.put(task("s", priority="standard"))
+    q.put(task("f", priority="free"))
+    q.put(task("p", priority="premium"))
+    assert q.position("f", "free") == (2, 1)
+    assert q.position("p", "premium") == (0, 1)
+    assert q.queued_chars("standard") == 200
+    assert q.queued_chars() == 300
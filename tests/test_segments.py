@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+
+from app import segments
+from app.segments import hls_playlist, published, remove_segments, segment_dir, segment_path, write_segment
+
+
+def test_hls_playlist_grows_then_ends():
+    parts = [{"url": "/outputs/u/v/j_segments/00000.mp3", "duration": 4.25},
+             {"url": "/outputs/u/v/j_segments/00001.mp3", "duration": 12.5}]
+    running = hls_playlist(parts, ended=False).splitlines()
+    assert running[:5] == [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-TARGETDURATION:13",   # longest segment, rounded up, over the floor
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+    ]
+    assert running[5:] == ["#EXTINF:4.250,", parts[0]["url"], "#EXTINF:12.500,", parts[1]["url"]]
+    assert hls_playlist(parts, ended=True).splitlines()[-1] == "#EXT-X-ENDLIST"
+
+
+def test_hls_target_duration_floor():
+    playlist = hls_playlist([], ended=False)
+    assert f"#EXT-X-TARGETDURATION:{segments.SEGMENT_TARGET_S}" in playlist
+    assert "#EXTINF" not in playlist and "#EXT-X-ENDLIST" not in playlist
+
+
+def test_published_is_the_prefix_still_on_disk(tmp_path):
+    out_wav = str(tmp_path / "job.wav")
+    for index in (0, 1, 3):
+        assert write_segment(out_wav, index, np.zeros(2205, dtype=np.float32), 22050) == 0.1
+    assert published(out_wav, [0.1, 0.1, 0.1, 0.1]) == [0.1, 0.1]
+    assert published(out_wav, None) == []
+
+
+def test_remove_segments(tmp_path):
+    out_wav = str(tmp_path / "job.wav")
+    write_segment(out_wav, 0, np.zeros(100, dtype=np.float32), 22050)
+    assert os.path.exists(segment_path(out_wav, 0))
+    remove_segments(out_wav)
+    assert not os.path.exists(segment_dir(out_wav))
+    remove_segments(out_wav)  # already gone
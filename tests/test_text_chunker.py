@@ -0,0 +1,95 @@
+import pytest
+
+from app import text_chunker
+from app.text_chunker import chunk_text, split_sentences, count_tokens, CHAR_LIMITS
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # the characters-per-token estimate, whether or not a model is downloaded
+    monkeypatch.setattr(text_chunker, "_tokenizer", False)
+
+
+def test_abbreviations_and_numbers_do_not_end_sentences():
+    text = "Dr. Smith paid $3.50 for v2.0 of the app. Mr. Jones did not! Why?"
+    assert split_sentences(text) == [
+        "Dr. Smith paid $3.50 for v2.0 of the app.",
+        "Mr. Jones did not!",
+        "Why?",
+    ]
+
+
+def test_closing_quotes_stay_with_their_sentence():
+    assert split_sentences('He said "stop." Then he left.') == ['He said "stop."', "Then he left."]
+
+
+def test_non_latin_terminators():
+    assert split_sentences("你好。今天很好！", "zh-cn") == ["你好。", "今天很好！"]
+    assert split_sentences("यह पहला है। यह दूसरा है।", "hi") == ["यह पहला है।", "यह दूसरा है।"]
+    assert split_sentences("هل أنت هنا؟ نعم", "ar") == ["هل أنت هنا؟", "نعم"]
+
+
+def test_short_sentences_are_packed_to_the_budget():
+    text = " ".join(f"Sentence number {i} is short." for i in range(40))
+    chunks = chunk_text(text, "en", max_tokens=30)
+    assert 1 < len(chunks) < 40
+    assert all(count_tokens(c) <= 30 and len(c) <= CHAR_LIMITS["en"] for c in chunks)
+    assert " ".join(chunks) == text
+    # every chunk ends on a sentence boundary
+    assert all(c.endswith(".") for c in chunks)
+
+
+def test_pack_false_keeps_one_sentence_per_chunk():
+    text = "One. Two. Three."
+    assert chunk_text(text, pack=False) == ["One.", "Two.", "Three."]
+    assert chunk_text(text) == ["One. Two. Three."]
+
+
+def test_long_sentence_is_split_at_clauses_then_words():
+    clauses = ", ".join(["the quick brown fox jumps over the lazy dog"] * 12) + "."
+    chunks = chunk_text(clauses, "en")
+    assert len(chunks) > 1
+    assert all(len(c) <= CHAR_LIMITS["en"] for c in chunks)
+    assert " ".join(chunks) == clauses
+
+    words = " ".join(["word"] * 200)
+    chunks = chunk_text(words, "en", max_tokens=20)
+    assert all(count_tokens(c) <= 20 for c in chunks)
+    assert " ".join(chunks) == words
+
+
+def test_kept_sentences_stay_on_their_own_between_packed_runs():
+    sentences = [f"Sentence {i} is short." for i in range(6)]
+    chunks = chunk_text(" ".join(sentences), "en", keep=lambda s: s in (sentences[0], sentences[3]))
+    assert chunks == [sentences[0], " ".join(sentences[1:3]), sentences[3], " ".join(sentences[4:])]
+
+
+def test_cjk_is_split_by_characters_without_spaces():
+    text = "这是一个没有标点的很长的句子" * 10
+    chunks = chunk_text(text, "zh-cn")
+    assert all(len(c) <= CHAR_LIMITS["zh"] for c in chunks)
+    assert "".join(chunks) == text
+
+
+def test_one_enormous_word_is_cut():
+    word = "a" * 600
+    chunks = chunk_text(word, "en")
+    assert "".join(chunks) == word
+    assert all(len(c) <= CHAR_LIMITS["en"] for c in chunks)
+
+
+def test_enormous_word_inside_a_sentence_is_cut():
+    url = "https://" + "a" * 400
+    chunks = chunk_text(f"See {url} now.", "en")
+    assert all(len(c) <= CHAR_LIMITS["en"] for c in chunks)
+    assert "".join(chunks).replace(" ", "") == f"See{url}now."
+
+
+def test_blank_text_is_one_chunk():
+    assert chunk_text("   ") == ["   "]
+
+
+@pytest.mark.parametrize("language", sorted(CHAR_LIMITS))
+def test_default_budget_leaves_chunk_size_to_the_character_limit(language):
+    text = " ".join(["Short words, and a clause; then the sentence ends."] * 20)
+    assert chunk_text(text, language) == chunk_text(text, language, max_tokens=10_000)
@@ -0,0 +1,41 @@
+from app import engine_registry
+from app.worker_pool import WorkerPool
+
+
+class DeadProcess:
+    exitcode = -9
+
+    def is_alive(self):
+        return False
+
+
+def crash_with(pool, task):
+    """The worker holding `task` has died; the monitor looks at it"""
+    pool.workers[0] = {"proc": DeadProcess(), "pending": {0: task}, "ready": True, "respawn_at": None}
+    pool._check_workers(0.0)
+
+
+def test_chunk_that_keeps_killing_workers_fails_instead_of_requeueing():
+    requeued, failed = [], []
+    pool = WorkerPool(1, None, lambda task, result, seconds: failed.append((task, result)),
+                      requeued.extend, max_crashes=3)
+    task = {"job_id": "job", "index": 0}
+
+    crash_with(pool, task)
+    crash_with(pool, task)
+    assert requeued == [task, task] and not failed
+
+    crash_with(pool, task)
+    assert len(requeued) == 2
+    assert failed[0][0] is task and isinstance(failed[0][1], RuntimeError)
+
+
+def test_prefork_on_cuda_falls_back_to_spawn_without_loading_the_model(monkeypatch):
+    def no_engine():
+        raise AssertionError("the parent would hold an extra model copy")
+
+    monkeypatch.setattr(engine_registry, "engine_device", lambda: "cuda")
+    monkeypatch.setattr(engine_registry, "get_engine", no_engine)
+    pool = WorkerPool(2, None, None, None, prefork=True)
+    assert pool._load_parent_engine() is False
+    assert engine_registry.loaded_engine() is None